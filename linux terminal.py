@@ -9,8 +9,13 @@
 # - APT/DPKG simulatie
 # - Mooie, rustige output + duidelijke banners
 
-import os, sys, shlex, stat, json, shutil, subprocess, tarfile, lzma, gzip, urllib.request, zipfile, time, math
-from contextlib import redirect_stdout, redirect_stderr
+import os, sys, shlex, stat, json, shutil, subprocess, tempfile, heapq, mmap, tarfile, lzma, gzip, bz2, zlib, urllib.request, importlib.util, zipfile, time, math, threading, queue, io, codecs, re, signal, socket, hashlib
+from contextlib import redirect_stdout, redirect_stderr, contextmanager
+from bisect import bisect_left
+from itertools import islice, product, count
+from collections import deque
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from pathlib import Path
 from datetime import datetime
 from io import BytesIO, StringIO
@@ -33,7 +38,8 @@ try:
 except Exception:
     USE_COLOR = sys.stdout.isatty() and os.name != "nt"
 
-def c(s: str) -> str: return s if USE_COLOR else ""
+# kleur alleen als de (thread-)stdout een terminal is: niet in pipes/redirects
+def c(s: str) -> str: return s if USE_COLOR and sys.stdout.isatty() else ""
 C_RESET, C_GREEN, C_BLUE, C_CYAN, C_YELLOW, C_RED = "\033[0m","\033[92m","\033[94m","\033[96m","\033[93m","\033[91m"
 
 # ---------- paden & state ----------
@@ -70,20 +76,95 @@ def json_save(path: Path, data):
     except Exception:
         pass
 
-META   = json_load(META_FILE, {})
-PKG_DB = json_load(PKG_DB_FILE, {"installed": {}})
+# Overlay-root: SYSTEM_ROOT/.overlay = {"base": PAD} → read-only base + SYSTEM_ROOT als schrijfbare upper.
+# JSON-state (META, PKG_DB, registry) is gelaagd: de upper bewaart alleen de diff, None = verwijderd.
+def overlay_base_of(root: Path) -> Path|None:
+    cfg = json_load(root / ".overlay", None)
+    if not isinstance(cfg, dict) or not cfg.get("base"): return None
+    base = Path(cfg["base"]).resolve()
+    return base if base.is_dir() and base != root.resolve() else None
 
-def meta_key(p: Path) -> str:
-    try: return str(p.relative_to(SYSTEM_ROOT).as_posix())
-    except Exception: return ""
+OVERLAY_BASE = overlay_base_of(SYSTEM_ROOT)
+if OVERLAY_BASE is not None and not GIT_HOME.exists(): GIT_HOME = OVERLAY_BASE / "tools" / "git"
+_BASE_JSON = {}
+
+def _layer_merge(base, upper):
+    if not isinstance(base, dict) or not isinstance(upper, dict): return upper
+    out = dict(base)
+    for k, v in upper.items():
+        if v is None: out.pop(k, None)
+        else: out[k] = _layer_merge(out[k], v) if k in out else v
+    return out
+
+def _layer_diff(base, cur):
+    out = {}
+    for k, v in cur.items():
+        if k not in base: out[k] = v
+        elif isinstance(v, dict) and isinstance(base[k], dict):
+            d = _layer_diff(base[k], v)
+            if d: out[k] = d
+        elif v != base[k]: out[k] = v
+    for k in base:
+        if k not in cur: out[k] = None
+    return out
+
+def _base_json(path: Path, default):
+    bp = OVERLAY_BASE / path.relative_to(SYSTEM_ROOT)
+    try: mt = bp.stat().st_mtime_ns
+    except OSError: return default
+    hit = _BASE_JSON.get(bp)
+    if hit is None or hit[0] != mt: hit = _BASE_JSON[bp] = (mt, json_load(bp, default))
+    return hit[1]
+
+def layered_load(path: Path, default):
+    data = json_load(path, None)
+    if OVERLAY_BASE is None: return default if data is None else data
+    base = json.loads(json.dumps(_base_json(path, default)))   # eigen kopie: de cache blijft de diff-basis
+    return base if data is None else _layer_merge(base, data)
+
+def layered_save(path: Path, data):
+    json_save(path, data if OVERLAY_BASE is None else _layer_diff(_base_json(path, {}), data))
+
+META   = layered_load(META_FILE, {})
+PKG_DB = layered_load(PKG_DB_FILE, {"installed": {}})
+
+def meta_key(p: Path) -> str: return _ov_rel(p) or ""
 
 def meta_get(p: Path) -> dict: return META.get(meta_key(p), {})
 def meta_set(p: Path, **kwargs):
     k = meta_key(p)
     if not k: return
     rec = META.get(k, {}); rec.update(kwargs); META[k] = rec
-    json_save(META_FILE, META)
-def pkg_db_save(): json_save(PKG_DB_FILE, PKG_DB)
+    layered_save(META_FILE, META); fs_changed(p, "attrib")
+def pkg_db_save(): layered_save(PKG_DB_FILE, PKG_DB)
+
+def set_system_root(root: Path):
+    """Wissel de actieve LinuxFS-root (benchmarks, meerdere roots): alle afgeleide paden + META/PKG_DB."""
+    global SYSTEM_ROOT, INIT_MARKER, META_FILE, PKG_DB_FILE, APT_REGISTRY, TOOLS_DIR, GIT_HOME, CACHE_DIR
+    global PERF_TRACE_FILE, PROFILE_DIR, JOBS_LOG_DIR, DAEMON_SOCK, DEDUP_INDEX, SNAPSHOT_DIR, PAGER_CACHE, PLUGIN_DIR, FS_JOURNAL, WHEELHOUSE, META, PKG_DB, OVERLAY_BASE
+    SYSTEM_ROOT  = Path(root).resolve()
+    OVERLAY_BASE = overlay_base_of(SYSTEM_ROOT)
+    INIT_MARKER  = SYSTEM_ROOT / ".linux_initialized"
+    META_FILE    = SYSTEM_ROOT / ".linux_meta.json"
+    PKG_DB_FILE  = SYSTEM_ROOT / ".linux_packages.json"
+    APT_REGISTRY = SYSTEM_ROOT / "etc" / "linux_apt_registry.json"
+    TOOLS_DIR    = SYSTEM_ROOT / "tools"
+    GIT_HOME     = TOOLS_DIR / "git"
+    if OVERLAY_BASE is not None and not GIT_HOME.exists(): GIT_HOME = OVERLAY_BASE / "tools" / "git"
+    CACHE_DIR    = SYSTEM_ROOT / "var" / "cache" / "downloads"
+    PERF_TRACE_FILE = SYSTEM_ROOT / "var" / "log" / "lterm-perf.jsonl"
+    PROFILE_DIR  = SYSTEM_ROOT / "var" / "log" / "profiles"
+    JOBS_LOG_DIR = SYSTEM_ROOT / "var" / "log" / "jobs"
+    DAEMON_SOCK  = SYSTEM_ROOT / "var" / "run" / "lterm.sock"
+    DEDUP_INDEX  = SYSTEM_ROOT / "var" / "cache" / "dedup-index.json"
+    SNAPSHOT_DIR = SYSTEM_ROOT.parent / f"{SYSTEM_ROOT.name}.snapshots"
+    PAGER_CACHE  = SYSTEM_ROOT / "var" / "cache" / "pager"
+    PLUGIN_DIR   = SYSTEM_ROOT / "usr" / "lib" / "lterm" / "plugins"
+    FS_JOURNAL   = SYSTEM_ROOT / "var" / "lib" / "lterm" / "fs-journal"
+    WHEELHOUSE   = SYSTEM_ROOT / "var" / "cache" / "wheels"
+    META   = layered_load(META_FILE, {})
+    PKG_DB = layered_load(PKG_DB_FILE, {"installed": {}})
+    invalidate_path_cache(); _fs_reset()
 
 # ---------- migratie KRNL → LinuxFS ----------
 def migrate_from_krnl_if_needed():
@@ -116,10 +197,10 @@ def migrate_from_krnl_if_needed():
 # ---------- init / ensure structure ----------
 def ensure_structure():
     """Idempotent: maak/herstelt alle basispaden & files, onafhankelijk van eerste run."""
-    for d in [f"home/{USER}","root","usr/bin","usr/lib","usr/share","etc","var/log","var/tmp","var/cache/downloads","bin","tmp","tools"]:
+    for d in [f"home/{USER}","root","usr/bin","usr/lib","usr/lib/lterm/plugins","usr/share","etc","var/log","var/tmp","var/cache/downloads","bin","tmp","tools"]:
         (SYSTEM_ROOT / d).mkdir(parents=True, exist_ok=True)
     motd = SYSTEM_ROOT / "etc" / "motd.txt"
-    if not motd.exists():
+    if not ov_effective(motd).exists():
         motd.write_text(f"Welcome to {BRAND} {VERSION}!\nType 'help' for commands.\n", encoding="utf-8")
     if not APT_REGISTRY.exists(): json_save(APT_REGISTRY, {"packages": {}})
     if not META_FILE.exists(): json_save(META_FILE, {})
@@ -127,23 +208,83 @@ def ensure_structure():
     if not INIT_MARKER.exists(): INIT_MARKER.write_text("initialized\n")
 
 # ---------- deps ----------
-def pip_install(package: str) -> bool:
+# Alles wat ontbreekt gaat in één pip-aanroep. Staan er wheels in var/cache/wheels (ook in de
+# overlay-base), dan installeert pip offline met --no-index --find-links; 'wheelhouse fill' vult die map.
+WHEELHOUSE = SYSTEM_ROOT / "var" / "cache" / "wheels"
+BOOTSTRAP_PIP_PACKAGES = REQUIRED_PIP_PACKAGES + ["gdown"]
+_PIP = {"ok": False, "tried": set()}   # per sessie: pip niet bij elk commando opnieuw starten
+
+def _pip_module(spec: str) -> str:
+    return re.split(r"[=<>!~\[; ]", spec, 1)[0].replace("-", "_")
+
+def pip_missing(packages) -> list:
+    return [p for p in packages if importlib.util.find_spec(_pip_module(p)) is None]
+
+def wheelhouse() -> Path|None:
+    """De wheelhouse als er wheels in staan (upper of overlay-base), anders None."""
+    d = ov_effective(WHEELHOUSE)
     try:
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "--upgrade", package])
-        return True
-    except Exception:
-        return False
+        with os.scandir(d) as it:
+            if any(e.name.endswith(".whl") for e in it): return d
+    except OSError: pass
+    return None
+
+def pip_install(*packages: str) -> bool:
+    """Eén pip install voor alle pakketten; eerst offline uit de wheelhouse, lukt dat niet dan één keer online."""
+    if not packages: return True
+    base = [sys.executable, "-m", "pip", "install", "--disable-pip-version-check"]
+    wh = wheelhouse(); tries = []
+    if wh is not None: tries.append(["--no-index", "--find-links", str(wh)])
+    tries.append(["--upgrade"] + (["--find-links", str(wh)] if wh is not None else []))
+    for extra in tries:
+        try:
+            subprocess.check_call(base + extra + list(packages)); importlib.invalidate_caches()
+            return True
+        except Exception: pass
+    return False
 
-def ensure_pip_deps():
-    missing=[]
-    for pkg in REQUIRED_PIP_PACKAGES:
-        try: __import__(pkg.split("==")[0].split(">=")[0])
-        except Exception: missing.append(pkg)
-    if not missing: return
-    print(f"{c(C_YELLOW)}Installing Python packages: {', '.join(missing)} ...{c(C_RESET)}")
-    ok=True
-    for p in missing: ok = pip_install(p) and ok
+def ensure_pip_deps(extra=()) -> bool:
+    """REQUIRED_PIP_PACKAGES (+ extra) aanwezig? Ontbrekende in één keer installeren; elk pakket hooguit één poging per sessie."""
+    if _PIP["ok"] and not extra: return True
+    missing = [p for p in pip_missing(list(REQUIRED_PIP_PACKAGES) + list(extra)) if p not in _PIP["tried"]]
+    if not missing:
+        ok = not pip_missing(list(REQUIRED_PIP_PACKAGES) + list(extra))
+        if ok and not extra: _PIP["ok"] = True
+        return ok
+    _PIP["tried"].update(missing)
+    src = " (offline wheelhouse)" if wheelhouse() is not None else ""
+    print(f"{c(C_YELLOW)}Installing Python packages: {', '.join(missing)}{src} ...{c(C_RESET)}")
+    ok = pip_install(*missing)
     if not ok: print(f"{c(C_RED)}Warning:{c(C_RESET)} Some Python packages failed; continuing...")
+    return ok and not pip_missing(missing)
+
+def cmd_wheelhouse(args: list):
+    usage = "Usage: wheelhouse [status] | fill [PKG...] | clear"
+    sub, rest = (args[0], args[1:]) if args else ("status", [])
+    if sub == "status":
+        wh = wheelhouse()
+        if wh is None: print(f"(no wheels in {WHEELHOUSE}; 'wheelhouse fill' to create it)"); return
+        wheels = sorted(e for e in os.listdir(wh) if e.endswith(".whl"))
+        size = sum(os.path.getsize(wh / w) for w in wheels)
+        print(f"{wh}: {len(wheels)} wheels, {_fmt_bytes(size)}")
+        for w in wheels: print(f"  {w}")
+        missing = pip_missing(BOOTSTRAP_PIP_PACKAGES)
+        print(f"missing here: {', '.join(missing) if missing else '-'}")
+    elif sub == "fill":
+        # pip wheel i.p.v. pip download: ook sdists worden wheels, dus offline geen build-backend nodig
+        pkgs = list(dict.fromkeys(BOOTSTRAP_PIP_PACKAGES + rest)); dst = copy_up(WHEELHOUSE, data=False)
+        dst.mkdir(parents=True, exist_ok=True); t0 = time.perf_counter()
+        print(f"Building wheels for {', '.join(pkgs)} into {dst} ...")
+        try: rc = _spawn([sys.executable, "-m", "pip", "wheel", "--disable-pip-version-check", "--wheel-dir", str(dst)] + pkgs)
+        except OSError as e: _err(f"wheelhouse: {e}"); return
+        fs_changed(dst)
+        if rc: _err(f"wheelhouse: pip wheel failed (exit {rc})", rc); return
+        n = sum(1 for e in os.listdir(dst) if e.endswith(".whl"))
+        print(f"wheelhouse: {n} wheels in {_fmt_s(time.perf_counter() - t0)}; new roots install offline")
+    elif sub == "clear":
+        if os.path.isdir(WHEELHOUSE): shutil.rmtree(WHEELHOUSE); fs_changed(WHEELHOUSE, "delete")
+        print(f"wheelhouse: cleared {WHEELHOUSE}")
+    else: _err(usage, 2)
 
 # ---------- nette progress utils ----------
 def _fmt_s(seconds: float) -> str:
@@ -152,7 +293,7 @@ def _fmt_s(seconds: float) -> str:
 
 def _fmt_bytes(n: int) -> str:
     if n < 1024: return f"{n}B"
-    units = ["KB","MB","GB","TB"]
+    units = ["B","KB","MB","GB","TB"]
     x = float(n); i=0
     while x>=1024 and i < len(units)-1:
         x/=1024; i+=1
@@ -166,13 +307,202 @@ def _println(msg=""):
     sys.stdout.write(msg+"\n")
     sys.stdout.flush()
 
-# ---------- gdown (Drive) ----------
-def ensure_gdown() -> bool:
+# ---------- exit status ----------
+# Per thread (jobs/sessies later): status van het laatst uitgevoerde commando.
+_status_tls = threading.local()
+
+def set_status(code: int): _status_tls.code = int(code)
+def last_status() -> int: return getattr(_status_tls, "code", 0)
+
+def _err(msg: str, code: int = 1):
+    """Foutmelding naar stderr + exit-status van het lopende commando zetten."""
+    print(msg, file=sys.stderr); set_status(code)
+
+# ---------- instrumentatie (timings per command) ----------
+# Per gedispatcht commando: pad (builtin/passthrough/git/script/external), wall-tijd,
+# tijd in subprocessen en child-rusage. Histogrammen in-memory (diag perf), optioneel JSONL-trace.
+PERF_TRACE_FILE = SYSTEM_ROOT / "var" / "log" / "lterm-perf.jsonl"
+PERF = {"trace": os.getenv("LTERM_PERF_TRACE", "") == "1", "hist": {}, "path_hits": 0, "path_misses": 0}
+_perf_tls = threading.local()
+
+def _perf_stack() -> list:
+    st = getattr(_perf_tls, "stack", None)
+    if st is None: st = _perf_tls.stack = []
+    return st
+
+def _perf_mark(path: str):
+    """Zet het dispatch-pad van het lopende commando (genest: buitenste record telt)."""
+    for rec in _perf_stack(): rec["path"] = path
+
+def _win_rusage(handle=None) -> dict:
+    # Windows: CPU-tijd + piek working set via een proces-handle (None → dit proces)
+    try:
+        import ctypes
+        from ctypes import wintypes
+        class PMC(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t), ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+        k32 = ctypes.windll.kernel32; k32.GetCurrentProcess.restype = wintypes.HANDLE
+        h = wintypes.HANDLE(k32.GetCurrentProcess() if handle is None else int(handle))
+        ft = [wintypes.FILETIME() for _ in range(4)]
+        out = {}
+        if k32.GetProcessTimes(h, *[ctypes.byref(f) for f in ft]):
+            tick = lambda f: ((f.dwHighDateTime << 32) | f.dwLowDateTime) / 1e7
+            out["cpu_user"], out["cpu_sys"] = tick(ft[3]), tick(ft[2])
+        pmc = PMC(); pmc.cb = ctypes.sizeof(PMC)
+        if k32.K32GetProcessMemoryInfo(h, ctypes.byref(pmc), pmc.cb):
+            out["maxrss_kb"] = pmc.PeakWorkingSetSize // 1024
+        return out
+    except Exception:
+        return {}
+
+def _wait_child(p) -> int:
+    """Popen.wait() + rusage van precies dit child (POSIX: os.wait4, Windows: proces-handle)."""
+    ru = {}
+    if hasattr(os, "wait4"):
+        try:
+            _, status, r = os.wait4(p.pid, 0)
+            p.returncode = os.waitstatus_to_exitcode(status)
+            ru = {"cpu_user": r.ru_utime, "cpu_sys": r.ru_stime,
+                  "maxrss_kb": r.ru_maxrss // (1024 if sys.platform == "darwin" else 1)}
+        except ChildProcessError:
+            p.wait()
+    else:
+        p.wait()
+        if os.name == "nt": ru = _win_rusage(p._handle)
+    _perf_child(ru)
+    return p.returncode
+
+def _perf_child(ru: dict):
+    for rec in _perf_stack():
+        rec["spawns"] += 1
+        rec["cpu_user"] += ru.get("cpu_user", 0.0); rec["cpu_sys"] += ru.get("cpu_sys", 0.0)
+        rec["maxrss_kb"] = max(rec["maxrss_kb"], ru.get("maxrss_kb", 0))
+
+def _peak_rss_reset() -> bool:
+    """Reset de high-water-mark van dit proces (alleen Linux: /proc/self/clear_refs)."""
     try:
-        import gdown  # noqa: F401
+        with open("/proc/self/clear_refs", "w") as f: f.write("5")
         return True
     except Exception:
-        return pip_install("gdown")
+        return False
+
+def _peak_rss_bytes() -> int:
+    try:
+        for line in open("/proc/self/status", encoding="ascii"):
+            if line.startswith("VmHWM:"): return int(line.split()[1]) * 1024
+    except Exception: pass
+    if os.name == "nt": return _win_rusage().get("maxrss_kb", 0) * 1024
+    try:
+        import resource
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r if sys.platform == "darwin" else r * 1024
+    except Exception:
+        return 0
+
+def _spawn(argv, **kw) -> int:
+    """Start een subprocess, wacht erop en tel tijd/rusage bij het lopende commando.
+    Zonder expliciete stdio volgt het child de (per thread) omgeleide stdout/stderr/stdin."""
+    t0 = time.perf_counter()
+    try:
+        pumps = _child_stdio(kw); job = _job_popen(kw)
+        if "env" not in kw and getattr(_sess_tls, "session", None) is not None: kw["env"] = _base_env()
+        invalidate_path_cache()
+        p = subprocess.Popen(argv, **kw)
+        if job is not None: job.procs.append(p)
+        threads = []
+        for fn, join in pumps:
+            t = threading.Thread(target=fn, args=(p,), daemon=True); t.start()
+            if join: threads.append(t)
+        try:
+            rc = _wait_child(p)
+        finally:
+            for t in threads: t.join()
+            fs_poll()
+        set_status(rc)
+        return rc
+    finally:
+        dt = time.perf_counter() - t0
+        for rec in _perf_stack(): rec["sub"] += dt
+
+def _perf_new(line: str) -> dict:
+    name = line.split(None, 1)[0] if line.strip() else ""
+    return {"cmd": ALIASES.get(name, name), "path": "builtin", "wall": 0.0, "sub": 0.0, "spawns": 0,
+            "cpu_user": 0.0, "cpu_sys": 0.0, "maxrss_kb": 0}
+
+def _perf_record(rec: dict):
+    key = (rec["path"], rec["cmd"])
+    h = PERF["hist"].get(key)
+    if h is None:
+        h = PERF["hist"][key] = {"n": 0, "wall": 0.0, "sub": 0.0, "cpu": 0.0, "max": 0.0, "maxrss_kb": 0, "buckets": [0]*24}
+    h["n"] += 1; h["wall"] += rec["wall"]; h["sub"] += rec["sub"]
+    h["cpu"] += rec["cpu_user"] + rec["cpu_sys"]; h["max"] = max(h["max"], rec["wall"])
+    h["maxrss_kb"] = max(h["maxrss_kb"], rec["maxrss_kb"])
+    # log2-buckets in ms: 0 → <1ms, i → [2^(i-1), 2^i) ms
+    ms = rec["wall"] * 1000.0
+    h["buckets"][min(23, 0 if ms < 1 else int(math.log2(ms)) + 1)] += 1
+    if PERF["trace"]:
+        try:
+            PERF_TRACE_FILE.parent.mkdir(parents=True, exist_ok=True)
+            with open(PERF_TRACE_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": round(time.time(), 3), **rec}) + "\n")
+        except Exception: pass
+
+def _perf_run(line: str, cwd: Path, git_env_cache: dict|None):
+    """Voer één commando uit in een eigen perf-record; geeft (cwd, git_env_cache, record)."""
+    rec = _perf_new(line); st = _perf_stack(); st.append(rec)
+    t0 = time.perf_counter()
+    try:
+        cwd, git_env_cache = _execute(line, cwd, git_env_cache)
+    finally:
+        rec["wall"] = time.perf_counter() - t0
+        st.pop()
+        _perf_record(rec)
+    return cwd, git_env_cache, rec
+
+def _bucket_pct(h: dict, q: float) -> float:
+    # percentiel (ms) als bovengrens van de log2-bucket
+    want = max(1, math.ceil(h["n"] * q)); seen = 0
+    for i, cnt in enumerate(h["buckets"]):
+        seen += cnt
+        if seen >= want: return float(2 ** i) if i else 1.0
+    return h["max"] * 1000.0
+
+def print_perf_breakdown(rec: dict):
+    print(f"real    {rec['wall']:.3f}s")
+    print(f"sub     {rec['sub']:.3f}s  ({rec['spawns']} subprocess{'en' if rec['spawns'] != 1 else ''})")
+    print(f"user    {rec['cpu_user']:.3f}s  (children)")
+    print(f"sys     {rec['cpu_sys']:.3f}s  (children)")
+    print(f"maxrss  {_fmt_bytes(rec['maxrss_kb']*1024) if rec['maxrss_kb'] else '—'}")
+    print(f"path    {rec['path']}")
+
+def cmd_diag_perf(args: list):
+    sub = args[0] if args else ""
+    if sub == "reset":
+        PERF["hist"].clear(); PERF["path_hits"] = PERF["path_misses"] = 0
+        print("perf: histograms reset"); return
+    if sub == "trace":
+        if len(args) > 1 and args[1] in ("on", "off"): PERF["trace"] = args[1] == "on"
+        print(f"perf trace: {'on' if PERF['trace'] else 'off'} → {PERF_TRACE_FILE}"); return
+    if not PERF["hist"]:
+        print("perf: nog geen metingen" + ("" if SHOW_TIMINGS else " (SHOW_TIMINGS = False)")); return
+    rows = [["PATH", "CMD", "N", "AVG", "P50", "P95", "MAX", "SUB", "CPU", "MAXRSS"]]
+    for (path, cmd), h in sorted(PERF["hist"].items(), key=lambda kv: -kv[1]["wall"]):
+        rows.append([path, cmd, str(h["n"]), f"{h['wall']/h['n']*1000:.1f}ms",
+                     f"≤{_bucket_pct(h, .5):.0f}ms", f"≤{_bucket_pct(h, .95):.0f}ms", f"{h['max']*1000:.1f}ms",
+                     f"{h['sub']:.2f}s", f"{h['cpu']:.2f}s", _fmt_bytes(h["maxrss_kb"]*1024) if h["maxrss_kb"] else "—"])
+    for line in _pad_cols(rows): print(line)
+    hits, misses = PERF["path_hits"], PERF["path_misses"]
+    print(f"\nresolve_path cache: {hits} hits / {misses} misses"
+          f" ({hits / max(1, hits + misses) * 100:.1f}% hit rate, {len(_PATH_CACHE)} entries)")
+    print(f"trace: {'on' if PERF['trace'] else 'off'}  (diag perf trace on|off, diag perf reset)")
+
+# ---------- gdown (Drive) ----------
+def ensure_gdown() -> bool:
+    return ensure_pip_deps(["gdown"])
 
 def download_git_zip_via_your_snippet(url: str, label: str) -> Path | None:
     """
@@ -343,12 +673,320 @@ def ensure_git_config_and_ssh(virtual_home: Path):
     return env_over
 
 # ---------- path helpers ----------
+# resolve() kost lstat/readlink per component: resultaten worden gememoized op (cwd, arg) —
+# absolute en ~-paden zonder cwd. Builtins die de boom muteren (en elk child-proces) legen de cache.
+_PATH_CACHE = {}
+_PATH_CACHE_MAX = 65536
+
+def invalidate_path_cache():
+    _PATH_CACHE.clear(); _OV_HIDDEN.clear()
+
 def resolve_path(cwd: Path, arg: str) -> Path:
     if not arg: return cwd
-    if arg == "/": return SYSTEM_ROOT
-    if arg.startswith("/"): return (SYSTEM_ROOT / arg.lstrip("/")).resolve()
-    if arg.startswith("~"): return (SYSTEM_ROOT/"home"/USER/(arg[2:] if arg.startswith("~/") else "")).resolve()
-    return (cwd/arg).resolve()
+    key = arg if arg[0] in "/~" else (cwd, arg)
+    p = _PATH_CACHE.get(key)
+    if p is not None:
+        PERF["path_hits"] += 1; return p
+    PERF["path_misses"] += 1
+    head, sep, tail = arg.rpartition("/")
+    if tail and tail not in (".", "..", "~") and "\\" not in arg and (sep or arg[0] != "~"):
+        # map via de cache, dan alleen de laatste component: één lstat i.p.v. realpath over het hele pad
+        base = resolve_path(cwd, head or "/") if sep else cwd
+        p = ov_effective(base / tail)
+        if os.path.islink(p): p = ov_effective(p.resolve())
+    elif arg == "/": p = SYSTEM_ROOT
+    elif arg.startswith("/"): p = ov_effective((SYSTEM_ROOT / arg.lstrip("/")).resolve())
+    elif arg.startswith("~"): p = ov_effective((SYSTEM_ROOT/"home"/USER/(arg[2:] if arg.startswith("~/") else "")).resolve())
+    else: p = ov_effective((cwd/arg).resolve())
+    if len(_PATH_CACHE) >= _PATH_CACHE_MAX: _PATH_CACHE.clear()
+    _PATH_CACHE[key] = p
+    return p
+
+def path_inside_root(p: Path) -> bool:
+    """Ligt een (genormaliseerd) pad binnen SYSTEM_ROOT (of de overlay-base)? Stringprefix i.p.v. de parents-keten."""
+    return _ov_rel(p) is not None
+
+# ---------- overlay (copy-on-write roots) ----------
+# Lezen valt door naar OVERLAY_BASE; schrijven kopieert eerst omhoog naar SYSTEM_ROOT (copy-up);
+# verwijderen van iets dat in de base bestaat laat een whiteout .wh.<naam> achter. Een whiteout op
+# een map verbergt de hele base-subboom, ook als de map daarna in de upper opnieuw wordt gemaakt.
+# Externe programma's zien alleen de upper (hun cwd wordt bij cd omhooggekopieerd).
+_WH = ".wh."
+_OV_HIDDEN = {}
+
+def _ov_rel(p) -> str|None:
+    """Pad t.o.v. de root als 'a/b' ('' = root) — voor upper- én base-paden; None als het erbuiten ligt."""
+    s = os.path.normcase(str(p))
+    for root in (SYSTEM_ROOT, OVERLAY_BASE):
+        if root is None: continue
+        r = os.path.normcase(str(root)).rstrip(os.sep)
+        if s == r: return ""
+        if s.startswith(r + os.sep): return str(p)[len(r)+1:].replace(os.sep, "/")
+    return None
+
+def _ov_hidden(rel: str) -> bool:
+    """Is de base-versie van rel (of van een voorouder) weggehaald met een whiteout?"""
+    if not rel: return False
+    hit = _OV_HIDDEN.get(rel)
+    if hit is None:
+        parent, _, name = rel.rpartition("/")
+        hit = _OV_HIDDEN[rel] = _ov_hidden(parent) or os.path.lexists(os.path.join(SYSTEM_ROOT, parent, _WH + name))
+    return hit
+
+def ov_upper(p: Path) -> Path:
+    if OVERLAY_BASE is None: return p
+    rel = _ov_rel(p)
+    return p if rel is None else SYSTEM_ROOT / rel if rel else SYSTEM_ROOT
+
+def ov_effective(p: Path) -> Path:
+    """Host-pad om te lezen: de upper als die bestaat, anders de base (tenzij whiteout), anders de upper."""
+    if OVERLAY_BASE is None: return p
+    rel = _ov_rel(p)
+    if not rel: return p if rel is None else SYSTEM_ROOT
+    up = SYSTEM_ROOT / rel
+    if os.path.lexists(up) or _ov_hidden(rel): return up
+    b = OVERLAY_BASE / rel
+    return b if os.path.lexists(b) else up
+
+def copy_up(p: Path, data: bool = True) -> Path:
+    """Maak p schrijfbaar: ouders als mappen omhoog, een base-map/-bestand (met data=True ook de inhoud)
+    naar de upper. Geeft het upper-pad; zonder overlay gewoon p."""
+    if OVERLAY_BASE is None: return p
+    up = ov_upper(p); rel = _ov_rel(up)
+    if not rel or os.path.lexists(up): return up
+    if not os.path.isdir(up.parent): copy_up(up.parent)
+    b = OVERLAY_BASE / rel
+    if _ov_hidden(rel) or not os.path.lexists(b): return up
+    if os.path.isdir(b) and not os.path.islink(b): os.mkdir(up); shutil.copymode(b, up)
+    elif not data: return up
+    elif os.path.islink(b): os.symlink(os.readlink(b), up)
+    else: shutil.copy2(b, up)
+    invalidate_path_cache()
+    return up
+
+def ov_whiteout(p: Path):
+    """Na verwijderen uit de upper: verberg een gelijknamige base-versie."""
+    if OVERLAY_BASE is None: return
+    rel = _ov_rel(p)
+    if not rel or _ov_hidden(rel) or not os.path.lexists(OVERLAY_BASE / rel): return
+    up = SYSTEM_ROOT / rel
+    copy_up(up.parent); (up.parent / (_WH + up.name)).touch()
+    invalidate_path_cache()
+
+def ov_scandir(d: Path) -> list:
+    """Samengevoegde inhoud van map d als [(naam, host-pad)]: upper wint, base vult aan, whiteouts verbergen."""
+    up = ov_upper(d); out = {}; wh = set()
+    try: names = os.listdir(up)
+    except OSError: names = []
+    for n in names:
+        if n.startswith(_WH): wh.add(n[len(_WH):])
+        else: out[n] = up / n
+    rel = _ov_rel(up) if OVERLAY_BASE is not None else None
+    if rel is not None and not _ov_hidden(rel):
+        try: names = os.listdir(OVERLAY_BASE / rel if rel else OVERLAY_BASE)
+        except OSError: names = []
+        for n in names:
+            if n not in out and n not in wh: out[n] = (OVERLAY_BASE / rel if rel else OVERLAY_BASE) / n
+    return sorted(out.items())
+
+def ov_iterdir(d: Path) -> list:
+    return list(d.iterdir()) if OVERLAY_BASE is None else [p for _, p in ov_scandir(d)]
+
+def ov_walk(top: Path):
+    """os.walk over de samengevoegde boom: (map, submappen, bestanden) met upper-view mappaden."""
+    if OVERLAY_BASE is None: yield from ((Path(r), ds, fs) for r, ds, fs in os.walk(top)); return
+    stack = [ov_upper(top)]
+    while stack:
+        d = stack.pop(); dirs = []; files = []
+        for n, hp in ov_scandir(d):
+            (dirs if os.path.isdir(hp) and not os.path.islink(hp) else files).append(n)
+        yield d, dirs, files
+        stack.extend(d / n for n in reversed(dirs))
+
+def scan_tree(top: Path):
+    """Gedeelde walk: (host-pad, lstat) voor alles onder top, gesorteerd en mappen vóór hun inhoud.
+    Eén listdir per map; met een overlay de samengevoegde weergave (host-pad kan dan in de base liggen)."""
+    try: ents = ov_scandir(top) if OVERLAY_BASE is not None else sorted((n, top / n) for n in os.listdir(top))
+    except OSError: return
+    for _, hp in ents:
+        try: st = os.lstat(hp)
+        except OSError: continue
+        yield hp, st
+        if stat.S_ISDIR(st.st_mode): yield from scan_tree(hp)
+
+def ov_copytree(src: Path, dst: Path):
+    """copytree over de samengevoegde bron naar de upper (dirs_exist_ok)."""
+    if OVERLAY_BASE is None: shutil.copytree(src, dst, dirs_exist_ok=True); return
+    dst = copy_up(dst, data=False); dst.mkdir(parents=True, exist_ok=True)
+    for n, hp in ov_scandir(src):
+        if os.path.isdir(hp) and not os.path.islink(hp): ov_copytree(hp, dst / n)
+        else: shutil.copy2(hp, copy_up(dst / n, data=False))
+
+def ov_remove(p: Path, recursive: bool = False):
+    """rm/rmdir: haal p uit de upper en verberg de base-versie; een map moet (samengevoegd) leeg zijn tenzij recursive."""
+    up = ov_upper(p)
+    if os.path.isdir(p) and not os.path.islink(p):
+        if not recursive and ov_scandir(p): raise OSError(f"Directory not empty: '{p.name}'")
+        if os.path.isdir(up): shutil.rmtree(up)
+    elif os.path.lexists(up): os.unlink(up)
+    ov_whiteout(p); invalidate_path_cache()
+
+def ov_move(src: Path, dst: Path):
+    """mv: rename binnen de upper als de bron daar volledig staat, anders kopie + verwijderen (base blijft intact)."""
+    if OVERLAY_BASE is None: src.rename(dst); return
+    up = ov_upper(src); rel = _ov_rel(up)
+    if os.path.lexists(up) and (rel is None or _ov_hidden(rel) or not os.path.lexists(OVERLAY_BASE / rel)):
+        up.rename(copy_up(dst, data=False))
+    elif os.path.isdir(src) and not os.path.islink(src): ov_copytree(src, dst); ov_remove(src, recursive=True); return
+    else: shutil.copy2(src, copy_up(dst, data=False)); ov_remove(src); return
+    ov_whiteout(src); invalidate_path_cache()
+
+# ---------- wijzigingsfeed (change events) ----------
+# Muterende builtins melden (pad, soort, tijd) met fs_changed; caches abonneren zich met fs_subscribe.
+# Een melding op een map geldt voor de hele subboom. Alles gaat ook naar een compact journaal
+# (var/lib/lterm/fs-journal, regels "ms<TAB>soort<TAB>pad"), zodat een latere sessie vanaf een cursor
+# "GEN:OFFSET" bijleest i.p.v. opnieuw te scannen. Wat externe programma's wijzigen vangt fs_poll op:
+# één stat per bewaakt pad (fs_watch), na elk child-proces en bij elke prompt.
+FS_JOURNAL = SYSTEM_ROOT / "var" / "lib" / "lterm" / "fs-journal"
+FS_JOURNAL_MAX = 4 << 20
+FS_WATCH_MAX = 256
+FS_KINDS = {"create": "c", "modify": "m", "delete": "d", "attrib": "a", "rescan": "r"}
+_FS_KIND = {v: k for k, v in FS_KINDS.items()}
+_FS_HDR = "#lterm-fsj 1 "
+_FS = {"subs": [], "watch": {}, "fh": None, "gen": 0, "size": 0, "floor": 0, "lock": threading.RLock()}
+
+def fs_subscribe(fn):
+    """fn(pad, soort, ts) bij elke wijziging; pad is het LinuxFS-pad ('/etc/hosts'). Bruikbaar als decorator."""
+    _FS["subs"].append(fn); return fn
+
+def fs_affects(event: str, path: str) -> bool:
+    """Raakt een melding op event het pad path (zelfde pad, voorouder of nakomeling)?"""
+    if event == path or event == "/" or path == "/": return True
+    return path.startswith(event + "/") or event.startswith(path + "/")
+
+def _fs_esc(v: str) -> str: return v.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+def _fs_unesc(v: str) -> str: return re.sub(r"\\(.)", lambda m: {"t": "\t", "n": "\n"}.get(m.group(1), m.group(1)), v)
+
+def _fs_header() -> tuple:
+    """(generatie, grootte) van het journaal; (None, 0) als het ontbreekt of onleesbaar is."""
+    try:
+        with open(FS_JOURNAL, "rb") as f: hdr = f.readline().decode("ascii"); size = os.fstat(f.fileno()).st_size
+        return (int(hdr[len(_FS_HDR):]), size) if hdr.startswith(_FS_HDR) else (None, 0)
+    except (OSError, ValueError): return None, 0
+
+def _fs_records(data: bytes):
+    for line in data.decode("utf-8", "surrogateescape").splitlines():
+        ms, _, rest = line.partition("\t"); k, _, v = rest.partition("\t")
+        if ms.isdigit() and k in _FS_KIND: yield int(ms) / 1000, _FS_KIND[k], _fs_unesc(v)
+
+def _fs_compact(gen) -> tuple:
+    """Nieuwe generatie: per pad alleen de laatste melding. Cursors van de oude generatie verlopen."""
+    last = {}
+    try:
+        with open(FS_JOURNAL, "rb") as f: f.readline(); data = f.read()
+        for ts, k, v in _fs_records(data[:data.rfind(b"\n") + 1]): last.pop(v, None); last[v] = (ts, k)
+    except OSError: pass
+    gen = (gen or 0) + 1; tmp = FS_JOURNAL.with_suffix(".tmp")
+    body = _FS_HDR + f"{gen}\n" + "".join(f"{int(ts * 1000)}\t{FS_KINDS[k]}\t{_fs_esc(v)}\n" for v, (ts, k) in last.items())
+    with open(tmp, "w", encoding="utf-8", errors="surrogateescape", newline="\n") as f: f.write(body)
+    os.replace(tmp, FS_JOURNAL)
+    return gen, len(body.encode("utf-8", "surrogateescape"))
+
+def _fs_open():
+    """Journaal lazy openen voor append; te groot of onleesbaar → eerst compacteren."""
+    fh = _FS["fh"]
+    if fh is not None:
+        # een andere sessie kan intussen gecompacteerd hebben (nieuw bestand): dan heropenen
+        try:
+            if os.fstat(fh.fileno()).st_ino == os.stat(FS_JOURNAL).st_ino: return fh
+        except OSError: pass
+        fh.close(); _FS["fh"] = None
+    FS_JOURNAL.parent.mkdir(parents=True, exist_ok=True)
+    gen, size = _fs_header()
+    if gen is None or size > FS_JOURNAL_MAX: gen, size = _fs_compact(gen)
+    _FS.update(fh=open(FS_JOURNAL, "a", encoding="utf-8", errors="surrogateescape", newline="\n"), gen=gen, size=size, floor=size)
+    return _FS["fh"]
+
+def _fs_rewatch(paths: list):
+    # eigen wijzigingen niet nog eens via fs_poll melden: bewaakte paden (en hun ouders) opnieuw stat'en
+    w = _FS["watch"]
+    for key, (v, mt) in list(w.items()):
+        if not any(v == p or v == p.rsplit("/", 1)[0] or v.startswith(p + "/") for p in paths): continue
+        try: w[key] = (v, os.stat(key).st_mtime_ns)
+        except OSError: w.pop(key, None)
+
+def fs_changed(paths, kind: str = "modify"):
+    """Meld een wijziging: één pad of een lijst (host-paden; buiten de root genegeerd)."""
+    if isinstance(paths, (str, Path)): paths = (paths,)
+    evs = [v for v in ("/" + r if r is not None else None for r in map(_ov_rel, paths)) if v is not None]
+    if not evs: return
+    invalidate_path_cache(); ts = time.time()
+    with _FS["lock"]:
+        try:
+            fh = _fs_open()
+            data = "".join(f"{int(ts * 1000)}\t{FS_KINDS[kind]}\t{_fs_esc(v)}\n" for v in evs)
+            fh.write(data); fh.flush(); _FS["size"] += len(data)
+            if _FS["size"] > max(FS_JOURNAL_MAX, 2 * _FS["floor"]):
+                # pas compacteren als het minstens verdubbeld is: veel verschillende paden → niet bij elke melding
+                fh.close(); _FS["fh"] = None; _FS["gen"], _FS["size"] = _fs_compact(_FS["gen"]); _FS["floor"] = _FS["size"]
+        except OSError: pass
+        _fs_rewatch(evs); subs = list(_FS["subs"])
+    for v in dict.fromkeys(evs):
+        for fn in subs:
+            try: fn(v, kind, ts)
+            except Exception: pass
+
+def fs_journal_since(cursor: str|None = None) -> tuple:
+    """(meldingen, nieuwe cursor) sinds cursor ("0:0" = vanaf het begin); meldingen = None als de cursor
+    verlopen is (journaal gecompacteerd): dan volledig herscannen en verder vanaf de nieuwe cursor."""
+    with _FS["lock"]:
+        if _FS["fh"] is not None: _FS["fh"].flush()
+        gen, _ = _fs_header()
+        if gen is None: return ([] if cursor in (None, "0:0") else None), "0:0"
+        try:
+            with open(FS_JOURNAL, "rb") as f:
+                start = len(f.readline())
+                if cursor not in (None, "0:0"):
+                    cg, _, off = cursor.partition(":")
+                    if cg != str(gen) or not off.isdigit() or int(off) < start: return None, f"{gen}:{start}"
+                    start = int(off)
+                f.seek(start); data = f.read()
+        except OSError: return None, "0:0"
+    data = data[:data.rfind(b"\n") + 1]
+    return list(_fs_records(data)), f"{gen}:{start + len(data)}"
+
+def fs_watch(p):
+    """Host-pad bewaken op mtime-wijzigingen door externe programma's; hooguit FS_WATCH_MAX (oudste eruit)."""
+    key = str(p); w = _FS["watch"]
+    if key in w: return
+    rel = _ov_rel(p)
+    if rel is None: return
+    try: mt = os.stat(key).st_mtime_ns
+    except OSError: return
+    with _FS["lock"]:
+        if len(w) >= FS_WATCH_MAX: w.pop(next(iter(w)), None)
+        w[key] = ("/" + rel if rel else "/", mt)
+
+def fs_poll() -> int:
+    """Eén stat per bewaakt pad: andere mtime → modify, verdwenen → delete. Geeft het aantal meldingen."""
+    changed, gone = [], []
+    with _FS["lock"]:
+        w = _FS["watch"]
+        for key, (v, mt) in list(w.items()):
+            try: now = os.stat(key).st_mtime_ns
+            except OSError: gone.append(key); w.pop(key, None); continue
+            if now != mt: w[key] = (v, now); changed.append(key)
+    if changed: fs_changed(changed, "modify")
+    if gone: fs_changed(gone, "delete")
+    return len(changed) + len(gone)
+
+def _fs_reset():
+    # nieuwe root (set_system_root): journaal dicht, bewaakte paden vergeten
+    with _FS["lock"]:
+        if _FS["fh"] is not None:
+            try: _FS["fh"].close()
+            except OSError: pass
+        _FS.update(fh=None, gen=0, size=0, floor=0); _FS["watch"].clear()
 
 def prompt(cwd: Path) -> str:
     symbol = "#" if IS_ROOT else "$"
@@ -397,24 +1035,25 @@ def cmd_ls(cwd:Path,args:list):
     targets=[cwd] if not paths else [resolve_path(cwd,p) for p in paths]
     multi=len(targets)>1
     for t in targets:
-        if not t.exists(): print(f"ls: cannot access '{t}': No such file or directory"); continue
+        if not t.exists(): _err(f"ls: cannot access '{t}': No such file or directory"); continue
         if t.is_file():
             print_ls_entry(t,long,human)
             if not long: print()
             continue
         if multi:
-            rel=t.relative_to(SYSTEM_ROOT) if t!=SYSTEM_ROOT else Path("/")
+            rel=_ov_rel(t) or "/"
             print(f"{rel}:")
         try:
-            entries=sorted(t.iterdir(), key=lambda x:x.name.lower()); out=0
+            entries=sorted(ov_iterdir(t), key=lambda x:x.name.lower()); out=0
             for e in entries:
                 if not show_all and e.name.startswith("."): continue
                 print_ls_entry(e,long,human); out+=1
             if not long and out: print()
-        except PermissionError: print("ls: permission denied")
+        except PermissionError: _err("ls: permission denied")
 
 # ---------- core commands ----------
 def cmd_rm(cwd:Path,args:list):
+    invalidate_path_cache()
     force=recursive=False; targets=[]
     for a in args:
         if a.startswith("-"):
@@ -424,137 +1063,691 @@ def cmd_rm(cwd:Path,args:list):
     for t in targets:
         p=resolve_path(cwd,t)
         if not p.exists():
-            if not force: print(f"rm: cannot remove '{t}': No such file or directory")
+            if not force: _err(f"rm: cannot remove '{t}': No such file or directory")
             continue
         try:
-            if p.is_dir():
+            if OVERLAY_BASE is not None: ov_remove(p, recursive)
+            elif p.is_dir():
                 if recursive: shutil.rmtree(p, ignore_errors=force)
                 else: p.rmdir()
             else: p.unlink(missing_ok=True)
+            fs_changed(p,"delete")
             k=meta_key(p)
-            if k in META: del META[k]; json_save(META_FILE,META)
+            if k in META: del META[k]; layered_save(META_FILE,META)
         except Exception as e:
-            if not force: print(f"rm: cannot remove '{t}': {e}")
+            if not force: _err(f"rm: cannot remove '{t}': {e}")
 
 def cmd_cp(cwd:Path,args:list):
+    invalidate_path_cache()
     recursive=False; rest=[]
     for a in args:
         if a.startswith("-"):
             if "r" in a: recursive=True
         else: rest.append(a)
-    if len(rest)<2: print("Usage: cp [-r] <src>... <dst>"); return
-    *srcs,dst=rest; dst_p=resolve_path(cwd,dst)
+    if len(rest)<2: _err("Usage: cp [-r] <src>... <dst>"); return
+    *srcs,dst=rest; done=[]
     try:
+        dst_p=copy_up(resolve_path(cwd,dst), data=False)
         if len(srcs)>1:
             dst_p.mkdir(parents=True, exist_ok=True)
             for s in srcs:
                 sp=resolve_path(cwd,s)
-                if not sp.exists(): print(f"cp: cannot stat '{s}': No such file"); continue
+                if not sp.exists(): _err(f"cp: cannot stat '{s}': No such file"); continue
                 if sp.is_dir():
-                    if not recursive: print(f"cp: -r not specified; omitting directory '{s}'"); continue
-                    shutil.copytree(sp,dst_p/sp.name,dirs_exist_ok=True)
-                else: shutil.copy2(sp,dst_p/sp.name)
+                    if not recursive: _err(f"cp: -r not specified; omitting directory '{s}'"); continue
+                    ov_copytree(sp,dst_p/sp.name)
+                else: shutil.copy2(sp,copy_up(dst_p/sp.name, data=False))
+                done.append(dst_p/sp.name)
         else:
             sp=resolve_path(cwd,srcs[0])
-            if not sp.exists(): print(f"cp: cannot stat '{srcs[0]}': No such file"); return
+            if not sp.exists(): _err(f"cp: cannot stat '{srcs[0]}': No such file"); return
             if sp.is_dir():
-                if not recursive: print(f"cp: -r not specified; omitting directory '{srcs[0]}'"); return
-                shutil.copytree(sp,dst_p,dirs_exist_ok=True)
+                if not recursive: _err(f"cp: -r not specified; omitting directory '{srcs[0]}'"); return
+                ov_copytree(sp,dst_p)
             else:
                 dst_p.parent.mkdir(parents=True, exist_ok=True)
                 shutil.copy2(sp,dst_p)
-    except Exception as e: print(f"cp: {e}")
+            done.append(dst_p)
+    except Exception as e: _err(f"cp: {e}")
+    finally: fs_changed(done,"create")
 
 def cmd_mv(cwd:Path,args:list):
-    if len(args)<2: print("Usage: mv <src>... <dst>"); return
-    *srcs,dst=args; dst_p=resolve_path(cwd,dst)
+    invalidate_path_cache()
+    if len(args)<2: _err("Usage: mv <src>... <dst>"); return
+    *srcs,dst=args
     try:
+        dst_p=copy_up(resolve_path(cwd,dst), data=False)
         if len(srcs)>1:
             dst_p.mkdir(parents=True, exist_ok=True)
             for s in srcs:
                 sp=resolve_path(cwd,s)
-                if not sp.exists(): print(f"mv: cannot stat '{s}': No such file"); continue
-                sp.rename(dst_p/sp.name)
+                if not sp.exists(): _err(f"mv: cannot stat '{s}': No such file"); continue
+                ov_move(sp,dst_p/sp.name); fs_changed(sp,"delete"); fs_changed(dst_p/sp.name,"create")
         else:
             sp=resolve_path(cwd,srcs[0])
-            if not sp.exists(): print(f"mv: cannot stat '{srcs[0]}': No such file"); return
+            if not sp.exists(): _err(f"mv: cannot stat '{srcs[0]}': No such file"); return
             dst_p.parent.mkdir(parents=True, exist_ok=True)
-            sp.rename(dst_p)
-    except Exception as e: print(f"mv: {e}")
-
-def cmd_echo(cwd:Path,args:list):
-    if not args: print(); return
-    if ">>" in args or ">" in args:
-        op=max((i for i,a in enumerate(args) if a in (">",">>")), default=-1)
-        if op==-1 or op==len(args)-1: print("shell: redirection parse error"); return
-        text=" ".join(args[:op]); fname=args[op+1]
-        fpath=resolve_path(cwd,fname); fpath.parent.mkdir(parents=True, exist_ok=True)
-        mode="a" if args[op]==">>" else "w"
-        with open(fpath,mode,encoding="utf-8") as f: f.write(text+("\n" if not text.endswith("\n") else ""))
-    else: print(" ".join(args))
-
-def cmd_grep(cwd:Path,args:list):
+            ov_move(sp,dst_p); fs_changed(sp,"delete"); fs_changed(dst_p,"create")
+    except Exception as e: _err(f"mv: {e}")
+
+# Stream-builtins: generator(cwd, args, invoer) → str-regels; return-waarde = exit-status.
+# invoer is een regel-iterator (pipe / < bestand) of None.
+def gen_echo(cwd:Path,args:list,inp):
+    yield " ".join(args)+"\n"
+    return 0
+
+def gen_cat(cwd:Path,args:list,inp):
+    if not args:
+        if inp is None: _err("cat: missing file operand"); return 1
+        yield from inp; return 0
+    rc=0
+    for a in args:
+        if a=="-":
+            if inp is not None: yield from inp
+            continue
+        p=resolve_path(cwd,a)
+        if p.is_file():
+            with open(p,encoding="utf-8",errors="surrogateescape",newline="") as f: yield from f
+        else: _err(f"cat: {a}: No such file"); rc=1
+    return rc
+
+def gen_grep(cwd:Path,args:list,inp):
     ignore=rec=False; rest=[]
     for a in args:
         if a.startswith("-"):
             if "i" in a: ignore=True
             if "r" in a: rec=True
         else: rest.append(a)
-    if not rest: print("Usage: grep [options] PATTERN [FILE...]"); return
+    if not rest: _err("Usage: grep [options] PATTERN [FILE...]", 2); return 2
     pattern,*files=rest
-    def match(s:str)->bool: return (pattern.lower() in s.lower()) if ignore else (pattern in s)
-    results=[]
+    if ignore: pl=pattern.lower(); match=lambda s: pl in s.lower()
+    else: match=lambda s: pattern in s
+    found=False; rc=0
+    def scan(p:Path):
+        nonlocal found
+        rel=_ov_rel(p)
+        with open(p,encoding="utf-8",errors="ignore") as f:
+            for i,line in enumerate(f,1):
+                line=line.rstrip("\r\n")
+                if match(line): found=True; yield f"{rel}:{i}:{line}\n"
     try:
         if rec:
             roots=[resolve_path(cwd,f) for f in files] if files else [cwd]
             for r in roots:
                 if not r.exists(): continue
-                for p in r.rglob("*"):
-                    if p.is_file():
-                        try:
-                            for i,line in enumerate(p.read_text(errors="ignore").splitlines(),1):
-                                if match(line): results.append(f"{p.relative_to(SYSTEM_ROOT)}:{i}:{line}")
-                        except Exception: pass
+                for d,_,names in ov_walk(r):
+                    for n in names:
+                        p=ov_effective(d/n)
+                        if p.is_file():
+                            try: yield from scan(p)
+                            except OSError: pass
+        elif not files:
+            if inp is None: _err("grep: no file specified", 2); return 2
+            for line in inp:
+                if match(line.rstrip("\r\n")): found=True; yield line if line.endswith("\n") else line+"\n"
         else:
-            if not files: print("grep: no file specified"); return
             for f in files:
                 p=resolve_path(cwd,f)
-                if p.exists() and p.is_file():
-                    try:
-                        for i,line in enumerate(p.read_text(errors="ignore").splitlines(),1):
-                            if match(line): results.append(f"{p.relative_to(SYSTEM_ROOT)}:{i}:{line}")
-                    except Exception: pass
-                else: print(f"grep: {f}: No such file or directory")
-        if results: print("\n".join(results))
-    except Exception as e: print(f"grep: {e}")
+                if p.is_file():
+                    try: yield from scan(p)
+                    except OSError: pass
+                else: _err(f"grep: {f}: No such file or directory", 2); rc=2
+    except Exception as e: _err(f"grep: {e}", 2); return 2
+    return rc or (0 if found else 1)
+
+# sha256sum/sha1sum/md5sum: bestanden parallel gehasht (hashlib geeft de GIL vrij); grote
+# bestanden via mmap in stukken van HASH_SLICE, zonder kopie naar Python-buffers.
+HASH_MMAP_MIN = 1 << 20
+HASH_SLICE = 8 << 20
+
+def hash_file(path, algo: str = "sha256") -> str|None:
+    """Hex-digest van een bestand, None als het niet te lezen is."""
+    h = hashlib.new(algo)
+    try:
+        with open(path, "rb", buffering=0) as f:
+            if os.fstat(f.fileno()).st_size >= HASH_MMAP_MIN:
+                try:
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m, memoryview(m) as mv:
+                        for off in range(0, len(mv), HASH_SLICE): h.update(mv[off:off + HASH_SLICE])
+                    return h.hexdigest()
+                except (OSError, ValueError): h = hashlib.new(algo)   # geen mmap mogelijk: gewoon lezen
+            buf = bytearray(1 << 20); mv = memoryview(buf)
+            while True:
+                n = f.readinto(buf)
+                if not n: break
+                h.update(mv[:n])
+    except OSError: return None
+    return h.hexdigest()
+
+_HASH_LINE = re.compile(r"^\\?([0-9a-fA-F]+) [ *](.+)$")
+_HASH_TAG = re.compile(r"^\\?(\w+) \((.+)\) = ([0-9a-fA-F]+)$")
+
+def gen_hashsum(algo: str, cwd: Path, args: list, inp):
+    prog = f"{algo}sum"; check = quiet = status_only = tag = rec = False; jobs = None; names = []
+    it = iter(args)
+    for a in it:
+        if a in ("-c", "--check"): check = True
+        elif a == "--quiet": quiet = True
+        elif a == "--status": status_only = True
+        elif a == "--tag": tag = True
+        elif a in ("-r", "--recursive"): rec = True
+        elif a in ("-b", "-t", "--binary", "--text"): pass
+        elif a == "-j" or a.startswith("-j") and a[2:].isdigit():
+            v = a[2:] or next(it, "")
+            if not v.isdigit() or int(v) < 1: _err(f"{prog}: -j: invalid thread count", 1); return 1
+            jobs = int(v)
+        elif a.startswith("-") and a != "-": _err(f"{prog}: invalid option -- '{a.lstrip('-')}'", 1); return 1
+        else: names.append(a)
+    if not names: names = ["-"]
+    if "-" in names and inp is None: _err(f"{prog}: missing file operand", 1); return 1
+    stdin_data = "".join(inp).encode("utf-8", "surrogateescape") if "-" in names else b""
+    def digest(host):
+        if host is None: h = hashlib.new(algo); h.update(stdin_data); return h.hexdigest()
+        return hash_file(host, algo)
+    rc = 0
+    with ThreadPoolExecutor(jobs) as ex:
+        if not check:
+            todo = []
+            for n in names:
+                if n == "-": todo.append((n, None)); continue
+                p = resolve_path(cwd, n)
+                if p.is_dir():
+                    if not rec: _err(f"{prog}: {n}: Is a directory"); rc = 1; continue
+                    top = len(str(ov_upper(p))) + 1
+                    todo += [(n.rstrip("/") + "/" + str(ov_upper(hp))[top:].replace(os.sep, "/"), hp)
+                             for hp, st in scan_tree(p) if stat.S_ISREG(st.st_mode)]
+                elif p.exists(): todo.append((n, p))
+                else: _err(f"{prog}: {n}: No such file or directory"); rc = 1
+            for (n, _), dig in zip(todo, ex.map(digest, [h for _, h in todo])):
+                if dig is None: _err(f"{prog}: {n}: read error"); rc = 1
+                elif tag: yield f"{algo.upper()} ({n}) = {dig}\n"
+                else: yield f"{dig}  {n}\n"
+            return rc
+        width = hashlib.new(algo).digest_size * 2
+        for src in names:
+            if src == "-": lines = stdin_data.decode("utf-8", "surrogateescape").splitlines()
+            else:
+                p = resolve_path(cwd, src)
+                try:
+                    with open(p, encoding="utf-8", errors="surrogateescape") as f: lines = f.read().splitlines()
+                except OSError: _err(f"{prog}: {src}: No such file or directory"); rc = 1; continue
+            todo = []; bad = 0
+            for line in lines:
+                m = _HASH_LINE.match(line); t = None if m else _HASH_TAG.match(line)
+                if m and len(m.group(1)) == width: todo.append((m.group(2), m.group(1).lower()))
+                elif t and t.group(1).lower() == algo and len(t.group(3)) == width: todo.append((t.group(2), t.group(3).lower()))
+                elif line.strip(): bad += 1
+            if not todo:
+                _err(f"{prog}: {src}: no properly formatted checksum lines found"); rc = 1; continue
+            failed = unread = 0
+            for (n, want), dig in zip(todo, ex.map(lambda n: hash_file(resolve_path(cwd, n), algo), [n for n, _ in todo])):
+                if dig is None:
+                    unread += 1
+                    if not status_only: _err(f"{prog}: {n}: No such file or directory"); yield f"{n}: FAILED open or read\n"
+                elif dig != want:
+                    failed += 1
+                    if not status_only: yield f"{n}: FAILED\n"
+                elif not (quiet or status_only): yield f"{n}: OK\n"
+            if not status_only:
+                if bad: print(f"{prog}: WARNING: {bad} line{'s are' if bad > 1 else ' is'} improperly formatted", file=sys.stderr)
+                if unread: print(f"{prog}: WARNING: {unread} listed file{'s' if unread > 1 else ''} could not be read", file=sys.stderr)
+                if failed: print(f"{prog}: WARNING: {failed} computed checksum{'s' if failed > 1 else ''} did NOT match", file=sys.stderr)
+            if failed or unread: rc = 1
+    return rc
+
+# cat/head/tail: nooit een heel bestand in het geheugen. cat schrijft buiten een pipeline ruwe
+# byte-blokken naar stdout.buffer (binair-veilig); tail -n leest vanaf het einde terug in blokken
+# tot er genoeg newlines zijn; tail -f pollt met een wachttijd die verdubbelt tot -s (standaard 1s).
+CAT_CHUNK = 1 << 20
+TAIL_BLOCK = 64 << 10
+
+def cat_raw(cwd: Path, args: list, inp, bout) -> int:
+    """cat naar een binaire stdout: bestanden in blokken van CAT_CHUNK, '-' als regels van stdin."""
+    rc = 0; buf = bytearray(CAT_CHUNK); mv = memoryview(buf)
+    if not args and inp is None: _err("cat: missing file operand"); return 1
+    try:
+        for a in args or ["-"]:
+            if a == "-":
+                for line in inp or (): bout.write(line.encode("utf-8", "surrogateescape"))
+                continue
+            p = resolve_path(cwd, a)
+            if not p.is_file(): _err(f"cat: {a}: No such file"); rc = 1; continue
+            with open(p, "rb", buffering=0) as f:
+                while True:
+                    n = f.readinto(buf)
+                    if not n: break
+                    bout.write(mv[:n])
+        bout.flush()
+    except BrokenPipeError: return 141
+    return rc
+
+def _ht_opts(prog: str, args: list) -> dict|None:
+    o = {"n": 10, "c": None, "plus": False, "f": False, "q": False, "v": False, "s": 1.0, "files": []}
+    it = iter(args)
+    for a in it:
+        if prog == "tail" and a in ("-f", "--follow"): o["f"] = True
+        elif a in ("-q", "--quiet", "--silent"): o["q"] = True
+        elif a in ("-v", "--verbose"): o["v"] = True
+        elif a[:2] in ("-n", "-c") or a.startswith(("--lines=", "--bytes=")):
+            v = a.partition("=")[2] if a.startswith("--") else a[2:] or next(it, "")
+            if prog == "tail" and v.startswith("+"): o["plus"] = True; v = v[1:]
+            if not v.isdigit(): _err(f"{prog}: invalid number of {'bytes' if 'c' in a[:3] or 'bytes' in a else 'lines'}: '{v}'"); return None
+            if a.startswith(("-c", "--bytes")): o["c"] = int(v)
+            else: o["n"] = int(v); o["c"] = None
+        elif prog == "tail" and (a == "-s" or a.startswith("--sleep-interval=")):
+            v = a.partition("=")[2] or next(it, "")
+            try: o["s"] = max(0.05, float(v))
+            except ValueError: _err(f"tail: invalid number of seconds: '{v}'"); return None
+        elif re.fullmatch(r"-\d+", a): o["n"] = int(a[1:]); o["c"] = None
+        elif a.startswith("-") and a != "-": _err(f"{prog}: invalid option -- '{a.lstrip('-')}'"); return None
+        else: o["files"].append(a)
+    return o
+
+def _tail_offset(f, n: int, size: int) -> int:
+    """Byte-offset van het begin van de laatste n regels; alleen de staart wordt gelezen."""
+    if n <= 0 or not size: return size
+    f.seek(size - 1); pos = size - 1 if f.read(1) == b"\n" else size   # afsluitende newline telt niet mee
+    while pos > 0:
+        step = min(TAIL_BLOCK, pos); pos -= step; f.seek(pos); blk = f.read(step); i = len(blk)
+        while True:
+            i = blk.rfind(b"\n", 0, i)
+            if i < 0: break
+            n -= 1
+            if not n: return pos + i + 1
+    return 0
+
+def _text_from(f, off: int):
+    f.seek(off)
+    return io.TextIOWrapper(f, encoding="utf-8", errors="surrogateescape", newline="")
+
+def gen_head(cwd: Path, args: list, inp):
+    o = _ht_opts("head", args)
+    if o is None: return 1
+    files = o["files"] or ["-"]; hdr = o["v"] or (len(files) > 1 and not o["q"]); rc = 0
+    for k, a in enumerate(files):
+        if a != "-":
+            p = resolve_path(cwd, a)
+            if not p.is_file(): _err(f"head: cannot open '{a}' for reading: No such file or directory"); rc = 1; continue
+        if hdr: yield f"{chr(10) if k else ''}==> {'standard input' if a == '-' else a} <==\n"
+        if a == "-":
+            if o["c"] is None: yield from islice(inp or (), o["n"])
+            else:
+                left = o["c"]
+                for line in inp or ():
+                    if left <= 0: break
+                    b = line.encode("utf-8", "surrogateescape")[:left]; left -= len(b)
+                    yield b.decode("utf-8", "surrogateescape")
+        elif o["c"] is not None:
+            with open(p, "rb") as f: yield f.read(o["c"]).decode("utf-8", "surrogateescape")
+        else:
+            with open(p, encoding="utf-8", errors="surrogateescape", newline="") as f: yield from islice(f, o["n"])
+    return rc
+
+def gen_tail(cwd: Path, args: list, inp):
+    o = _ht_opts("tail", args)
+    if o is None: return 1
+    files = o["files"] or ["-"]; hdr = o["v"] or (len(files) > 1 and not o["q"]); rc = 0; follow = []
+    for k, a in enumerate(files):
+        if a != "-":
+            p = resolve_path(cwd, a)
+            if not p.is_file(): _err(f"tail: cannot open '{a}' for reading: No such file or directory"); rc = 1; continue
+        if hdr: yield f"{chr(10) if k else ''}==> {'standard input' if a == '-' else a} <==\n"
+        if a == "-":
+            src = inp or ()
+            if o["plus"]: yield from islice(src, max(0, (o["c"] if o["c"] is not None else o["n"]) - 1), None)
+            elif o["c"] is None: yield from deque(src, maxlen=o["n"])
+            else:
+                tail = b"".join(line.encode("utf-8", "surrogateescape") for line in deque(src, maxlen=o["c"] + 1))
+                yield tail[-o["c"]:].decode("utf-8", "surrogateescape") if o["c"] else ""
+            continue
+        with open(p, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if o["c"] is not None: off = min(size, max(0, o["c"] - 1)) if o["plus"] else max(0, size - o["c"])
+            elif o["plus"]:
+                txt = _text_from(f, 0); yield from islice(txt, max(0, o["n"] - 1), None); txt.detach(); off = size
+            else: off = _tail_offset(f, o["n"], size)
+            if off < size:
+                f.seek(off)
+                while True:
+                    chunk = f.read(CAT_CHUNK)
+                    if not chunk: break
+                    yield chunk.decode("utf-8", "surrogateescape")
+            follow.append([a, p, f.tell() if off < size else size])
+    if o["f"] and follow: yield from _tail_follow(follow, o["s"], len(follow) > 1 and not o["q"])
+    return rc
+
+def _tail_follow(files: list, sleep_max: float, hdr: bool):
+    """tail -f: nieuwe bytes van groeiende bestanden; kortere wachttijd zodra er weer data is."""
+    delay = 0.05; last = files[-1][0]; decs = {a: codecs.getincrementaldecoder("utf-8")("surrogateescape") for a, _, _ in files}
+    handles = {}
+    try:
+        while True:
+            job = getattr(_job_tls, "job", None)
+            if job is not None and job.killed: return
+            got = False
+            for ent in files:
+                a, p, pos = ent
+                try: size = os.stat(p).st_size
+                except OSError: continue
+                if size < pos: print(f"tail: {a}: file truncated", file=sys.stderr); ent[2] = pos = 0
+                if size == pos: continue
+                f = handles.get(a)
+                if f is None: f = handles[a] = open(p, "rb")
+                f.seek(pos)
+                if hdr and last != a: yield f"\n==> {a} <==\n"; last = a
+                while pos < size:
+                    chunk = f.read(min(CAT_CHUNK, size - pos))
+                    if not chunk: break
+                    pos += len(chunk); yield decs[a].decode(chunk)
+                ent[2] = pos; got = True
+            if got: delay = 0.05; sys.stdout.flush()
+            else: time.sleep(delay); delay = min(delay * 2, sleep_max)
+    finally:
+        for f in handles.values(): f.close()
+
+# ---------- sort/uniq/wc (extern sorteren, tellen in grote buffers) ----------
+# sort leest tot SORT_BUF (geschat) in het geheugen, sorteert dat stuk en schrijft het als run naar
+# /var/tmp; daarna een k-weg merge (heapq.merge, stabiel). Meer dan SORT_FANIN runs → tussentijds
+# samenvoegen. Vergelijken gaat op codepunt (zoals LC_ALL=C). Onbekende opties → extern sort.
+SORT_BUF = 64 << 20
+SORT_FANIN = 32
+WC_CHUNK = 1 << 22
+_SORT_LONG = {"numeric-sort": "n", "reverse": "r", "unique": "u", "ignore-case": "f", "ignore-leading-blanks": "b", "stable": "s",
+              "key": "k", "field-separator": "t", "output": "o", "buffer-size": "S", "temporary-directory": "T"}
+_SORT_KEY = re.compile(r"(\d+)(?:\.(\d+))?([bfnr]*)(?:,(\d+)(?:\.(\d+))?([bfnr]*))?")
+_SORT_FIELD = re.compile(r"[ \t]*[^ \t]+")
+_SORT_NUM = re.compile(r"\s*(-?(?:\d+\.?\d*|\.\d+))")
+_SORT_UNITS = {"": 1 << 10, "b": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+_WC_NONCONT = bytes(b for b in range(256) if not 0x80 <= b < 0xc0)
+
+def _sort_opts(args: list) -> dict|None:
+    o = {"n": False, "r": False, "u": False, "f": False, "b": False, "s": False, "t": None, "keys": [],
+         "o": None, "S": SORT_BUF, "T": None, "files": []}
+    def val(ch, v):
+        if v is None: return False
+        if ch == "k":
+            m = _SORT_KEY.fullmatch(v)
+            if not m or m.group(1) == "0": return False
+            f1, c1, fl1, f2, c2, fl2 = m.groups()
+            o["keys"].append((int(f1), int(c1 or 1), int(f2) if f2 else None, int(c2 or 0), set(fl1 + (fl2 or ""))))
+        elif ch == "t":
+            if len(v) != 1: return False
+            o["t"] = v
+        elif ch == "S":
+            m = re.fullmatch(r"(\d+)([bkmgt]?)", v.lower())
+            if not m: return False
+            o["S"] = max(1 << 16, int(m.group(1)) * _SORT_UNITS[m.group(2)])
+        else: o[ch] = v
+        return True
+    it = iter(args)
+    for a in it:
+        if a == "--": o["files"].extend(it); break
+        if a.startswith("--"):
+            name, eq, v = a[2:].partition("=")
+            ch = _SORT_LONG.get(name)
+            if ch is None: return None
+            if ch in "ktoST":
+                if not val(ch, v if eq else next(it, None)): return None
+            elif eq: return None
+            else: o[ch] = True
+        elif a.startswith("-") and a != "-":
+            for i, ch in enumerate(a[1:], 1):
+                if ch in "nrufbs": o[ch] = True
+                elif ch in "ktoST":
+                    if not val(ch, a[i + 1:] or next(it, None)): return None
+                    break
+                else: return None
+        else: o["files"].append(a)
+    return o
+
+def _sort_num(s: str) -> float:
+    m = _SORT_NUM.match(s)
+    return float(m.group(1)) if m else 0.0
+
+class _Rev:
+    """Omgekeerde ordening voor een sleutel met eigen r-vlag (tegen de globale richting in)."""
+    __slots__ = ("v",)
+    def __init__(self, v): self.v = v
+    def __lt__(self, other): return other.v < self.v
+    def __eq__(self, other): return self.v == other.v
+
+def _sort_key(o: dict, last_resort: bool):
+    """Sleutelfunctie: tuple van veldsleutels (+ hele regel als laatste redmiddel, zoals GNU)."""
+    glob = {c for c in "bfnr" if o[c]}
+    specs = [(f1, c1, f2, c2, fl or glob) for f1, c1, f2, c2, fl in o["keys"]] or [(1, 1, None, 0, glob)]
+    sep = o["t"]; whole = not o["keys"]
+    if whole and not glob & {"b", "f", "n"}:
+        return lambda line: line[:-1]      # hele regel: geen tuple nodig (laatste redmiddel valt ermee samen)
+    def part(s, ends, f1, c1, f2, c2, fl):
+        # veld f begint waar veld f-1 eindigt (GNU: voorloop-blanks horen bij het veld); ends[i] = einde veld i+1
+        if whole: st, en = 0, len(s)
+        else:
+            st = (ends[f1 - 2] + (sep is not None) if f1 - 2 < len(ends) else len(s)) if f1 > 1 else 0
+            if "b" in fl:
+                while st < len(s) and s[st] in " \t": st += 1
+            st += c1 - 1
+            if f2 is None: en = len(s)
+            elif not c2: en = ends[f2 - 1] if f2 - 1 < len(ends) else len(s)
+            else:
+                en = (ends[f2 - 2] + (sep is not None) if f2 - 2 < len(ends) else len(s)) if f2 > 1 else 0
+                if "b" in fl:
+                    while en < len(s) and s[en] in " \t": en += 1
+                en += c2
+        k = s[st:min(en, len(s))] if en > st else ""
+        if "b" in fl and whole: k = k.lstrip(" \t")
+        if "f" in fl: k = k.upper()
+        if "n" in fl: k = _sort_num(k)
+        return _Rev(k) if ("r" in fl) != o["r"] else k
+    def key(line):
+        s = line[:-1]
+        if whole: ends = None
+        elif sep is None: ends = [m.end() for m in _SORT_FIELD.finditer(s)]
+        else:
+            ends = []; pos = -1
+            while True:
+                pos = s.find(sep, pos + 1)
+                if pos < 0: break
+                ends.append(pos)
+            ends.append(len(s))
+        k = tuple(part(s, ends, *sp) for sp in specs)
+        return k + (s,) if last_resort else k
+    return key
+
+def _sort_run(tmpdir: Path, n: int, lines) -> Path:
+    run = tmpdir / f"run{n:05d}"
+    with open(run, "w", encoding="utf-8", errors="surrogateescape", newline="") as f: f.writelines(lines)
+    return run
+
+def gen_sort(cwd: Path, args: list, inp):
+    o = _sort_opts(args)
+    if o is None: _err("sort: invalid option", 2); return 2
+    srcs = []
+    for a in o["files"] or ["-"]:
+        if a == "-": srcs.append(None); continue
+        p = resolve_path(cwd, a)
+        if not p.is_file(): _err(f"sort: cannot read: {a}: No such file or directory", 2); return 2
+        srcs.append(p)
+    key = _sort_key(o, not (o["s"] or o["u"])); rev = o["r"]
+    tmp_base = resolve_path(cwd, o["T"]) if o["T"] else SYSTEM_ROOT / "var" / "tmp"
+    tmpdir = None; runs = []; buf = []; used = 0; handles = []
+    try:
+        for p in srcs:
+            f = open(p, encoding="utf-8", errors="surrogateescape", newline="") if p is not None else None
+            try:
+                for line in (f if f is not None else inp or ()):
+                    if not line.endswith("\n"): line += "\n"
+                    buf.append(line); used += len(line) + 80
+                    if used < o["S"]: continue
+                    if tmpdir is None:
+                        tmp_base.mkdir(parents=True, exist_ok=True); tmpdir = Path(tempfile.mkdtemp(prefix="sort-", dir=tmp_base))
+                    buf.sort(key=key, reverse=rev); runs.append(_sort_run(tmpdir, len(runs), buf)); buf = []; used = 0
+                    if len(runs) >= SORT_FANIN:
+                        # tussentijds samenvoegen: houdt het aantal open runs begrensd
+                        fs = [open(r, encoding="utf-8", errors="surrogateescape", newline="") for r in runs]
+                        try: merged = _sort_run(tmpdir, len(runs), heapq.merge(*fs, key=key, reverse=rev))
+                        finally:
+                            for h in fs: h.close()
+                        for r in runs: r.unlink()
+                        runs = [merged.rename(tmpdir / "run00000")]
+            finally:
+                if f is not None: f.close()
+        buf.sort(key=key, reverse=rev)
+        if runs:
+            handles = [open(r, encoding="utf-8", errors="surrogateescape", newline="") for r in runs]
+            out = heapq.merge(*handles, buf, key=key, reverse=rev)
+        else: out = iter(buf)
+        if o["u"]: out = _uniq_key(out, key)
+        if o["o"] is not None:
+            dst = copy_up(resolve_path(cwd, o["o"])); dst.parent.mkdir(parents=True, exist_ok=True)
+            with open(dst, "w", encoding="utf-8", errors="surrogateescape", newline="") as f: f.writelines(out)
+            fs_changed(dst)
+        else: yield from out
+    finally:
+        for h in handles: h.close()
+        if tmpdir is not None: shutil.rmtree(tmpdir, ignore_errors=True)
+    return 0
+
+def _uniq_key(lines, key):
+    prev = object()
+    for line in lines:
+        k = key(line)
+        if k != prev: yield line; prev = k
+
+def _uniq_opts(args: list) -> dict|None:
+    o = {"c": False, "d": False, "u": False, "i": False, "files": []}
+    long = {"--count": "c", "--repeated": "d", "--unique": "u", "--ignore-case": "i"}
+    for a in args:
+        if a in long: o[long[a]] = True
+        elif a.startswith("-") and a != "-":
+            if a.startswith("--") or set(a[1:]) - set("cdui"): return None
+            for ch in a[1:]: o[ch] = True
+        else: o["files"].append(a)
+    return o if len(o["files"]) <= 2 else None
+
+def gen_uniq(cwd: Path, args: list, inp):
+    o = _uniq_opts(args)
+    if o is None: _err("uniq: invalid option", 1); return 1
+    src, dst = (o["files"] + ["-", "-"])[:2]
+    f = None
+    if src != "-":
+        p = resolve_path(cwd, src)
+        if not p.is_file(): _err(f"uniq: {src}: No such file or directory"); return 1
+        f = open(p, encoding="utf-8", errors="surrogateescape", newline="")
+    norm = str.lower if o["i"] else None
+    def groups():
+        prev = pk = None; n = 0
+        for line in (f if f is not None else inp or ()):
+            if not line.endswith("\n"): line += "\n"
+            k = norm(line) if norm else line
+            if n and k == pk: n += 1; continue
+            if n: yield n, prev
+            prev, pk, n = line, k, 1
+        if n: yield n, prev
+    def lines():
+        for n, line in groups():
+            if (o["d"] and n < 2) or (o["u"] and n > 1): continue
+            yield f"{n:7d} {line}" if o["c"] else line
+    try:
+        if dst != "-":
+            out = copy_up(resolve_path(cwd, dst))
+            with open(out, "w", encoding="utf-8", errors="surrogateescape", newline="") as w: w.writelines(lines())
+            fs_changed(out)
+        else: yield from lines()
+    finally:
+        if f is not None: f.close()
+    return 0
+
+def _wc_opts(args: list) -> dict|None:
+    o = {"l": False, "w": False, "m": False, "c": False, "files": []}
+    long = {"--lines": "l", "--words": "w", "--chars": "m", "--bytes": "c"}
+    for a in args:
+        if a in long: o[long[a]] = True
+        elif a.startswith("-") and a != "-":
+            if a.startswith("--") or set(a[1:]) - set("lwmc"): return None
+            for ch in a[1:]: o[ch] = True
+        else: o["files"].append(a)
+    if not (o["l"] or o["w"] or o["m"] or o["c"]): o["l"] = o["w"] = o["c"] = True
+    return o
+
+def _wc_count(chunks, words: bool, chars: bool) -> list:
+    """[regels, woorden, tekens, bytes] over grote buffers; woorden die over een buffergrens lopen tellen één keer."""
+    n = [0, 0, 0, 0]; inword = False
+    for b in chunks:
+        n[0] += b.count(b"\n"); n[3] += len(b)
+        if chars: n[2] += len(b) - len(b.translate(None, _WC_NONCONT))
+        if words and b:
+            n[1] += len(b.split()) - (inword and not b[:1].isspace())
+            inword = not b[-1:].isspace()
+    return n
+
+def _wc_lines(inp):
+    buf = []; size = 0
+    for line in inp:
+        b = line.encode("utf-8", "surrogateescape"); buf.append(b); size += len(b)
+        if size >= WC_CHUNK: yield b"".join(buf); buf = []; size = 0
+    if buf: yield b"".join(buf)
+
+def gen_wc(cwd: Path, args: list, inp):
+    o = _wc_opts(args)
+    if o is None: _err("wc: invalid option", 1); return 1
+    cols = [i for i, c in enumerate("lwmc") if o[c]]; rows = []; rc = 0; piped = False
+    for a in o["files"] or ["-"]:
+        if a == "-": piped = True; rows.append((_wc_count(_wc_lines(inp or ()), o["w"], o["m"]), "" if not o["files"] else "-")); continue
+        p = resolve_path(cwd, a)
+        if p.is_dir(): _err(f"wc: {a}: Is a directory"); rows.append(([0, 0, 0, 0], a)); rc = 1; continue
+        if not p.is_file(): _err(f"wc: {a}: No such file or directory"); rc = 1; continue
+        if cols == [3]: rows.append(([0, 0, 0, p.stat().st_size], a)); continue
+        with open(p, "rb") as f: rows.append((_wc_count(iter(lambda: f.read(WC_CHUNK), b""), o["w"], o["m"]), a))
+    if len(rows) > 1: rows.append(([sum(r[0][i] for r in rows) for i in range(4)], "total"))
+    w = 1 if len(cols) == 1 and len(rows) == 1 else 7 if piped else len(str(max((r[0][3] for r in rows), default=0)))
+    for n, name in rows: yield " ".join(f"{n[i]:>{w}}" for i in cols) + (f" {name}" if name else "") + "\n"
+    return rc
+
+TEXT_OPTS = {"sort": _sort_opts, "uniq": _uniq_opts, "wc": _wc_opts}   # opties onbekend → extern programma
+
+PIPE_BUILTINS = {"echo": gen_echo, "cat": gen_cat, "grep": gen_grep, "head": gen_head, "tail": gen_tail,
+                 "sort": gen_sort, "uniq": gen_uniq, "wc": gen_wc,
+                 "sha256sum": lambda cwd, args, inp: gen_hashsum("sha256", cwd, args, inp),
+                 "sha1sum": lambda cwd, args, inp: gen_hashsum("sha1", cwd, args, inp),
+                 "md5sum": lambda cwd, args, inp: gen_hashsum("md5", cwd, args, inp)}
+
+def run_gen_builtin(cwd:Path,cmd:str,args:list):
+    """Stream-builtin buiten een pipeline: regels naar (omgeleide) stdout, status zetten."""
+    if cmd == "cat":
+        bout = _bin_stdout()
+        if bout is not None: set_status(cat_raw(cwd, args, _io_stdin(), bout)); return
+    set_status(_emit(PIPE_BUILTINS[cmd](cwd,args,_io_stdin())) or 0)
 
 def cmd_chmod(cwd:Path,args:list):
-    if len(args)<2: print("Usage: chmod MODE FILE..."); return
+    if len(args)<2: _err("Usage: chmod MODE FILE..."); return
     mode=args[0]
     for n in args[1:]:
         p=resolve_path(cwd,n)
-        if not p.exists(): print(f"chmod: cannot access '{n}': No such file or directory"); continue
+        if not p.exists(): _err(f"chmod: cannot access '{n}': No such file or directory"); continue
         meta_set(p,mode=mode)
 
 def cmd_chown(cwd:Path,args:list):
-    if len(args)<2: print("Usage: chown OWNER[:GROUP] FILE..."); return
+    if len(args)<2: _err("Usage: chown OWNER[:GROUP] FILE..."); return
     og=args[0]; owner,group=(og.split(":",1)+[og])[:2] if ":" in og else (og,og)
     for n in args[1:]:
         p=resolve_path(cwd,n)
-        if not p.exists(): print(f"chown: cannot access '{n}': No such file or directory"); continue
+        if not p.exists(): _err(f"chown: cannot access '{n}': No such file or directory"); continue
         meta_set(p,owner=owner,group=group)
 
 def cmd_rmdir(cwd:Path,args:list):
-    if not args: print("Usage: rmdir DIR..."); return
+    invalidate_path_cache()
+    if not args: _err("Usage: rmdir DIR..."); return
     for a in args:
         p=resolve_path(cwd,a)
-        try: p.rmdir()
-        except Exception as e: print(f"rmdir: failed to remove '{a}': {e}")
+        try: p.rmdir() if OVERLAY_BASE is None or not p.is_dir() else ov_remove(p); fs_changed(p,"delete")
+        except Exception as e: _err(f"rmdir: failed to remove '{a}': {e}")
 
 def cmd_which(args:list):
-    if not args: print("which: missing operand"); return
+    if not args: _err("which: missing operand"); return
     for n in args:
-        path=shutil.which(n); print(path if path else f"{n} not found")
+        path=shutil.which(n)
+        if path: print(path)
+        else: _err(f"{n} not found")
 
 # ---------- APT/DPKG (simulation) ----------
 def http_download(url:str)->bytes:
@@ -584,17 +1777,20 @@ def deb_extract_data_tar(deb_bytes:bytes):
 
 def dpkg_install_deb(cwd:Path, deb_path:Path, pkg_name_hint:str=None):
     data=deb_path.read_bytes(); tarf=deb_extract_data_tar(data); installed=[]
+    invalidate_path_cache()
     try:
         for m in tarf.getmembers():
             if not (m.isfile() or m.isdir()): continue
-            rel=Path(m.name.lstrip("./")); dest=(SYSTEM_ROOT/rel).resolve()
-            if SYSTEM_ROOT not in dest.parents and dest!=SYSTEM_ROOT: continue
+            rel=Path(m.name.lstrip("./")); dest=resolve_path(SYSTEM_ROOT,"/"+rel.as_posix())
+            if not path_inside_root(dest): continue
+            dest=copy_up(dest, data=False)
             if m.isdir(): dest.mkdir(parents=True, exist_ok=True)
             else:
                 dest.parent.mkdir(parents=True, exist_ok=True)
                 with tarf.extractfile(m) as src, open(dest,"wb") as out: shutil.copyfileobj(src,out)
             installed.append(str(rel.as_posix()))
-    finally: tarf.close()
+    finally:
+        tarf.close(); fs_changed([SYSTEM_ROOT/r for r in installed],"create")
     pkg_name=pkg_name_hint or deb_path.stem.split("_")[0]
     PKG_DB["installed"].setdefault(pkg_name,{"files":[]}); PKG_DB["installed"][pkg_name]["files"].extend(installed)
     pkg_db_save()
@@ -604,29 +1800,27 @@ def dpkg_install_deb(cwd:Path, deb_path:Path, pkg_name_hint:str=None):
     print("⚠️  Note: native Linux binaries from .deb do not run on Windows. Scripts/resources do.")
 
 def apt_install(cwd:Path,pkg_name:str):
-    reg=json_load(APT_REGISTRY,{"packages":{}}).get("packages",{})
+    reg=layered_load(APT_REGISTRY,{"packages":{}}).get("packages",{})
     meta=reg.get(pkg_name)
     if not meta or "url" not in meta:
-        print(f"E: Unable to locate package {pkg_name}")
-        print(f"Tip: add the package + .deb URL in {APT_REGISTRY}")
+        _err(f"E: Unable to locate package {pkg_name}")
+        _err(f"Tip: add the package + .deb URL in {APT_REGISTRY}")
         return
     url=meta["url"]; print(f"Downloading {url} ...")
     try: deb_bytes=http_download(url)
-    except Exception as e: print(f"E: download error: {e}"); return
+    except Exception as e: _err(f"E: download error: {e}"); return
     tmp=SYSTEM_ROOT/"var"/"tmp"/f"{pkg_name}.deb"; tmp.parent.mkdir(parents=True, exist_ok=True)
     tmp.write_bytes(deb_bytes); dpkg_install_deb(cwd,tmp,pkg_name)
 
 def dpkg_remove(pkg:str):
+    invalidate_path_cache()
     rec=PKG_DB["installed"].get(pkg)
-    if not rec: print(f"dpkg: warning: {pkg} is not installed"); return
+    if not rec: _err(f"dpkg: warning: {pkg} is not installed"); return
     files=rec.get("files",[])
     for rel in sorted(files, key=lambda x: len(x.split("/")), reverse=True):
-        p=(SYSTEM_ROOT/rel).resolve()
+        p=resolve_path(SYSTEM_ROOT,"/"+rel)
         try:
-            if p.is_file(): p.unlink(missing_ok=True)
-            elif p.is_dir():
-                try: p.rmdir()
-                except OSError: pass
+            if p.is_file() or p.is_dir(): ov_remove(p); fs_changed(p,"delete")
         except Exception: pass
     del PKG_DB["installed"][pkg]; pkg_db_save(); print(f"Removed {pkg} (simulated).")
 
@@ -642,6 +1836,8 @@ ALIASES = {
     "gti":"git",
 }
 
+_RUNTIME_READY = {}
+
 def _path_to_msys(p: Path) -> str:
     p = p.resolve()
     s = str(p).replace("\\", "/")
@@ -669,22 +1865,36 @@ def find_bash()->str|None:
                 if os.path.exists(test): return test
     return None
 
-def run_in_bash(full_line: str, cwd: Path):
+def ensure_bash_runtime():
+    """Shims pas klaarzetten als Bash echt nodig is (batch-modus slaat de bootstrap over)."""
+    if _RUNTIME_READY.get("shims"): return
+    _RUNTIME_READY["shims"] = True
+    ensure_shims(); ensure_python3_shim()
+
+def bash_for_passthrough() -> str|None:
     if AUTO_DOWNLOAD_TOOLS and not find_portable_git_bash_in(GIT_HOME):
         ensure_portable_git_via_drive_pretty()
-    bash = find_bash()
-    if not bash:
-        print("bash: not found (PortableGit ZIP nodig via Google Drive)."); return
-    msys_cwd = _path_to_msys(cwd)
-    msys_shim = _path_to_msys(SYSTEM_ROOT/"usr"/"bin")
-    bash_cmd = f"export PATH={_bash_quote(msys_shim)}:\"$PATH\"; cd {_bash_quote(msys_cwd)} && {full_line}"
-    env = os.environ.copy()
+    return find_bash()
+
+def _bash_env() -> dict:
+    env = _base_env()
     # Verwijder WindowsApps ruis (breekt soms python)
     env["PATH"] = os.pathsep.join([p for p in env.get("PATH","").split(os.pathsep) if "WindowsApps" not in p])
+    return env
+
+def _bash_cmdline(text: str, cwd: Path) -> str:
+    msys_shim = _path_to_msys(SYSTEM_ROOT/"usr"/"bin")
+    return f"export PATH={_bash_quote(msys_shim)}:\"$PATH\"; cd {_bash_quote(_path_to_msys(cwd))} && {text}"
+
+def run_in_bash(full_line: str, cwd: Path):
+    bash = bash_for_passthrough()
+    if not bash:
+        _err("bash: not found (PortableGit ZIP nodig via Google Drive).", 127); return
+    ensure_bash_runtime()
     try:
-        subprocess.Popen([bash, "-lc", bash_cmd], cwd=str(cwd), env=env).wait()
+        _spawn([bash, "-lc", _bash_cmdline(full_line, cwd)], cwd=str(cwd), env=_bash_env())
     except Exception as e:
-        print(f"bash passthrough error: {e}")
+        _err(f"bash passthrough error: {e}")
 
 def list_all_bash_commands() -> list[str]:
     if AUTO_DOWNLOAD_TOOLS and not find_portable_git_bash_in(GIT_HOME):
@@ -704,24 +1914,24 @@ def list_all_bash_commands() -> list[str]:
 # ---------- Windows-equivalent wrappers ----------
 def cmd_ip(args:list, cwd:Path):
     sub = args[0] if args else "a"
-    if sub in ("a","addr","address"):  subprocess.Popen(["ipconfig","/all"], cwd=str(cwd)).wait()
-    elif sub in ("r","route"):         subprocess.Popen(["route","PRINT"], cwd=str(cwd)).wait()
-    elif sub in ("link",):             subprocess.Popen(["netsh","interface","show","interface"], cwd=str(cwd)).wait()
-    else: print("ip: subcommand niet ondersteund in Windows-simulatie (gebruik: ip a|r|link)")
+    if sub in ("a","addr","address"):  _spawn(["ipconfig","/all"], cwd=str(cwd))
+    elif sub in ("r","route"):         _spawn(["route","PRINT"], cwd=str(cwd))
+    elif sub in ("link",):             _spawn(["netsh","interface","show","interface"], cwd=str(cwd))
+    else: _err("ip: subcommand niet ondersteund in Windows-simulatie (gebruik: ip a|r|link)")
 
 def cmd_systemctl(args:list, cwd:Path):
     if not args:
-        print("systemctl: status <naam> | start|stop <naam> | list-units  (Windows-simulatie)"); return
+        _err("systemctl: status <naam> | start|stop <naam> | list-units  (Windows-simulatie)"); return
     sub = args[0]; rest=args[1:]
-    if sub == "status" and rest: subprocess.Popen(["powershell","-NoProfile","-Command", f"Get-Service -Name {rest[0]} | Format-List *"], cwd=str(cwd)).wait()
-    elif sub in ("start","stop") and rest: subprocess.Popen(["sc", sub, rest[0]], cwd=str(cwd)).wait()
-    elif sub == "list-units": subprocess.Popen(["powershell","-NoProfile","-Command","Get-Service | Sort-Object Status,Name | Format-Table -Auto"], cwd=str(cwd)).wait()
-    else: print(f"systemctl: '{sub}' niet ondersteund op Windows (geen systemd).")
+    if sub == "status" and rest: _spawn(["powershell","-NoProfile","-Command", f"Get-Service -Name {rest[0]} | Format-List *"], cwd=str(cwd))
+    elif sub in ("start","stop") and rest: _spawn(["sc", sub, rest[0]], cwd=str(cwd))
+    elif sub == "list-units": _spawn(["powershell","-NoProfile","-Command","Get-Service | Sort-Object Status,Name | Format-Table -Auto"], cwd=str(cwd))
+    else: _err(f"systemctl: '{sub}' niet ondersteund op Windows (geen systemd).")
 
 def cmd_mount(args:list, cwd:Path):
-    subprocess.Popen(["powershell","-NoProfile","-Command",
-                      "Get-Volume | Select DriveLetter,FileSystemLabel,FileSystem,Size,SizeRemaining | Format-Table -Auto"],
-                     cwd=str(cwd)).wait()
+    _spawn(["powershell","-NoProfile","-Command",
+            "Get-Volume | Select DriveLetter,FileSystemLabel,FileSystem,Size,SizeRemaining | Format-Table -Auto"],
+           cwd=str(cwd))
 
 # ---------- SHIMS ----------
 SHIM_SCRIPTS = {
@@ -820,6 +2030,10 @@ COMMAND_SECTIONS = [
         ("stat","bestandstatistieken"),
         ("file","type herleiden"),
         ("du","schijfruimte per pad"),
+        ("dedup","identieke bestanden → hardlinks/reflinks"),
+        ("snapshot","snapshot create/list/restore/delete van de root"),
+        ("fsevents","wijzigingen in de boom (journaal, cursor, poll)"),
+        ("overlay","overlay create/status: copy-on-write root boven een base"),
         ("df","schijfruimte volumes"),
     ]),
     ("Inhoud bekijken", [
@@ -893,6 +2107,8 @@ COMMAND_SECTIONS = [
         ("kill","stuur signaal"),
         ("killall","kill alle met naam"),
         ("jobs","background jobs"),
+        ("xargs","argumenten → commando's (-P parallel)"),
+        ("parallel","opdrachten parallel (GNU-stijl)"),
         ("bg","job naar achtergrond"),
         ("fg","job naar voorgrond"),
         ("disown","loskoppelen"),
@@ -1017,6 +2233,7 @@ COMMAND_SECTIONS = [
         ("sudo","privilege escalation"),
         ("passwd","wachtwoord"),
         ("openssl","certs/hashes"),
+        ("sha256sum","checksums (ook sha1sum/md5sum); -c controleert"),
         ("gpg","PGP crypto"),
         ("chroot","root wisselen"),
     ]),
@@ -1038,6 +2255,7 @@ COMMAND_SECTIONS = [
         ("ldd","lib afhankelijkheden"),
         ("git","versiebeheer"),
         ("python3/pip","scripting"),
+        ("wheelhouse","pip-wheels voor offline installatie"),
         ("node/npm/yarn","js toolchain"),
         ("shellcheck","bash lint"),
     ]),
@@ -1052,7 +2270,7 @@ COMMAND_DOCS = {
             "-l  → long listing (rechten, eigenaar, grootte, datum)",
             "-h  → human-readable groottes (met -l)",
         ],
-        "examples": ["ls -alh", "ls /etc /var/log"]
+        "examples": ["ls -alh", "ls /etc /var/log", "ls /var/log/*.gz src/**/*.py"]
     },
     "cd": {
         "desc": "Wissel van werkdirectory.",
@@ -1069,13 +2287,15 @@ COMMAND_DOCS = {
             "-n  → toon regelnummers",
             "-E  → uitgebreid regex (egrep)"
         ],
-        "examples": ["grep -rin 'ERROR' .", "grep -E 'foo|bar' file.txt"]
+        "examples": ["grep -rin 'ERROR' .", "grep -E 'foo|bar' file.txt", "cat app.log | grep ERROR > errors.txt"]
     },
     "tar": {
-        "desc": "Maak of pak archieven uit.",
-        "usage": "tar -xf ARCHIEF | tar -czf ARCHIEF.tar.gz PAD...",
-        "opts": ["-x  → extract","-c  → create","-z  → gzip","-J  → xz","-f  → archiefbestand"],
-        "examples": ["tar -xzf pkg.tar.gz", "tar -czf backup.tgz ~/project"]
+        "desc": "Maak of pak archieven uit (native builtin op virtuele paden; streamt per lid, zonder bash).",
+        "usage": "tar -xf ARCHIEF [-C DIR] [PAD...] | tar -czf ARCHIEF.tar.gz PAD... | tar -tvf ARCHIEF",
+        "opts": ["-x  → extract","-c  → create","-t  → list","-z  → gzip","-J  → xz","-j  → bzip2","--zstd  → zstd (pip install zstandard)",
+                 "-f  → archiefbestand","-C  → map","-v  → namen + doorvoer","--totals  → alleen de doorvoer",
+                 "bij uitpakken wordt de compressie automatisch herkend","andere opties → tar uit Git Bash"],
+        "examples": ["tar -xzf pkg.tar.gz", "tar -czf backup.tgz ~/project", "tar -tvf backup.tgz", "tar --zstd -cf logs.tar.zst /var/log"]
     },
     "chmod": {"desc":"Zet rechten (octaal of symbolisch).","usage":"chmod MODE BESTAND...","opts":["u/g/o + r/w/x"],"examples":["chmod 755 script.sh"]},
     "chown": {"desc":"Wijzig eigenaar en (optioneel) groep.","usage":"chown EIGENAAR[:GROEP] BESTAND...","opts":[],"examples":["chown root:root /etc/file"]},
@@ -1101,7 +2321,26 @@ COMMAND_DOCS = {
     "ssh":  {"desc":"Remote shell via SSH.","usage":"ssh [-J jumphost] [-L local:host:port] user@host","opts":["-J ProxyJump","-L/-R portforward"],"examples":["ssh -J bastion user@db"]},
     "zip":  {"desc":"Maak ZIP-archief.","usage":"zip -r archief.zip PAD/","opts":["-r recursief","-9 max compressie"],"examples":["zip -r site.zip ./dist"]},
     "unzip":{"desc":"Pak ZIP uit.","usage":"unzip archief.zip -d doel/","opts":[],"examples":["unzip tools.zip -d /usr/local/"]},
-    "zstd": {"desc":"Zstandard compressor.","usage":"zstd [-T0] FILE","opts":["-T0 → alle cores"],"examples":["zstd -T0 bigfile"]},
+    "time": {"desc":"Meet één commando: wall-tijd, tijd in subprocessen, child CPU en max RSS.","usage":"time COMMANDO [ARGS...]","opts":["zie ook: diag perf (histogrammen per commando)"],"examples":["time grep -r TODO .","time git status"]},
+    "profile": {"desc":"Draai één commando onder cProfile (en optioneel tracemalloc); .pstats in /var/log/profiles.","usage":"profile [--mem] [--top N] [--out FILE] COMMANDO [ARGS...]","opts":["--mem    → ook top allocatie-plekken (tracemalloc)","--top N  → aantal regels (standaard 25)","--out F  → .pstats naar dit pad i.p.v. /var/log/profiles"],"examples":["profile grep -r ERROR /var/log","profile --mem --top 10 ls -l /usr/bin"]},
+    "bench": {"desc":"Reproduceerbare benchmarks op synthetische LinuxFS-roots (tijdelijke SYSTEM_ROOT).","usage":"bench fs|install [--shape wide|deep|small|huge|meta|all] [--scale N] [--repeat N] [--seed N] [--json] [--out FILE] [--keep]","opts":["fs       → ls, grep -r, tree, cp -r, rm -r, meta_set, resolve_path (koud + warm)","install  → unzip, http_download, apt install/reinstall/remove (xz/gz/tar .debs via lokale http.server)","--json   → één JSON-regel per meting (tijd, piekgeheugen, fs-calls/entry)","--out F  → JSON-regels toevoegen aan F (vergelijken tussen commits)","--keep   → tijdelijke roots niet opruimen"],"examples":["bench fs","bench fs --shape wide,meta --scale 2 --out /var/log/bench.jsonl","bench install --repeat 1 --json"]},
+    "jobs": {"desc":"Achtergrond-jobs: `cmd &` draait builtins én externe commando's in een eigen thread; uitvoer gaat naar /var/log/jobs/<n>.log.","usage":"jobs [-l] | fg [%n] | bg [%n] | wait [%n...] | kill [-SIGNAAL] %n|PID","opts":["fg       → toont de gemiste uitvoer en volgt de job; Ctrl-C ontkoppelt (job loopt door)","jobs -l  → pids en log-pad","%n, %%, %+, %-, %prefix → job-specificaties","set -o jobtags → live uitvoer van jobs als '[n] regel' op de console","afgelopen jobs worden vóór de volgende prompt gemeld"],"examples":["git clone https://github.com/user/repo.git &","apt install foo & jobs","wait %1","kill %2"]},
+    "dedup": {"desc":"Vervang identieke bestanden (sha256, parallel gehasht) door reflinks of hardlinks; een index in /var/cache slaat ongewijzigde bestanden over.","usage":"dedup [-n] [-j N] [--min-size BYTES] [--hardlink|--reflink] [PAD...]","opts":["-n       → dry-run: toon wat gelinkt zou worden","-j N     → aantal hash-threads (standaard: cores)","--min-size → kleinere bestanden overslaan (standaard 4096)","standaard (--reflink) → alleen copy-on-write clones (btrfs/xfs/bcachefs); elders wordt niets gelinkt","--hardlink → expliciet hardlinks; let op: schrijven in-place (>, sort -o, tar -x) raakt dan alle kopieën (zoals cp -l)","/var/log, /var/run, /var/tmp en de META/PKG_DB-bestanden worden overgeslagen"],"examples":["dedup -n","dedup /tools /var/cache/apt","dedup -j 8 /home","dedup --hardlink /tools   (alleen-lezen data)"]},
+    "overlay": {"desc":"Copy-on-write roots: een lege upper-map boven een read-only base-root. Lezen valt door naar de base; schrijven kopieert eerst naar de upper; verwijderen laat een whiteout (.wh.NAAM) achter. META/PKG_DB in de upper bevatten alleen de verschillen.","usage":"overlay create DIR [--base ROOT] | status","opts":["create   → schrijft alleen DIR/.overlay; base is standaard de huidige root","--base   → een andere base (mag zelf geen overlay zijn)","status   → base, upper, omvang van de upper en aantal whiteouts","start een sandbox met --root DIR; externe programma's zien alleen de upper"],"examples":["overlay create /tmp/sandbox","python3 'linux terminal.py' --root /tmp/sandbox","overlay status"]},
+    "snapshot": {"desc":"Incrementele snapshots van de hele LinuxFS-root (incl. META/PKG_DB) naast de root in LinuxFS.snapshots/; ongewijzigde bestanden zijn hardlinks naar de vorige snapshot.","usage":"snapshot create [NAAM] | list | restore [-n] NAAM | delete NAAM...","opts":["create   → kopieert alleen wat sinds de vorige snapshot veranderde (size/mtime/mode)","restore  → zet alleen gewijzigde, ontbrekende en extra paden terug; -n toont eerst wat er gebeurt","delete   → elke snapshot is zelfstandig; verwijderen raakt de andere niet","/var/run (sockets) valt erbuiten"],"examples":["snapshot create voor-apt","apt install foo","snapshot restore voor-apt","snapshot list"]},
+    "parallel": {"desc":"Opdrachten parallel draaien (ook xargs -P). Builtins draaien in een thread-pool, externe programma's als hooguit -j/-P processen tegelijk; de uitvoer komt per opdracht in één stuk.","usage":"parallel [-j N|N%] [-k] [-u] [--tag] [--joblog LOG] [--halt fail=N] [--dry-run] CMD [:::ARGS | :::: BESTAND]... | xargs [-P N] [-n K] [-0] [-I {}] [-L N] [-r] [-t] [-k] [--joblog LOG] CMD","opts":["{} {.} {/} {//} {/.} {1} {2} {#} {%} → argument, zonder extensie, basisnaam, map, …, positie, volgnummer, slot","meerdere ::: → alle combinaties; zonder ::: komen de argumenten van stdin","-k → uitvoer in invoervolgorde; -u → niet groeperen; --tag → regel begint met het argument","--joblog → Seq/Starttime/JobRuntime/Exitval/Command per opdracht (tab-gescheiden)","exit-status: parallel = aantal mislukte opdrachten (max 101); xargs = 123/124/125/126/127 zoals GNU"],"examples":["ls *.log | parallel -j 4 gzip -k {}","parallel -k sha256sum ::: a.iso b.iso","find . -name '*.txt' -print0 | xargs -0 -P 8 -n 16 wc -l","parallel --joblog /var/log/pull.tsv 'cd {} && git pull' ::: repo1 repo2"]},
+    "wheelhouse": {"desc":"Lokale pip-wheelhouse in /var/cache/wheels. Ontbrekende Python-pakketten (colorama, gdown, …) gaan in één pip-aanroep; staan er wheels, dan installeert pip offline met --no-index --find-links (lukt dat niet, dan één keer online). Een overlay-root gebruikt de wheelhouse van zijn base.","usage":"wheelhouse [status] | fill [PKG...] | clear","opts":["fill → pip wheel van de bootstrap-pakketten (+ PKG) met alle afhankelijkheden; sdists worden meteen wheels","status → wheels, grootte en wat hier nog ontbreekt","eenmalig vullen op een machine met netwerk; daarna werkt de bootstrap van nieuwe roots zonder netwerk"],"examples":["wheelhouse fill","wheelhouse fill requests zstandard","wheelhouse status"]},
+    "fsevents": {"desc":"Wijzigingsfeed van de LinuxFS-boom. cp/mv/rm/mkdir/touch/chmod/omleidingen/tar/dpkg melden (pad, soort, tijd) aan de caches in het proces en aan een compact journaal (var/lib/lterm/fs-journal); wijzigingen door externe programma's worden na elk child-proces en bij elke prompt gevonden via de mtime van bewaakte paden.","usage":"fsevents [-n N] | --since CURSOR | --cursor | --poll | --watch PAD...","opts":["soorten: create, modify, delete, attrib, rescan (een melding op een map geldt voor de hele subboom)","--cursor → huidige positie (GEN:OFFSET); --since → alles daarna, nieuwe cursor op stderr","verlopen cursor (journaal gecompacteerd) → exit 1: volledig herscannen","--watch → pad laten bewaken; --poll → nu controleren"],"examples":["c=$(fsevents --cursor)","fsevents --since 3:4096","fsevents --watch /srv/data"]},
+    "xargs": {"desc":"Argumenten uit stdin (of -a BESTAND) aan een commando geven; met -P N draaien de opdrachten parallel (zie 'help parallel').","usage":"xargs [-P N] [-n K] [-L N] [-0|-d D] [-I {}] [-r] [-t] [-k] [--joblog LOG] [CMD [ARG]...]","opts":["-P N → N opdrachten tegelijk (0 = zoveel mogelijk); -k → uitvoer in invoervolgorde","-n K / -L N → hooguit K argumenten / N regels per opdracht; -I {} → één opdracht per regel, {} vervangen","-0 / -d D → items gescheiden door NUL / D; -r → niets doen bij lege invoer; -t → opdracht naar stderr","exit-status 123 (een opdracht faalde), 124 (exit 255), 125 (signaal), 126/127"],"examples":["find . -name '*.log' -print0 | xargs -0 rm -f","ls *.png | xargs -P 4 -I {} convert {} {}.jpg"]},
+    "warmpy": {"desc":"Warme Python-runner (opt-in): ./script.py draait in een fork van een server die de gangbare modules al heeft geladen, met eigen cwd, argv, env, stdio en exit-code. Scheelt de opstart van de interpreter en de imports per script.","usage":"set -o warmpy | warmpy [status|start|stop]","opts":["aanzetten: set -o warmpy, of LTERM_WARMPY=1 in de omgeving","de server start bij het eerste script en stopt na 15 minuten zonder werk","bestandsomleidingen (> 2> <) gaan als fd's mee; in pipes, jobs (&) en daemon-sessies blijft het een koude start","alleen waar fork + fd-passing bestaan (Linux/macOS); op Windows altijd koud"],"examples":["set -o warmpy","./tool.py --check > report.txt","warmpy status"]},
+    "set": {"desc":"Shell-opties; -e (errexit) stopt een batch/script bij de eerste fout.","usage":"set [-e|+e] [-o|+o errexit|jobtags|warmpy]","opts":["-e  → stop bij niet-nul exit-status (batch, .lfsh, -c)","+e  → doorgaan na fouten (standaard)","-o warmpy → ./script.py via de warme Python-runner (zie: help warmpy)"],"examples":["set -e","python \"linux terminal.py\" -e -c 'mkdir /tmp/x; cd /tmp/x; ls'"]},
+    "less": {"desc":"Native pager (ook more) met een regelindex die op de achtergrond via mmap wordt opgebouwd en in /var/cache/pager bewaard blijft: opnieuw openen is direct, springen naar regel N of een percentage kost één blok lezen.","usage":"less [-N] BESTAND... | COMMANDO | less","opts":["spatie/b → pagina verder/terug; j/k of pijltjes → regel","g/G → begin/einde; 120g → regel 120; 50% → halverwege","/PATROON en ?PATROON → zoeken vooruit/achteruit (klein geschreven = hoofdletterongevoelig); n/N → volgende/vorige","-N (ook als toets '-' 'N') → regelnummers","= → grootte, regels en of de index uit de cache kwam; q → stoppen","zonder console (pipe of bestand) gedraagt less zich als cat"],"examples":["less /var/log/lterm-perf.jsonl","grep -r ERROR /var/log | less","less -N big.log"]},
+    "plugins": {"desc":"Toont de plugin-commando's. Een plugin is een .py-bestand in /usr/lib/lterm/plugins dat bovenin '# lterm-commands: naam ...' heeft; alleen die kop wordt gelezen, de module wordt pas bij het eerste gebruik geïmporteerd. In de plugin zijn 'builtin' (decorator) en 'lterm' (deze module) beschikbaar.","usage":"plugins","opts":["@builtin(\"naam\") def f(ctx, args): ... → ctx.cwd / ctx.cache / ctx.line; ctx.cwd zetten = cd","@builtin(\"naam\", pipe=True) def g(cwd, args, inp): yield regel ... → native in pipelines","@builtin(..., accept=lambda args: ...) → False laat het commando doorvallen naar extern","ingebouwde commando's gaan voor; de pluginmap wordt opnieuw gescand als er een bestand bijkomt of verdwijnt"],"examples":["plugins","echo abc | upper   (met een plugin die 'upper' registreert)"]},
+    "sort": {"desc":"Native sort voor bestanden groter dan het geheugen: stukken worden in het geheugen gesorteerd, als runs naar /var/tmp geschreven en daarna k-weg samengevoegd. Vergelijkt op codepunt (zoals LC_ALL=C). uniq en wc zijn ook native; wc telt in buffers van 4 MB.","usage":"sort [-nrufbs] [-k POS1[,POS2]] [-t SEP] [-S GROOTTE] [-T MAP] [-o UIT] [BESTAND...]","opts":["-n numeriek, -r omgekeerd, -u uniek, -f hoofdletterongevoelig, -b voorloopblanks negeren, -s stabiel","-k 2,2n / -k 1.3,1.5 / -k3r → sleutels met eigen vlaggen","-S 256M → geheugen per run (standaard 64M); -T MAP → map voor de runs","uniq [-c] [-d] [-u] [-i] [IN [UIT]]; wc [-l] [-w] [-m] [-c]","andere opties (bv. -V, -h, wc -L) → extern programma"],"examples":["sort -n -k2,2 access.log | uniq -c | sort -nr | head","sort -u -S 512M huge.txt -o huge.sorted","wc -l /var/log/*.log"]},
+    "tail": {"desc":"Laatste regels van een bestand (ook head voor de eerste); leest vanaf het einde terug, dus ook snel op logs van vele GB.","usage":"tail [-n N|-n +N|-c N] [-f [-s SEC]] BESTAND... | head [-n N|-c N] BESTAND...","opts":["-n N   → aantal regels (standaard 10); tail -n +N vanaf regel N","-c N   → bytes i.p.v. regels","-f     → volg groeiende bestanden; pollt sneller zodra er data is, anders tot -s SEC (standaard 1s)","-q/-v  → koppen ==> naam <== weglaten/altijd tonen"],"examples":["tail -n 50 /var/log/lterm-perf.jsonl","tail -f app.log | grep ERROR","head -n 5 data.csv"]},
+    "sha256sum": {"desc":"Native checksums (ook sha1sum en md5sum): bestanden worden parallel gehasht, grote bestanden via mmap.","usage":"sha256sum [-r] [-j N] [--tag] BESTAND... | sha256sum -c [--quiet|--status] SUMS","opts":["-c  → controleer een lijst 'HASH  NAAM' (ook BSD '--tag'-vorm)","--quiet  → alleen fouten tonen","--status → niets tonen, alleen exit-status","-r  → mappen recursief (de samengevoegde overlay-weergave)","-j N → aantal threads"],"examples":["sha256sum /var/cache/downloads/*.zip > SUMS","sha256sum -c SUMS","md5sum -r /usr/lib | sort"]},
+    "gzip": {"desc":"Native gzip/gunzip/zcat (pigz-stijl): blokken van 128KB worden parallel gecomprimeerd en tot één geldige .gz-stream samengevoegd.","usage":"gzip [-d] [-c] [-k] [-f] [-t] [-v] [-1..-9] [-p N] BESTAND...","opts":["-d  → decomprimeren (= gunzip)","-c  → naar stdout (= zcat)","-k  → origineel houden","-p N → aantal threads (standaard: alle cores)","-t  → alleen testen","-v  → ratio en doorvoer","zonder BESTAND (stdin) → gzip uit Git Bash"],"examples":["gzip -k big.log","gunzip backup.tar.gz","zcat app.log.gz | grep ERROR","gzip -9 -p 4 dump.sql"]},
+    "zstd": {"desc":"Zstandard compressor (native met het 'zstandard'-pakket, anders zstd uit Git Bash).","usage":"zstd [-d] [-c] [--rm] [-#] [-T N] [-o FILE] FILE...","opts":["-T0 → alle cores (standaard)","-#  → niveau 1..22 (standaard 3)","-d  → decomprimeren (= unzstd)","--rm → origineel verwijderen (standaard: houden)"],"examples":["zstd -T0 bigfile","unzstd bigfile.zst","zstd -19 -o out.zst data.bin"]},
 }
 
 # -------- HELP RENDERING --------
@@ -1120,7 +2359,7 @@ def bash_has(cmd: str) -> bool:
 
 def status_icon(cmd: str) -> str:
     if cmd in SHIM_SCRIPTS: return "≈"
-    if bash_has(cmd) or shutil.which(cmd): return "✓"
+    if is_builtin(cmd) or bash_has(cmd) or shutil.which(cmd): return "✓"
     return "·"
 
 def _pad_cols(rows, gap=2):
@@ -1160,7 +2399,7 @@ def render_all_commands():
         render_section(title, items)
     documented = {n.split()[0] for _,items in COMMAND_SECTIONS for (n,_) in items}
     documented |= set(SHIM_SCRIPTS.keys())
-    available = set(list_all_bash_commands())
+    available = set(bash_commands())
     extra = sorted([x for x in available if x not in documented])
     if extra:
         print(f"{c(C_CYAN)}— Extra (gedetecteerd via Bash) —{c(C_RESET)}")
@@ -1215,181 +2454,3493 @@ def cmd_help(args:list):
     if render_category(key): return
     render_command_card(key)
 
-# ---------- MSYS add-ons (optioneel) ----------
-def install_msys_addons_pretty() -> bool:
-    if not MSYS_ADDONS_URL: return False
-    zip_path = download_git_zip_via_your_snippet(MSYS_ADDONS_URL, "MSYS2-packages-master.zip")
-    if not zip_path: return False
-    # Uitpakken in PortableGit-root zodat usr/bin, mingw64/bin etc. worden samengevoegd
-    ok = unzip_with_progress(zip_path, GIT_HOME, "MSYS2-packages-master.zip")
-    return ok
+# ---------- profile (cProfile + tracemalloc) ----------
+PROFILE_DIR = SYSTEM_ROOT / "var" / "log" / "profiles"
 
-# ---------- dispatcher ----------
-def run_command(line:str, cwd:Path, git_env_cache:dict|None=None)->tuple[Path,dict|None]:
-    if not line.strip(): return cwd, git_env_cache
-    tokens=shlex.split(line)
-    cmd,*args=tokens
+def cmd_profile(cwd:Path, args:list, git_env_cache:dict|None):
+    mem=False; top=25; out=None; i=0
+    while i < len(args) and args[i].startswith("--"):
+        a=args[i]
+        if a=="--mem": mem=True
+        elif a in ("--top","--out") and i+1 < len(args):
+            i+=1
+            if a=="--out": out=args[i]
+            else:
+                try: top=max(1,int(args[i]))
+                except ValueError: _err(f"profile: invalid --top value '{args[i]}'"); return cwd, git_env_cache
+        else: _err(f"profile: unknown option '{a}'"); return cwd, git_env_cache
+        i+=1
+    rest=args[i:]
+    if not rest: _err("Usage: profile [--mem] [--top N] [--out FILE] <command...>"); return cwd, git_env_cache
+    import cProfile, pstats, tracemalloc
+    prof=cProfile.Profile(); started_tm=False
+    if mem and not tracemalloc.is_tracing(): tracemalloc.start(25); started_tm=True
+    t0=time.perf_counter()
+    try:
+        cwd, git_env_cache = prof.runcall(run_command, shlex.join(rest), cwd, git_env_cache)
+    finally:
+        elapsed=time.perf_counter()-t0
+        snap=tracemalloc.take_snapshot() if mem else None
+        peak=tracemalloc.get_traced_memory()[1] if mem else 0
+        if started_tm: tracemalloc.stop()
+    if out: dest=resolve_path(cwd,out)
+    else: dest=PROFILE_DIR/f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{Path(rest[0]).name or 'cmd'}.pstats"
+    try:
+        dest.parent.mkdir(parents=True, exist_ok=True); prof.dump_stats(str(dest))
+    except Exception as e: _err(f"profile: cannot save stats: {e}")
+    print(f"\n{c(C_CYAN)}— profile: {shlex.join(rest)} ({elapsed:.3f}s) —{c(C_RESET)}")
+    buf=StringIO()
+    pstats.Stats(prof, stream=buf).strip_dirs().sort_stats("cumulative").print_stats(top)
+    # pstats-header (datum/lege regels) overslaan; vanaf de totalen tonen
+    lines=buf.getvalue().splitlines()
+    start=next((k for k,l in enumerate(lines) if "function calls" in l), 0)
+    print("\n".join(l for l in lines[start:] if l.strip()))
+    if snap is not None:
+        snap=snap.filter_traces([tracemalloc.Filter(False, tracemalloc.__file__),
+                                 tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                                 tracemalloc.Filter(False, cProfile.__file__)])
+        print(f"\n{c(C_CYAN)}— top {top} allocaties (piek {_fmt_bytes(peak)}) —{c(C_RESET)}")
+        for st in snap.statistics("lineno")[:top]:
+            fr=st.traceback[0]
+            print(f"{_fmt_bytes(st.size):>9}  {st.count:>7}x  {Path(fr.filename).name}:{fr.lineno}")
+    print(f"\nstats: {dest}")
+    return cwd, git_env_cache
 
-    # Aliassen/typos
-    cmd = ALIASES.get(cmd, cmd)
+# ---------- benchmarks (synthetische LinuxFS-roots) ----------
+# bench fs: genereert een tijdelijke root met een bepaalde vorm, draait de fs-builtins ertegen
+# en rapporteert tijd, piekgeheugen (tracemalloc) en fs-calls per entry als JSON-regels.
+BENCH_SHAPES = ("wide", "deep", "small", "huge", "meta")
+_BENCH_FS_CALLS = ("stat","lstat","scandir","listdir","open","readlink","mkdir","unlink","rmdir","rename","replace","utime","sendfile")
 
-    # built-ins
-    if cmd=="exit": print("Bye!"); sys.exit(0)
-    elif cmd=="pwd":
-        rel=cwd.relative_to(SYSTEM_ROOT); print("/" if not rel.parts else "/" + "/".join(rel.parts)); return cwd, git_env_cache
-    elif cmd=="ls": cmd_ls(cwd,args); return cwd, git_env_cache
-    elif cmd=="cd":
-        dest=resolve_path(cwd,args[0]) if args else (SYSTEM_ROOT/"home"/USER)
-        if dest.exists() and dest.is_dir() and (SYSTEM_ROOT in dest.parents or dest==SYSTEM_ROOT): return dest, git_env_cache
-        print(f"cd: {args[0] if args else ''}: No such directory"); return cwd, git_env_cache
-    elif cmd=="mkdir":
-        for a in args: resolve_path(cwd,a).mkdir(parents=True, exist_ok=True); return cwd, git_env_cache
-    elif cmd=="rmdir": cmd_rmdir(cwd,args); return cwd, git_env_cache
-    elif cmd=="touch":
-        for a in args:
-            p=resolve_path(cwd,a); p.parent.mkdir(parents=True, exist_ok=True); p.touch(exist_ok=True)
-        return cwd, git_env_cache
-    elif cmd=="cat":
-        if not args: print("cat: missing file operand")
-        else:
-            for a in args:
-                p=resolve_path(cwd,a)
-                if p.exists() and p.is_file(): print(p.read_text(errors="ignore"), end="")
-                else: print(f"cat: {a}: No such file")
-        return cwd, git_env_cache
-    elif cmd=="echo": cmd_echo(cwd,args); return cwd, git_env_cache
-    elif cmd=="whoami": print(USER); return cwd, git_env_cache
-    elif cmd=="clear": os.system("cls" if os.name=="nt" else "clear"); return cwd, git_env_cache
-    elif cmd=="tree":
-        for root,dirs,files in os.walk(cwd):
-            rel=Path(root).relative_to(cwd); indent="  "*len(rel.parts)
-            print(f"{indent}{Path(root).name}/")
-            for f in files: print(f"{indent}  {f}")
-        return cwd, git_env_cache
-    elif cmd=="help": cmd_help(args); return cwd, git_env_cache
-    elif cmd=="rm": cmd_rm(cwd,args); return cwd, git_env_cache
-    elif cmd=="cp": cmd_cp(cwd,args); return cwd, git_env_cache
-    elif cmd=="mv": cmd_mv(cwd,args); return cwd, git_env_cache
-    elif cmd=="grep": cmd_grep(cwd,args); return cwd, git_env_cache
-    elif cmd=="chmod": cmd_chmod(cwd,args); return cwd, git_env_cache
-    elif cmd=="chown": cmd_chown(cwd,args); return cwd, git_env_cache
-    elif cmd=="which": cmd_which(args); return cwd, git_env_cache
-    elif cmd=="diag":
-        if args and args[0]=="path":
-            print("Windows PATH:"); print(os.environ.get("PATH",""))
-            bash = find_bash()
-            if bash:
-                msys_shim = _path_to_msys(SYSTEM_ROOT/"usr"/"bin")
-                out = subprocess.check_output([bash,"-lc",f"export PATH={_bash_quote(msys_shim)}:\"$PATH\"; printf '%s' \"$PATH\""], text=True)
-                print("\nBash PATH:"); print(out)
-        else:
-            print("diag path  — toon Windows & Bash PATH")
-        return cwd, git_env_cache
+class _NullOut:
+    """stdout-sink voor benchmarks: telt niets, bewaart niets."""
+    encoding = "utf-8"
+    def write(self, s): return len(s)
+    def flush(self): pass
+    def isatty(self): return False
 
-    # Linux wrappers
-    if cmd=="ip": cmd_ip(args, cwd); return cwd, git_env_cache
-    if cmd=="systemctl": cmd_systemctl(args, cwd); return cwd, git_env_cache
-    if cmd=="mount": cmd_mount(args, cwd); return cwd, git_env_cache
-
-    # sudo (sim)
-    if cmd=="sudo":
-        if not args: print("sudo: usage: sudo <command> [args...]"); return cwd, git_env_cache
-        print("[sudo simulated] running:", " ".join(args))
-        return run_command(" ".join(args), cwd, git_env_cache)
-
-    # apt / apt-get (sim)
-    if cmd in ("apt","apt-get"):
-        if not args: print("Usage: apt install <pkg> | apt remove <pkg>"); return cwd, git_env_cache
-        sub=args[0]; rest=args[1:]
-        if sub in ("install","i"):
-            if not rest: print("apt: missing package name"); return cwd, git_env_cache
-            apt_install(cwd,rest[0]); return cwd, git_env_cache
-        elif sub in ("remove","purge","r"):
-            if not rest: print("apt: missing package name"); return cwd, git_env_cache
-            dpkg_remove(rest[0]); return cwd, git_env_cache
-        else:
-            print("Supported: apt install <pkg>, apt remove <pkg> (simulation)"); return cwd, git_env_cache
-
-    # dpkg (sim)
-    if cmd=="dpkg":
-        if not args: print("Usage: dpkg -i FILE.deb | dpkg -r <pkg>"); return cwd, git_env_cache
-        if args[0]=="-i":
-            if len(args)<2: print("dpkg: missing .deb filename"); return cwd, git_env_cache
-            deb=resolve_path(cwd,args[1])
-            if not deb.exists(): print(f"dpkg: {args[1]}: No such file"); return cwd, git_env_cache
-            try: dpkg_install_deb(cwd,deb)
-            except Exception as e: print(f"dpkg: error installing: {e}")
-            return cwd, git_env_cache
-        elif args[0]=="-r":
-            if len(args)<2: print("dpkg: missing package name"); return cwd, git_env_cache
-            dpkg_remove(args[1]); return cwd, git_env_cache
-        else:
-            print("Supported: dpkg -i FILE.deb, dpkg -r <pkg>  (simulation)"); return cwd, git_env_cache
+def _bench_env() -> dict:
+    rev = ""
+    try:
+        head = (SCRIPT_DIR/".git"/"HEAD").read_text().strip()
+        rev = (SCRIPT_DIR/".git"/head[5:]).read_text().strip() if head.startswith("ref: ") else head
+    except Exception: pass
+    import platform
+    return {"rev": rev[:12], "version": VERSION, "python": platform.python_version(), "platform": sys.platform}
 
-    # --- path execution / scripts ---
-    if "/" in cmd or "\\" in cmd or cmd.startswith("."):
-        target=resolve_path(cwd,cmd)
-        if target.exists() and target.is_file():
-            host=str(target)
-            # .sh → Git Bash
-            if host.lower().endswith(".sh"):
-                ensure_pip_deps()
-                if AUTO_DOWNLOAD_TOOLS and not find_portable_git_bash_in(GIT_HOME):
-                    ensure_portable_git_via_drive_pretty()
-                bash=find_bash()
-                if not bash:
-                    print("bash: not found. Installeer PortableGit ZIP via Google Drive.")
-                    return cwd, git_env_cache
-                msys_script=_path_to_msys(Path(host))
-                shim_dir=SYSTEM_ROOT/"usr"/"bin"; shim_dir.mkdir(parents=True, exist_ok=True)
-                msys_shim=_path_to_msys(shim_dir)
-                bash_cmd=f"export PATH={_bash_quote(msys_shim)}:\"$PATH\"; exec \"{msys_script}\""
-                env=os.environ.copy()
-                env["PATH"]=os.pathsep.join([p for p in env.get("PATH","").split(os.pathsep) if "WindowsApps" not in p])
-                subprocess.Popen([bash,"-lc",bash_cmd], cwd=str(cwd), env=env).wait()
-                return cwd, git_env_cache
-            # .py
-            if host.lower().endswith(".py"):
-                ensure_pip_deps()
-                pyexe=sys.executable or shutil.which("python") or shutil.which("python3")
-                if pyexe: subprocess.Popen([pyexe,host], cwd=str(cwd)).wait()
-                else: print("python: not found.")
-                return cwd, git_env_cache
-            # .bat/.cmd
-            if host.lower().endswith((".bat",".cmd")):
-                subprocess.Popen([host], cwd=str(cwd)).wait(); return cwd, git_env_cache
-            # generic
-            subprocess.Popen([host], cwd=str(cwd)).wait(); return cwd, git_env_cache
-        else:
-            print(f"{cmd}: No such file"); return cwd, git_env_cache
+def _bench_gen_shape(base: Path, shape: str, scale: int, rnd) -> int:
+    """Maak de synthetische boom onder base; geeft het aantal entries (files + dirs)."""
+    words = ["alpha","beta","gamma","delta","ERROR","warn","info","debug","needle","kernel","pkg","lib"]
+    pool = [" ".join(rnd.choice(words) for _ in range(8)) + "\n" for _ in range(256)]
+    def text(nlines): return "".join(rnd.choice(pool) for _ in range(nlines))
+    n = 0; base.mkdir(parents=True, exist_ok=True)
+    if shape == "wide":
+        for i in range(5000*scale):
+            (base/f"file{i:06d}.txt").write_text(text(2)); n += 1
+    elif shape == "deep":
+        d = base
+        for lvl in range(64*scale):
+            d = d/f"d{lvl:03d}"; d.mkdir(); n += 1
+            for j in range(4): (d/f"f{j}.log").write_text(text(4)); n += 1
+    elif shape in ("small", "meta"):
+        dirs = 20*scale if shape == "small" else 4*scale
+        for i in range(dirs):
+            d = base/f"dir{i:03d}"; d.mkdir(); n += 1
+            for j in range(250): (d/f"s{j:04d}.txt").write_text(text(1)); n += 1
+    elif shape == "huge":
+        line = text(64)
+        for i in range(3):
+            with open(base/f"huge{i}.log", "w", encoding="utf-8") as f:
+                for _ in range((8*scale*1024*1024)//len(line)): f.write(line)
+            n += 1
+    if shape == "meta":
+        # grote META: 10k*scale records (ook voor paden die niet bestaan, zoals na veel installs)
+        for i in range(10000*scale):
+            META[f"usr/share/doc/pkg{i//100:04d}/file{i:06d}"] = {"mode": "644", "owner": "root", "group": "root"}
+        json_save(META_FILE, META)
+    return n
 
-    # git (echt)
-    if cmd=="git":
-        if not find_git_exe() and AUTO_DOWNLOAD_TOOLS:
-            ensure_portable_git_via_drive_pretty()
-        git_exe=find_git_exe()
-        if not git_exe:
-            print("git: not found. Drive-ZIP installatie mislukt of niet publiek.")
-            return cwd, git_env_cache
-        if git_env_cache is None:
-            git_env_cache=ensure_git_config_and_ssh(SYSTEM_ROOT/"home"/USER)
-        env=os.environ.copy(); env.update(git_env_cache or {})
-        subprocess.Popen([git_exe]+args, cwd=str(cwd), env=env).wait()
-        return cwd, git_env_cache
+def _bench_count_fs(counts: dict):
+    """Patch os/open met tellers; geeft een restore-functie terug."""
+    import builtins, io
+    saved = []
+    def wrap(mod, name, key):
+        orig = getattr(mod, name, None)
+        if orig is None: return
+        def counted(*a, **k):
+            counts[key] = counts.get(key, 0) + 1
+            return orig(*a, **k)
+        saved.append((mod, name, orig)); setattr(mod, name, counted)
+    for name in _BENCH_FS_CALLS: wrap(os, name, name)
+    wrap(builtins, "open", "open"); wrap(io, "open", "open")
+    def restore():
+        for mod, name, orig in reversed(saved): setattr(mod, name, orig)
+    return restore
 
-    # === Bash passthrough voor ALLES ===
-    if find_bash():
-        run_in_bash(line, cwd)
-        return cwd, git_env_cache
+def _bench_measure(setup, run, repeat: int) -> dict:
+    import tracemalloc
+    times = []
+    for _ in range(repeat):
+        setup()
+        with redirect_stdout(_NullOut()), redirect_stderr(_NullOut()):
+            t0 = time.perf_counter(); run(); times.append(time.perf_counter() - t0)
+    setup(); tracemalloc.start()
+    try:
+        with redirect_stdout(_NullOut()), redirect_stderr(_NullOut()): run()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally: tracemalloc.stop()
+    setup(); counts = {}; restore = _bench_count_fs(counts)
+    try:
+        with redirect_stdout(_NullOut()), redirect_stderr(_NullOut()): run()
+    finally: restore()
+    times.sort()
+    return {"time_s": round(times[0], 6), "time_med_s": round(times[len(times)//2], 6), "peak_bytes": peak, "fs_calls": counts}
 
-    # fallback host tools
-    real_cmd=shutil.which(ALIASES.get(cmd,cmd))
-    if real_cmd:
-        ensure_pip_deps()
-        subprocess.Popen([real_cmd]+args, cwd=str(cwd)).wait()
+def bench_fs(shapes: list, scale: int, repeat: int, seed: int, keep: bool) -> list[dict]:
+    import tempfile, random
+    old_root = SYSTEM_ROOT; results = []; env = _bench_env()
+    tmp = Path(tempfile.mkdtemp(prefix="lterm-bench-"))
+    try:
+        for shape in shapes:
+            set_system_root(tmp/shape/SYSTEM_DIR_NAME); ensure_structure()
+            bdir = SYSTEM_ROOT/"bench"; entries = _bench_gen_shape(bdir, shape, scale, random.Random(seed))
+            meta_base = dict(META); home = SYSTEM_ROOT/"home"/USER
+            files = [Path(r)/f for r, _, fs in os.walk(bdir) for f in fs]
+            rels = ["/" + p.relative_to(SYSTEM_ROOT).as_posix() for p in files]
+            copy = SYSTEM_ROOT/"bench-copy"
+            def drop_copy():
+                if copy.exists(): shutil.rmtree(copy)
+            def make_copy():
+                drop_copy(); shutil.copytree(bdir, copy)
+            def reset_meta():
+                META.clear(); META.update(meta_base); json_save(META_FILE, META)
+            def noop(): pass
+            meta_targets = files[:50]
+            ops = [
+                ("resolve_path", invalidate_path_cache, lambda: [resolve_path(home, r) for r in rels]),
+                ("resolve_warm", noop, lambda: [resolve_path(home, r) for r in rels]),
+                ("ls", noop, lambda: _dispatch("ls -l /bench", home, None)),
+                ("grep", noop, lambda: _dispatch("grep -r needle /bench", home, None)),
+                ("tree", noop, lambda: _dispatch("tree", bdir, None)),
+                ("cp", drop_copy, lambda: _dispatch("cp -r /bench /bench-copy", home, None)),
+                ("rm", make_copy, lambda: _dispatch("rm -rf /bench-copy", home, None)),
+                ("meta_set", reset_meta, lambda: [meta_set(p, mode="755") for p in meta_targets]),
+            ]
+            for op, setup, run in ops:
+                r = _bench_measure(setup, run, repeat)
+                calls = sum(r["fs_calls"].values())
+                results.append({"bench": "fs", "shape": shape, "op": op, "scale": scale, "entries": entries,
+                                "repeat": repeat, **r, "calls_per_entry": round(calls/max(1, entries), 3),
+                                "meta_records": len(meta_base), **env})
+            drop_copy(); reset_meta()
+    finally:
+        set_system_root(old_root)
+        if keep: print(f"bench: roots bewaard in {tmp}")
+        else: shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+# bench install: synthetische ZIPs/.debs via een lokale http.server, geen netwerk nodig
+def _bench_ar(members: list) -> bytes:
+    out = [b"!<arch>\n"]
+    for name, data in members:
+        out.append(f"{name:<16}{0:<12}{0:<6}{0:<6}{'100644':<8}{len(data):<10}`\n".encode("ascii"))
+        out.append(data + (b"\n" if len(data) % 2 else b""))
+    return b"".join(out)
+
+def _bench_payload(content: str, scale: int, rnd) -> list:
+    """(naam, bytes)-paren: 'small' = veel kleine members, 'large' = een paar grote."""
+    words = [b"alpha", b"beta", b"gamma", b"delta", b"lib", b"usr", b"share", b"doc"]
+    pool = [b" ".join(rnd.choice(words) for _ in range(10)) + b"\n" for _ in range(128)]
+    def blob(n):
+        parts = []; size = 0
+        while size < n:
+            chunk = rnd.choice(pool) + rnd.randbytes(16).hex().encode() + b"\n"; parts.append(chunk); size += len(chunk)
+        return b"".join(parts)[:n]
+    if content == "small":
+        return [(f"usr/share/bench/d{i//100:03d}/f{i:05d}.txt", blob(rnd.randint(512, 4096))) for i in range(2000*scale)]
+    return [(f"usr/share/bench/big{i}.bin", blob(8*1024*1024*scale)) for i in range(4)]
+
+def _bench_make_deb(members: list, comp: str) -> bytes:
+    raw = BytesIO()
+    with tarfile.open(fileobj=raw, mode="w") as tf:
+        for name, data in members:
+            ti = tarfile.TarInfo("./" + name); ti.size = len(data); ti.mtime = 0
+            tf.addfile(ti, BytesIO(data))
+    body = raw.getvalue()
+    if comp == "xz":   body, name = lzma.compress(body, preset=1), "data.tar.xz"
+    elif comp == "gz": body, name = gzip.compress(body, compresslevel=6), "data.tar.gz"
+    else:              name = "data.tar"
+    ctl = BytesIO()
+    with tarfile.open(fileobj=ctl, mode="w:gz") as tf:
+        c_data = b"Package: bench\nVersion: 1.0\nArchitecture: all\n"
+        ti = tarfile.TarInfo("./control"); ti.size = len(c_data); tf.addfile(ti, BytesIO(c_data))
+    return _bench_ar([("debian-binary", b"2.0\n"), ("control.tar.gz", ctl.getvalue()), (name, body)])
+
+def _bench_make_zip(members: list, path: Path):
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED, compresslevel=6) as z:
+        for name, data in members: z.writestr(name, data)
+
+def _bench_measure_rss(setup, run, repeat: int) -> dict:
+    times = []; peak = 0; reset = False
+    for k in range(repeat):
+        last = k == repeat - 1
+        with redirect_stdout(_NullOut()), redirect_stderr(_NullOut()):
+            setup()
+            if last: reset = _peak_rss_reset()
+            t0 = time.perf_counter(); run(); times.append(time.perf_counter() - t0)
+        if last: peak = _peak_rss_bytes()
+    times.sort()
+    return {"time_s": round(times[0], 6), "time_med_s": round(times[len(times)//2], 6), "peak_bytes": peak, "peak_rss_reset": reset}
+
+def bench_install(scale: int, repeat: int, seed: int, keep: bool) -> list[dict]:
+    import tempfile, random, http.server, functools
+    old_root = SYSTEM_ROOT; results = []; env = _bench_env()
+    tmp = Path(tempfile.mkdtemp(prefix="lterm-bench-")); httpd = None
+    class QuietHandler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *a): pass
+    try:
+        set_system_root(tmp/SYSTEM_DIR_NAME); ensure_structure()
+        srv = tmp/"srv"; srv.mkdir()
+        httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(QuietHandler, directory=str(srv)))
+        threading.Thread(target=httpd.serve_forever, daemon=True).start()
+        base_url = f"http://127.0.0.1:{httpd.server_address[1]}"
+        registry = {"packages": {}}; cases = []
+        for content in ("small", "large"):
+            members = _bench_payload(content, scale, random.Random(seed))
+            nfiles = len(members); nbytes = sum(len(d) for _, d in members)
+            zpath = srv/f"bench-{content}.zip"; _bench_make_zip(members, zpath)
+            dest = tmp/"unzip"
+            def drop_dest(dest=dest):
+                if dest.exists(): shutil.rmtree(dest)
+            cases.append(("unzip", f"zip-{content}", nfiles, nbytes, drop_dest,
+                          lambda z=zpath, d=dest: unzip_with_progress(z, d, z.name)))
+            for comp in ("xz", "gz", "none"):
+                pkg = f"bench-{comp}-{content}"; fname = f"{pkg}_1.0_all.deb"
+                (srv/fname).write_bytes(_bench_make_deb(members, comp))
+                registry["packages"][pkg] = {"url": f"{base_url}/{fname}"}
+                def ensure_absent(pkg=pkg):
+                    if pkg in PKG_DB["installed"]: dpkg_remove(pkg)
+                def ensure_present(pkg=pkg):
+                    if pkg not in PKG_DB["installed"]: apt_install(SYSTEM_ROOT, pkg)
+                def noop(): pass
+                case = f"deb-{comp}-{content}"
+                cases += [
+                    ("download", case, 1, (srv/fname).stat().st_size, noop, lambda u=registry["packages"][pkg]["url"]: http_download(u)),
+                    ("install", case, nfiles, nbytes, ensure_absent, lambda pkg=pkg: apt_install(SYSTEM_ROOT, pkg)),
+                    ("reinstall", case, nfiles, nbytes, ensure_present, lambda pkg=pkg: apt_install(SYSTEM_ROOT, pkg)),
+                    ("remove", case, nfiles, nbytes, ensure_present, lambda pkg=pkg: dpkg_remove(pkg)),
+                ]
+            del members
+        json_save(APT_REGISTRY, registry)
+        for op, case, nfiles, nbytes, setup, run in cases:
+            r = _bench_measure_rss(setup, run, repeat); t = max(r["time_s"], 1e-9)
+            results.append({"bench": "install", "op": op, "case": case, "scale": scale, "repeat": repeat, "files": nfiles,
+                            "bytes": nbytes, **r, "files_per_s": round(nfiles/t, 1), "mb_per_s": round(nbytes/t/1048576, 2),
+                            "peak_rss": _fmt_bytes(r["peak_bytes"]), **env})
+    finally:
+        if httpd: httpd.shutdown(); httpd.server_close()
+        set_system_root(old_root)
+        if keep: print(f"bench: roots bewaard in {tmp}")
+        else: shutil.rmtree(tmp, ignore_errors=True)
+    return results
+
+def _bench_report(results: list[dict], as_json: bool, out: Path|None):
+    if out:
+        try:
+            out.parent.mkdir(parents=True, exist_ok=True)
+            with open(out, "a", encoding="utf-8") as f:
+                for r in results: f.write(json.dumps(r, sort_keys=True) + "\n")
+        except Exception as e: _err(f"bench: cannot write {out}: {e}")
+    if as_json:
+        for r in results: print(json.dumps(r, sort_keys=True))
+        return
+    keys = [k for k in ("shape","op","case") if any(k in r for r in results)]
+    fs = any("fs_calls" in r for r in results)
+    rows = [[k.upper() for k in keys] + ["TIME", "MEDIAN", "PEAK"] + (["FS CALLS", "CALLS/ENTRY"] if fs else ["FILES/S", "MB/S"])]
+    for r in results:
+        tail = ([str(sum(r["fs_calls"].values())), str(r["calls_per_entry"])] if fs
+                else [str(r.get("files_per_s", "—")), str(r.get("mb_per_s", "—"))])
+        rows.append([str(r.get(k, "")) for k in keys] + [f"{r['time_s']*1000:.1f}ms", f"{r['time_med_s']*1000:.1f}ms",
+                     _fmt_bytes(r.get("peak_bytes", 0))] + tail)
+    for line in _pad_cols(rows): print(line)
+
+def cmd_bench(cwd:Path, args:list):
+    if not args or args[0] not in ("fs", "install"):
+        _err("Usage: bench fs [--shape wide|deep|small|huge|meta|all] [--scale N] [--repeat N] [--seed N] [--json] [--out FILE] [--keep]")
+        _err("       bench install [--scale N] [--repeat N] [--seed N] [--json] [--out FILE] [--keep]"); return
+    kind = args[0]; opts = {"shape": "all", "scale": "1", "repeat": "3", "seed": "1", "out": None}
+    flags = set(); i = 1
+    while i < len(args):
+        a = args[i]
+        if a in ("--json", "--keep"): flags.add(a[2:])
+        elif a.startswith("--") and a[2:] in opts and i+1 < len(args): opts[a[2:]] = args[i+1]; i += 1
+        else: _err(f"bench: unknown option '{a}'"); return
+        i += 1
+    try: scale, repeat, seed = max(1, int(opts["scale"])), max(1, int(opts["repeat"])), int(opts["seed"])
+    except ValueError: _err("bench: --scale/--repeat/--seed must be integers"); return
+    if kind == "install":
+        results = bench_install(scale, repeat, seed, "keep" in flags)
     else:
-        print(f"{cmd}: command not found")
-    return cwd, git_env_cache
+        shapes = list(BENCH_SHAPES) if opts["shape"] == "all" else opts["shape"].split(",")
+        bad = [x for x in shapes if x not in BENCH_SHAPES]
+        if bad: _err(f"bench: unknown shape(s): {', '.join(bad)}"); return
+        results = bench_fs(shapes, scale, repeat, seed, "keep" in flags)
+    _bench_report(results, "json" in flags, resolve_path(cwd, opts["out"]) if opts["out"] else None)
+
+# ---------- dedup (content-addressed: hardlinks/reflinks) ----------
+DEDUP_INDEX = SYSTEM_ROOT / "var" / "cache" / "dedup-index.json"
+
+def _dedup_walk(top: str, skip: set, out: list):
+    # iteratief met os.scandir; symlinks, sockets en devices blijven buiten beschouwing
+    stack = [top]
+    while stack:
+        d = stack.pop()
+        try: it = os.scandir(d)
+        except OSError: continue
+        with it:
+            for e in it:
+                if e.path in skip or e.name.startswith(_WH): continue
+                try:
+                    if e.is_dir(follow_symlinks=False): stack.append(e.path)
+                    elif e.is_file(follow_symlinks=False): out.append((e.path, e.stat(follow_symlinks=False)))
+                except OSError: pass
+
+def _reflink(src: str, dst: str) -> bool:
+    """FICLONE (btrfs/xfs/bcachefs): eigen inode, gedeelde blokken; False als het FS dat niet kan."""
+    if not sys.platform.startswith("linux"): return False
+    import fcntl
+    try:
+        with open(src, "rb") as s, open(dst, "wb") as d: fcntl.ioctl(d.fileno(), 0x40049409, s.fileno())
+        return True
+    except OSError:
+        try: os.unlink(dst)
+        except OSError: pass
+        return False
+
+def _reflink_probe(src: str, dst: str) -> bool:
+    """Voor dedup -n: kan het FS van dst reflinken? Proefkloon naast dst die meteen weer weg is."""
+    tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.dedup~")
+    if not _reflink(src, tmp): return False
+    try: os.unlink(tmp)
+    except OSError: pass
+    return True
+
+def _dedup_replace(src, dst, mode: str, noref: set) -> str|None:
+    """Vervang dst door een reflink/hardlink naar src, alleen als beide nog zijn zoals bij het hashen."""
+    (sp, sst), (dp, dst_) = src, dst
+    if OVERLAY_BASE is not None and any(ov_upper(Path(p)) != Path(p) for p in (sp, dp)): return None
+    try:
+        for p, st in ((sp, sst), (dp, dst_)):
+            cur = os.lstat(p)
+            if (cur.st_size, cur.st_mtime_ns, cur.st_ino) != (st.st_size, st.st_mtime_ns, st.st_ino): return None
+    except OSError: return None
+    tmp = os.path.join(os.path.dirname(dp), f".{os.path.basename(dp)}.dedup~")
+    try:
+        if os.path.lexists(tmp): os.unlink(tmp)
+        if mode != "hardlink" and dst_.st_dev not in noref:
+            if _reflink(sp, tmp):
+                shutil.copystat(dp, tmp); os.replace(tmp, dp); return "reflink"
+            noref.add(dst_.st_dev)
+        if mode == "reflink": return None
+        os.link(sp, tmp); os.replace(tmp, dp); return "hardlink"
+    except OSError:
+        try: os.unlink(tmp)
+        except OSError: pass
+        return None
+
+def cmd_dedup(cwd: Path, args: list):
+    usage = "Usage: dedup [-n] [-j N] [--min-size BYTES] [--hardlink|--reflink] [PAD...]"
+    # standaard alleen reflinks: builtins schrijven in place, een hardlink zou elke kopie meenemen
+    dry = False; workers = os.cpu_count() or 4; min_size = 4096; mode = "reflink"; paths = []; i = 0
+    while i < len(args):
+        a = args[i]
+        if a in ("-n", "--dry-run"): dry = True
+        elif a in ("--hardlink", "--reflink"): mode = a[2:]
+        elif a in ("-j", "--min-size") and i+1 < len(args) and args[i+1].isdigit():
+            if a == "-j": workers = max(1, int(args[i+1]))
+            else: min_size = max(1, int(args[i+1]))
+            i += 1
+        elif a.startswith("-"): _err(f"dedup: unknown option {a}\n{usage}", 2); return
+        else: paths.append(a)
+        i += 1
+    tops = []
+    for p in paths or ["/"]:
+        t = resolve_path(cwd, p)
+        if not path_inside_root(t) or not t.is_dir(): _err(f"dedup: {p}: not a directory", 2); return
+        # overlay: alleen de upper; de base is alleen-lezen en wordt nooit vervangen of gelinkt
+        t = ov_upper(t)
+        if os.path.isdir(t): tops.append(t)
+    # state-bestanden (in-place herschreven) en vluchtige mappen nooit linken
+    skip = {str(SYSTEM_ROOT/p) for p in ("var/run", "var/log", "var/tmp")}
+    skip |= {str(p) for p in (META_FILE, PKG_DB_FILE, APT_REGISTRY, INIT_MARKER, DEDUP_INDEX)}
+    t0 = time.perf_counter(); files = []
+    for t in tops: _dedup_walk(str(t), skip, files)
+    by_size = {}
+    for path, st in files:
+        if st.st_size >= min_size: by_size.setdefault(st.st_size, []).append((path, st))
+    cands = [x for grp in by_size.values() if len(grp) > 1 for x in grp]
+    if os.name == "nt":   # scandir geeft op Windows geen st_ino/st_nlink
+        cands = [(p, os.lstat(p)) for p, _ in cands]
+    index = json_load(DEDUP_INDEX, {})
+    rel = lambda p: os.path.relpath(p, SYSTEM_ROOT).replace(os.sep, "/")
+    digests = {}; todo = []
+    for path, st in cands:
+        rec = index.get(rel(path))
+        if rec and rec[:3] == [st.st_size, st.st_mtime_ns, st.st_ino]: digests[path] = rec[3]
+        else: todo.append(path)
+    with ThreadPoolExecutor(workers) as ex:
+        for path, dig in zip(todo, ex.map(hash_file, todo)):
+            if dig: digests[path] = dig
+    groups = {}
+    for path, st in cands:
+        if path in digests:
+            groups.setdefault((st.st_dev, st.st_size, stat.S_IMODE(st.st_mode), st.st_uid, digests[path]), []).append((path, st))
+    linked = {"hardlink": 0, "reflink": 0}; dupes = ngroups = reclaimed = failed = 0; noref = set(); canref = set(); fresh = {}
+    for (_, size, *_), grp in groups.items():
+        inodes = {}
+        for path, st in grp: inodes.setdefault(st.st_ino, []).append((path, st))
+        if len(inodes) < 2: continue
+        ngroups += 1
+        keep = max(inodes, key=lambda n: (inodes[n][0][1].st_nlink, -min(st.st_mtime_ns for _, st in inodes[n])))
+        keeper = inodes[keep][0]
+        for ino, members in inodes.items():
+            if ino == keep: continue
+            done = 0
+            for m in members:
+                dupes += 1
+                if dry:
+                    dev = m[1].st_dev   # zoals _dedup_replace: eerst reflink, hardlink alleen met --hardlink
+                    if dev not in noref and dev not in canref: (canref if _reflink_probe(keeper[0], m[0]) else noref).add(dev)
+                    how = "reflink" if dev in canref else "hardlink" if mode == "hardlink" else None
+                    if how: print(f"would {how} /{rel(m[0])} -> /{rel(keeper[0])}"); done += 1
+                    continue
+                how = _dedup_replace(keeper, m, mode, noref)
+                if how: linked[how] += 1; done += 1; fresh[m[0]] = None
+                elif not (mode == "reflink" and m[1].st_dev in noref): failed += 1
+            if done == len(members) and members[0][1].st_nlink == len(members): reclaimed += size
+    if fresh:
+        invalidate_path_cache()
+        for p in fresh:
+            try: fresh[p] = os.lstat(p)
+            except OSError: pass
+    # index: alles buiten de gescande paden blijft, daarbinnen alleen wat nu bestaat
+    prefixes = [rel(t) for t in tops]
+    new = {k: v for k, v in index.items() if not any(px == "." or k == px or k.startswith(px + "/") for px in prefixes)}
+    for path, st in cands:
+        st = fresh.get(path) or st
+        if path in digests: new[rel(path)] = [st.st_size, st.st_mtime_ns, st.st_ino, digests[path]]
+    json_save(DEDUP_INDEX, new)
+    dt = time.perf_counter() - t0
+    print(f"dedup: {len(files)} files scanned, {len(cands)} candidates ({len(cands)-len(todo)} from index, {len(todo)} hashed) in {dt:.2f}s")
+    verb = "would reclaim" if dry else "reclaimed"
+    how = ", ".join(f"{k} {v}" for k, v in linked.items() if v)
+    print(f"dedup: {dupes} duplicate(s) in {ngroups} group(s)" + (f", linked {sum(linked.values())} ({how})" if how else "")
+          + (f", {failed} skipped (changed/failed)" if failed else "") + f"; {_fmt_bytes(reclaimed)} {verb}")
+    if noref and mode == "reflink":
+        _err("dedup: no reflink support on this filesystem; --hardlink links instead (in-place writes then change every copy)")
+    set_status(1 if failed and not sum(linked.values()) else 0)
+
+# ---------- snapshots (incrementeel via hardlinks) ----------
+SNAPSHOT_DIR = SYSTEM_ROOT.parent / f"{SYSTEM_ROOT.name}.snapshots"
+
+# vluchtig of met een eigen tijdlijn: het wijzigingsjournaal mag niet terug in de tijd (cursors), pager-sidecars zijn cache
+SNAP_SKIP = {"var/run", "var/cache/pager", "var/lib/lterm/fs-journal", "var/lib/lterm/fs-journal.tmp"}
+
+def _snap_skipped(rel: str) -> bool:
+    return any(rel == s or rel.startswith(s + "/") for s in SNAP_SKIP)
+
+def _snap_walk(root: str, skip: set):
+    """(rel, [soort, size, mtime_ns, mode, symlink-doel]) voor alles onder root; mappen vóór hun inhoud."""
+    stack = [""]
+    while stack:
+        rel = stack.pop()
+        try: it = os.scandir(os.path.join(root, rel) if rel else root)
+        except OSError: continue
+        with it:
+            for e in it:
+                r = f"{rel}/{e.name}" if rel else e.name
+                if r in skip: continue
+                try:
+                    st = e.stat(follow_symlinks=False)
+                    if stat.S_ISLNK(st.st_mode): yield r, ["l", 0, 0, 0, os.readlink(e.path)]
+                    elif stat.S_ISDIR(st.st_mode): yield r, ["d", 0, 0, stat.S_IMODE(st.st_mode), None]; stack.append(r)
+                    elif stat.S_ISREG(st.st_mode): yield r, ["f", st.st_size, st.st_mtime_ns, stat.S_IMODE(st.st_mode), None]
+                except OSError: pass
+
+def _snap_copy(src: str, dst: str):
+    # nooit een inode delen met de live root: reflink als het kan, anders echte kopie (mtime/mode mee)
+    if not _reflink(src, dst): shutil.copyfile(src, dst)
+    shutil.copystat(src, dst)
+
+def _snap_list() -> list[dict]:
+    out = []
+    try: names = os.listdir(SNAPSHOT_DIR)
+    except OSError: return out
+    for n in names:
+        info = json_load(SNAPSHOT_DIR/n/"info.json", None)
+        if info and not n.startswith("."): out.append(info)
+    # volgnummer eerst: "created" heeft secondenresolutie (oudere snapshots zonder seq komen daarvoor)
+    return sorted(out, key=lambda i: (i.get("seq", 0), i.get("created_ns", 0), i["created"]))
+
+def snapshot_create(name: str|None = None) -> dict|None:
+    if not name:   # standaardnaam per seconde; binnen dezelfde seconde -2, -3, ... erachter
+        stamp = name = datetime.now().strftime("%Y%m%d-%H%M%S"); n = 1
+        while (SNAPSHOT_DIR/name).exists() or (SNAPSHOT_DIR/f".tmp-{name}").exists(): n += 1; name = f"{stamp}-{n}"
+    if not re.fullmatch(r"[\w.-]+", name) or name.startswith("."): _err(f"snapshot: invalid name '{name}'", 2); return None
+    if (SNAPSHOT_DIR/name).exists(): _err(f"snapshot: '{name}' already exists", 1); return None
+    layered_save(META_FILE, META); pkg_db_save()
+    prev = (_snap_list() or [None])[-1]
+    base = SNAPSHOT_DIR/prev["name"] if prev else None
+    old = json_load(base/"manifest.json", {}) if base else {}
+    tmp = SNAPSHOT_DIR/f".tmp-{name}"; tree = tmp/"tree"; root = str(SYSTEM_ROOT)
+    shutil.rmtree(tmp, ignore_errors=True); tree.mkdir(parents=True)
+    t0 = time.perf_counter(); man = {}; linked = copied = nbytes = 0
+    try:
+        for rel, rec in _snap_walk(root, SNAP_SKIP):
+            dst = os.path.join(tree, rel)
+            if rec[0] == "d": os.mkdir(dst); man[rel] = rec; continue
+            if rec[0] == "l": os.symlink(rec[4], dst); man[rel] = rec; continue
+            o = old.get(rel)
+            if o and o[:4] == rec[:4]:
+                try: os.link(os.path.join(base, "tree", rel), dst); linked += 1; man[rel] = rec; continue
+                except OSError: pass
+            try: _snap_copy(os.path.join(root, rel), dst)
+            except OSError as e: _err(f"snapshot: {rel}: {e.strerror}"); continue
+            man[rel] = rec; copied += 1; nbytes += rec[1]
+        info = {"name": name, "created": datetime.now().isoformat(timespec="seconds"), "created_ns": time.time_ns(),
+                "seq": (prev.get("seq", 0) if prev else 0) + 1, "base": prev["name"] if prev else None,
+                "entries": len(man), "files": linked + copied, "copied": copied, "linked": linked,
+                "bytes_copied": nbytes, "bytes_total": sum(r[1] for r in man.values()), "secs": round(time.perf_counter() - t0, 3)}
+        json_save(tmp/"manifest.json", man); json_save(tmp/"info.json", info)
+        os.replace(tmp, SNAPSHOT_DIR/name)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True); raise
+    return info
+
+def snapshot_restore(name: str, dry: bool = False) -> dict|None:
+    """Zet de root terug naar de snapshot; alleen gewijzigde/ontbrekende/extra paden worden aangeraakt."""
+    snap = SNAPSHOT_DIR/name
+    man = json_load(snap/"manifest.json", None)
+    if man is None: _err(f"snapshot: '{name}': no such snapshot", 1); return None
+    root = str(SYSTEM_ROOT); tree = snap/"tree"
+    man = {r: rec for r, rec in man.items() if not _snap_skipped(r)}   # oudere snapshots bevatten het journaal nog
+    live = dict(_snap_walk(root, SNAP_SKIP))
+    gone = sorted((r for r, rec in live.items() if r not in man or man[r][0] != rec[0]), reverse=True)
+    todo = [r for r in sorted(man) if live.get(r) is None or r in gone or live[r][:4] != man[r][:4]
+            or (man[r][0] == "l" and live[r][4] != man[r][4])]
+    stats = {"removed": len(gone), "restored": len(todo), "unchanged": len(man) - len(todo)}
+    if dry:
+        for r in gone: print(f"remove  /{r}")
+        for r in todo: print(f"restore /{r}")
+        return stats
+    invalidate_path_cache()
+    for r in gone:
+        p = os.path.join(root, r)
+        try:
+            if live[r][0] == "d": shutil.rmtree(p)
+            else: os.unlink(p)
+        except FileNotFoundError: pass
+        except OSError as e: _err(f"snapshot: remove /{r}: {e.strerror}")
+    for r in todo:
+        rec = man[r]; p = os.path.join(root, r)
+        try:
+            if rec[0] == "d":
+                os.makedirs(p, exist_ok=True); os.chmod(p, rec[3]); continue
+            if rec[0] == "l":
+                if os.path.lexists(p): os.unlink(p)
+                os.symlink(rec[4], p); continue
+            tmp = os.path.join(os.path.dirname(p), f".{os.path.basename(p)}.restore~")
+            _snap_copy(os.path.join(tree, r), tmp); os.replace(tmp, p)
+        except OSError as e: _err(f"snapshot: restore /{r}: {e.strerror}")
+    set_system_root(SYSTEM_ROOT)   # META/PKG_DB opnieuw laden + caches leeg
+    fs_changed(SYSTEM_ROOT, "rescan")
+    return stats
+
+def cmd_snapshot(args: list):
+    usage = "Usage: snapshot create [NAAM] | list | restore [-n] NAAM | delete NAAM..."
+    sub, rest = (args[0], args[1:]) if args else ("list", [])
+    if sub == "create":
+        info = snapshot_create(rest[0] if rest else None)
+        if info: print(f"snapshot {info['name']}: {info['entries']} entries, {info['copied']} copied ({_fmt_bytes(info['bytes_copied'])}), "
+                       f"{info['linked']} linked from {info['base'] or '-'} in {info['secs']:.2f}s")
+    elif sub == "list":
+        snaps = _snap_list()
+        if not snaps: print(f"(no snapshots in {SNAPSHOT_DIR})"); return
+        rows = [["NAME", "CREATED", "FILES", "COPIED", "TOTAL", "BASE"]]
+        rows += [[i["name"], i["created"].replace("T", " "), str(i["files"]), _fmt_bytes(i["bytes_copied"]),
+                  _fmt_bytes(i["bytes_total"]), i["base"] or "-"] for i in snaps]
+        for line in _pad_cols(rows): print(line)
+    elif sub == "restore" and rest:
+        dry = rest[0] == "-n"; names = [a for a in rest if a != "-n"]
+        if len(names) != 1: _err(usage, 2); return
+        t0 = time.perf_counter(); st = snapshot_restore(names[0], dry)
+        if st: print(f"snapshot {names[0]}: {'would restore' if dry else 'restored'} {st['restored']}, "
+                     f"{'would remove' if dry else 'removed'} {st['removed']}, {st['unchanged']} unchanged in {time.perf_counter()-t0:.2f}s")
+    elif sub in ("delete", "rm") and rest:
+        for n in rest:
+            p = SNAPSHOT_DIR/n
+            if not n or n.startswith(".") or not (p/"info.json").exists(): _err(f"snapshot: '{n}': no such snapshot", 1); continue
+            shutil.rmtree(p); print(f"snapshot {n}: deleted")
+    else: _err(usage, 2)
+
+# ---------- overlay-beheer ----------
+def overlay_create(upper: Path, base: Path) -> bool:
+    """Nieuwe (lege) upper boven een read-only base: alleen een .overlay-bestand, dus milliseconden."""
+    if not base.is_dir(): _err(f"overlay: base '{base}': No such directory", 1); return False
+    if overlay_base_of(base) is not None: _err(f"overlay: base '{base}' is itself an overlay (use its base)", 1); return False
+    if upper == base or base in upper.parents or upper in base.parents:
+        _err(f"overlay: '{upper}' and base '{base}' must not contain each other", 1); return False
+    if upper.exists() and any(upper.iterdir()): _err(f"overlay: '{upper}' is not empty", 1); return False
+    upper.mkdir(parents=True, exist_ok=True)
+    json_save(upper / ".overlay", {"base": str(base), "created": datetime.now().isoformat(timespec="seconds")})
+    return True
+
+def cmd_overlay(args: list):
+    usage = "Usage: overlay create DIR [--base ROOT] | status"
+    sub, rest = (args[0], args[1:]) if args else ("status", [])
+    if sub == "create":
+        base = SYSTEM_ROOT; dirs = []; i = 0
+        while i < len(rest):
+            if rest[i] == "--base" and i + 1 < len(rest): base = Path(rest[i+1]).expanduser(); i += 2; continue
+            if rest[i].startswith("--base="): base = Path(rest[i][7:]).expanduser()
+            else: dirs.append(rest[i])
+            i += 1
+        if len(dirs) != 1: _err(usage, 2); return
+        t0 = time.perf_counter(); upper = Path(dirs[0]).expanduser().resolve(); base = base.resolve()
+        if overlay_create(upper, base):
+            print(f"overlay {upper}: base {base} ({(time.perf_counter()-t0)*1000:.1f}ms)")
+            print(f"start: {Path(sys.argv[0]).name} --root {shlex.quote(str(upper))}")
+    elif sub == "status" and not rest:
+        if OVERLAY_BASE is None: print(f"(no overlay: {SYSTEM_ROOT} is a plain root)"); return
+        files = nbytes = wh = 0
+        for root, _, names in os.walk(SYSTEM_ROOT):
+            for n in names:
+                if n.startswith(_WH): wh += 1; continue
+                try: nbytes += os.lstat(os.path.join(root, n)).st_size; files += 1
+                except OSError: pass
+        for line in _pad_cols([["base", str(OVERLAY_BASE)], ["upper", str(SYSTEM_ROOT)],
+                               ["upper files", f"{files} ({_fmt_bytes(nbytes)})"], ["whiteouts", str(wh)]]): print(line)
+    else: _err(usage, 2)
+
+# ---------- tar (native, streaming) ----------
+# Leden gaan in blokken van TAR_BUF tussen bestand en archief (tarfile stream-modus "w|"/"r|"):
+# nooit een heel lid in het geheugen. Compressie zit als losse laag eronder; zstd alleen met
+# het 'zstandard'-pakket. Opties die hier niet bestaan vallen door naar tar uit Git Bash.
+TAR_BUF = 1 << 20
+_TAR_MAGIC = [(b"\x1f\x8b", "gz"), (b"\xfd7zXZ\x00", "xz"), (b"BZh", "bz2"), (b"\x28\xb5\x2f\xfd", "zst")]
+
+def _zstd():
+    try: import zstandard; return zstandard
+    except ImportError: return None
+
+def tar_opts(args: list) -> dict|None:
+    """GNU-achtige opties (ook 'tar czf ...') → dict; None bij iets wat de native tar niet kent."""
+    o = {"mode": None, "comp": None, "file": None, "C": None, "v": False, "totals": False, "paths": []}
+    longs = {"create": ("mode", "c"), "extract": ("mode", "x"), "get": ("mode", "x"), "list": ("mode", "t"),
+             "gzip": ("comp", "gz"), "gunzip": ("comp", "gz"), "xz": ("comp", "xz"), "bzip2": ("comp", "bz2"),
+             "zstd": ("comp", "zst"), "verbose": ("v", True), "totals": ("totals", True)}
+    shorts = {"c": ("mode", "c"), "x": ("mode", "x"), "t": ("mode", "t"), "z": ("comp", "gz"),
+              "J": ("comp", "xz"), "j": ("comp", "bz2"), "v": ("v", True)}
+    args = list(args)
+    if args and not args[0].startswith("-"): args[0] = "-" + args[0]
+    i = 0
+    while i < len(args):
+        a = args[i]; i += 1
+        if a == "--": o["paths"] += args[i:]; break
+        if a.startswith("--"):
+            name, eq, val = a[2:].partition("=")
+            if name in longs and not eq: k, v = longs[name]; o[k] = v
+            elif name in ("file", "directory"):
+                if not eq:
+                    if i >= len(args): return None
+                    val = args[i]; i += 1
+                o["file" if name == "file" else "C"] = val
+            else: return None
+        elif a.startswith("-") and len(a) > 1:
+            for j, ch in enumerate(a[1:], 1):
+                if ch in shorts: k, v = shorts[ch]; o[k] = v
+                elif ch in "fC":
+                    val = a[j+1:]
+                    if not val:
+                        if i >= len(args): return None
+                        val = args[i]; i += 1
+                    o["file" if ch == "f" else "C"] = val; break
+                else: return None
+        else: o["paths"].append(a)
+    return o if o["mode"] and o["file"] and o["file"] != "-" else None
+
+def _tar_sniff(raw) -> str|None:
+    head = raw.peek(8)[:8] if hasattr(raw, "peek") else b""
+    return next((kind for magic, kind in _TAR_MAGIC if head.startswith(magic)), None)
+
+@contextmanager
+def _tar_stream(path: Path, write: bool, comp: str|None):
+    """Ruwe bestandslaag + (de)compressielaag; tarfile schrijft/leest daar sequentieel in."""
+    raw = open(path, "wb" if write else "rb", buffering=TAR_BUF)
+    try:
+        if not write: comp = _tar_sniff(raw)
+        if comp == "zst":
+            zs = _zstd()
+            if zs is None: raise OSError("zstd: module 'zstandard' not installed (pip install zstandard)")
+            f = zs.ZstdCompressor(level=3, threads=-1).stream_writer(raw, closefd=False) if write \
+                else zs.ZstdDecompressor().stream_reader(raw, closefd=False)
+        elif comp == "gz": f = PigzWriter(raw) if write else gzip.GzipFile(fileobj=raw)
+        elif comp == "xz": f = lzma.LZMAFile(raw, "wb" if write else "rb", preset=6 if write else None)
+        elif comp == "bz2": f = bz2.BZ2File(raw, "wb" if write else "rb")
+        else: f = None
+        try: yield f or raw
+        finally:
+            if f is not None: f.close()
+    finally: raw.close()
+
+def _tar_info(host: Path, arc: str, st) -> tarfile.TarInfo|None:
+    ti = tarfile.TarInfo(arc); m = META.get(meta_key(host), {})
+    mode = m.get("mode", "")
+    ti.mode = int(mode, 8) if re.fullmatch(r"[0-7]{3,4}", str(mode)) else stat.S_IMODE(st.st_mode)
+    ti.mtime = int(st.st_mtime); ti.uname = m.get("owner", USER); ti.gname = m.get("group", USER)
+    if stat.S_ISDIR(st.st_mode): ti.type = tarfile.DIRTYPE
+    elif stat.S_ISLNK(st.st_mode): ti.type = tarfile.SYMTYPE; ti.linkname = os.readlink(host)
+    elif stat.S_ISREG(st.st_mode): ti.size = st.st_size
+    else: return None
+    return ti
+
+def _tar_arcname(cwd: Path, arg: str, host: Path) -> str:
+    # zoals GNU tar: het pad zoals opgegeven, zonder leidende '/'; ~ en '..' via het rootpad
+    if arg.startswith("~") or ".." in arg.split("/"): return _ov_rel(host) or "."
+    return os.path.normpath(arg).replace(os.sep, "/").lstrip("/") or "."
+
+def _tar_create(cwd: Path, o: dict, arch: Path, st: dict):
+    base = resolve_path(cwd, o["C"]) if o["C"] else cwd
+    with _tar_stream(arch, True, o["comp"]) as f, \
+         tarfile.open(fileobj=f, mode="w|", format=tarfile.PAX_FORMAT, bufsize=TAR_BUF, copybufsize=TAR_BUF) as tf:
+        def add(host: Path, arc: str, s):
+            if ov_upper(host) == arch: _err(f"tar: {arc}: file is the archive; not dumped"); return
+            ti = _tar_info(host, arc, s)
+            if ti is None: _err(f"tar: {arc}: socket/device ignored"); return
+            if ti.isreg():
+                with open(host, "rb", buffering=0) as src: tf.addfile(ti, src)
+                st["bytes"] += ti.size
+            else: tf.addfile(ti)
+            st["entries"] += 1
+            if o["v"]: print(arc + ("/" if ti.isdir() else ""))
+        for a in o["paths"]:
+            host = resolve_path(base, a)
+            try: s = os.lstat(host)
+            except OSError: _err(f"tar: {a}: Cannot stat: No such file or directory", 2); st["failed"] += 1; continue
+            arc = _tar_arcname(base, a, host); add(host, arc, s)
+            if stat.S_ISDIR(s.st_mode):
+                top = len(str(ov_upper(host))) + 1
+                for hp, hs in scan_tree(host): add(hp, f"{arc}/" + str(ov_upper(hp))[top:].replace(os.sep, "/"), hs)
+
+def _tar_selected(name: str, paths: list) -> bool:
+    return not paths or any(name == p or name.startswith(p.rstrip("/") + "/") for p in paths)
+
+def _tar_read(cwd: Path, o: dict, arch: Path, st: dict):
+    tgt = copy_up(resolve_path(cwd, o["C"]) if o["C"] else cwd, data=False)
+    want = [os.path.normpath(p).replace(os.sep, "/").lstrip("/") for p in o["paths"]]; dirs = []
+    with _tar_stream(arch, False, None) as f, tarfile.open(fileobj=f, mode="r|", bufsize=TAR_BUF, copybufsize=TAR_BUF) as tf:
+        for m in tf:
+            name = os.path.normpath(m.name).replace(os.sep, "/").lstrip("/")
+            if not _tar_selected(name, want): continue
+            st["entries"] += 1
+            if o["mode"] == "t":
+                if o["v"]:
+                    kind = "d" if m.isdir() else "l" if m.issym() else "h" if m.islnk() else "-"
+                    perms = mode_to_str((stat.S_IFDIR if m.isdir() else stat.S_IFREG) | m.mode)[1:]
+                    link = f" -> {m.linkname}" if m.issym() else f" link to {m.linkname}" if m.islnk() else ""
+                    print(f"{kind}{perms} {m.uname or m.uid}/{m.gname or m.gid} {m.size:>9} "
+                          f"{datetime.fromtimestamp(m.mtime).strftime('%Y-%m-%d %H:%M')} {m.name}{link}")
+                else: print(m.name)
+                st["bytes"] += m.size; continue
+            if name == ".": continue
+            if name == ".." or name.startswith("../"):
+                _err(f"tar: {m.name}: Member name contains '..'"); st["failed"] += 1; continue
+            if o["v"]: print(m.name)
+            head, _, tail = name.rpartition("/")
+            dest = copy_up((resolve_path(tgt, head) if head else tgt) / tail, data=False)
+            if not path_inside_root(dest): _err(f"tar: {m.name}: outside the root; skipped"); st["failed"] += 1; continue
+            try:
+                if m.isdir(): dest.mkdir(parents=True, exist_ok=True); dirs.append((dest, m)); continue
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                if m.islnk():
+                    # hardlink-bron moet binnen de root liggen: anders komt een host-bestand in LinuxFS.
+                    # Symlinks blijven ongewijzigd (zoals GNU tar); de bestemming is hierboven al gecontroleerd.
+                    src = resolve_path(tgt, m.linkname.replace("\\", "/"))
+                    if not path_inside_root(src) or not os.path.isfile(src):
+                        _err(f"tar: {m.name}: Cannot hard link to '{m.linkname}'"); st["failed"] += 1; continue
+                if os.path.lexists(dest) and not os.path.isdir(dest) or os.path.islink(dest): os.unlink(dest)
+                if m.issym(): os.symlink(m.linkname, dest)
+                elif m.islnk():
+                    # een base-bestand (overlay) niet linken: schrijven via de link zou de base wijzigen
+                    if ov_upper(src) == src:
+                        try: os.link(src, dest)
+                        except OSError: shutil.copy2(src, dest)
+                    else: shutil.copy2(src, dest)
+                elif m.isreg():
+                    with tf.extractfile(m) as src, open(dest, "wb", buffering=0) as out: shutil.copyfileobj(src, out, TAR_BUF)
+                    st["bytes"] += m.size
+                else: _err(f"tar: {m.name}: special file ignored"); continue
+                if not m.issym():
+                    os.utime(dest, (m.mtime, m.mtime))
+                    if os.name != "nt": os.chmod(dest, m.mode & 0o7777)
+            except OSError as e: _err(f"tar: {m.name}: Cannot open: {e.strerror}"); st["failed"] += 1
+    # mappen pas na hun inhoud: anders overschrijft het uitpakken de mtime weer (en 0555 blokkeert schrijven)
+    for dest, m in reversed(dirs):
+        try:
+            os.utime(dest, (m.mtime, m.mtime))
+            if os.name != "nt": os.chmod(dest, m.mode & 0o7777)
+        except OSError: pass
+    fs_changed(tgt)
+
+def cmd_tar(cwd: Path, o: dict):
+    """Native tar -c/-x/-t (met -z/-J/-j/--zstd) op virtuele paden."""
+    if o["mode"] == "c" and not o["paths"]: _err("tar: Cowardly refusing to create an empty archive", 2); return
+    arch = resolve_path(cwd, o["file"]); st = {"entries": 0, "bytes": 0, "failed": 0}
+    if o["mode"] == "c": arch = copy_up(arch, data=False)
+    elif not arch.is_file(): _err(f"tar: {o['file']}: Cannot open: No such file or directory", 2); return
+    t0 = time.perf_counter()
+    try: (_tar_create if o["mode"] == "c" else _tar_read)(cwd, o, arch, st)
+    except (OSError, EOFError, ValueError, tarfile.TarError, lzma.LZMAError, zlib.error) as e:
+        _err(f"tar: {o['file']}: {e}", 2); return
+    finally:
+        if o["mode"] == "c": fs_changed(arch)
+    secs = max(time.perf_counter() - t0, 1e-9)
+    if o["totals"] or o["v"]:
+        try: size = os.path.getsize(arch)
+        except OSError: size = 0
+        print(f"tar: {st['entries']} entries, {_fmt_bytes(st['bytes'])} data, archive {_fmt_bytes(size)} "
+              f"in {secs:.2f}s ({_fmt_bytes(int(st['bytes'] / secs))}/s)", file=sys.stderr)
+    if st["failed"]: set_status(2)
+
+# ---------- gzip/gunzip/zstd (blok-parallel, pigz-stijl) ----------
+# Compressie per blok van GZ_BLOCK op een threadpool (zlib geeft de GIL vrij). Elk blok krijgt de
+# laatste 32KB van het vorige als woordenboek en eindigt met Z_SYNC_FLUSH, zodat de raw-deflate-stukken
+# in volgorde één geldige gzip-stream vormen. Decompressie is sequentieel; lezen loopt vooruit in een
+# tweede thread. zstd gebruikt de eigen workers van 'zstandard' (optioneel pakket).
+GZ_BLOCK = 128 << 10
+GZ_DICT = 32 << 10
+GZ_READ = 1 << 20
+COMPRESS_COMMANDS = ("gzip", "gunzip", "zcat", "zstd", "unzstd", "zstdcat")
+
+def _gz_block(data: bytes, zdict: bytes, level: int, last: bool) -> bytes:
+    co = zlib.compressobj(level, zlib.DEFLATED, -15, 9, zlib.Z_DEFAULT_STRATEGY, zdict) if zdict \
+        else zlib.compressobj(level, zlib.DEFLATED, -15, 9)
+    return co.compress(data) + co.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class PigzWriter:
+    """Bestandsachtige gzip-schrijver: blokken worden parallel gecomprimeerd en in volgorde geschreven."""
+    def __init__(self, raw, level: int = 6, threads: int = 0, name: str = "", mtime: int = 0):
+        self.raw, self.level = raw, level
+        self.threads = threads or os.cpu_count() or 1
+        self.pool = ThreadPoolExecutor(self.threads); self.pending = []
+        self.buf = bytearray(); self.prev = b""; self.crc = 0; self.size = 0; self.out = 0
+        hdr = b"\x1f\x8b\x08" + bytes([8 if name else 0]) + (int(mtime) & 0xffffffff).to_bytes(4, "little")
+        hdr += bytes([2 if level == 9 else 4 if level == 1 else 0, 255])
+        self._put(hdr + (name.encode("latin-1", "replace") + b"\0" if name else b""))
+    def _put(self, b: bytes): self.raw.write(b); self.out += len(b)
+    def _submit(self, blk: bytes, last: bool):
+        self.crc = zlib.crc32(blk, self.crc); self.size += len(blk)
+        self.pending.append(self.pool.submit(_gz_block, blk, self.prev, self.level, last)); self.prev = blk[-GZ_DICT:]
+        while len(self.pending) > 2 * self.threads: self._put(self.pending.pop(0).result())
+    def write(self, data) -> int:
+        self.buf += data
+        # het laatste (mogelijk korte) blok blijft staan tot close(): dat krijgt Z_FINISH
+        while len(self.buf) > GZ_BLOCK:
+            self._submit(bytes(self.buf[:GZ_BLOCK]), False); del self.buf[:GZ_BLOCK]
+        return len(data)
+    def flush(self): pass
+    def close(self):
+        if self.pool is None: return
+        self._submit(bytes(self.buf), True); self.buf.clear()
+        try:
+            for f in self.pending: self._put(f.result())
+        finally: self.pending = []; self.pool.shutdown(); self.pool = None
+        self._put(self.crc.to_bytes(4, "little") + (self.size & 0xffffffff).to_bytes(4, "little"))
+    def __enter__(self): return self
+    def __exit__(self, *exc): self.close()
+
+def gunzip_stream(src, dst) -> tuple[int, int]:
+    """gzip → ruwe bytes (ook aaneengeschakelde members); (in, uit). Lezen loopt één blok vooruit."""
+    d = zlib.decompressobj(31); nin = nout = 0; started = False
+    with ThreadPoolExecutor(1) as ex:
+        nxt = ex.submit(src.read, GZ_READ)
+        while True:
+            chunk = nxt.result()
+            if not chunk: break
+            nxt = ex.submit(src.read, GZ_READ); nin += len(chunk)
+            while chunk:
+                if d.eof: d = zlib.decompressobj(31)
+                out = d.decompress(chunk); started = True
+                if out: dst.write(out); nout += len(out)
+                chunk = d.unused_data if d.eof else b""
+                if d.eof and chunk.strip(b"\0") == b"": chunk = b""   # opvulnullen achter het laatste member
+    if not started or not d.eof: raise EOFError("unexpected end of file")
+    return nin, nout
+
+class _TextSink:
+    # bytes → tekst voor een stdout zonder binaire laag (pipeline naar een builtin)
+    def __init__(self, t): self.t = t; self.dec = codecs.getincrementaldecoder("utf-8")("replace")
+    def write(self, b: bytes): self.t.write(self.dec.decode(b))
+    def close(self): self.t.write(self.dec.decode(b"", final=True))
+
+class _NullSink:
+    def write(self, b: bytes): pass
+    def close(self): pass
+
+def _bin_stdout():
+    """Binaire stdout van deze thread (console of '> bestand'); None bij een tekst-pipe."""
+    t = _cur_out("stdout"); b = getattr(t, "buffer", None)
+    if b is not None: t.flush()
+    return b
+
+def compress_opts(cmd: str, args: list) -> dict|None:
+    """gzip/gunzip/zcat/zstd/unzstd/zstdcat-opties; None → val door naar het externe programma
+    (stdin, onbekende opties, zstd zonder module, gecomprimeerde data naar een tekst-pipe)."""
+    zst = cmd in ("zstd", "unzstd", "zstdcat")
+    if zst and _zstd() is None: return None
+    o = {"prog": cmd, "zst": zst, "d": cmd in ("gunzip", "zcat", "unzstd", "zstdcat"), "c": cmd in ("zcat", "zstdcat"),
+         "k": zst, "f": False, "t": False, "v": False, "level": 3 if zst else 6, "threads": 0, "out": None, "files": []}
+    longs = {"decompress": ("d", True), "uncompress": ("d", True), "stdout": ("c", True), "to-stdout": ("c", True),
+             "keep": ("k", True), "rm": ("k", False), "force": ("f", True), "test": ("t", True), "verbose": ("v", True),
+             "quiet": ("v", False), "fast": ("level", 1), "best": ("level", 19 if zst else 9)}
+    shorts = {"d": ("d", True), "c": ("c", True), "k": ("k", True), "f": ("f", True), "t": ("t", True),
+              "v": ("v", True), "q": ("v", False)}
+    i = 0
+    while i < len(args):
+        a = args[i]; i += 1
+        if a == "--": o["files"] += args[i:]; break
+        if re.fullmatch(r"-\d+", a): o["level"] = int(a[1:])
+        elif a.startswith("--"):
+            name, eq, val = a[2:].partition("=")
+            if name in longs and not eq: k, v = longs[name]; o[k] = v
+            elif name in ("processes", "threads") and eq and val.isdigit(): o["threads"] = int(val)
+            else: return None
+        elif a.startswith("-") and len(a) > 1:
+            for j, ch in enumerate(a[1:], 1):
+                if ch in shorts: k, v = shorts[ch]; o[k] = v
+                elif ch in "pTo":
+                    val = a[j+1:]
+                    if not val:
+                        if i >= len(args): return None
+                        val = args[i]; i += 1
+                    if ch == "o": o["out"] = val
+                    elif val.isdigit(): o["threads"] = int(val)
+                    else: return None
+                    break
+                else: return None
+        else: o["files"].append(a)
+    if not o["files"] or "-" in o["files"] or not 1 <= o["level"] <= (22 if zst else 9): return None
+    if o["out"] and (len(o["files"]) != 1 or not zst): return None
+    if o["c"] and not o["d"] and not o["t"] and _bin_stdout() is None: return None
+    return o
+
+def _compress_one(src, dst, o: dict, name: str, mtime: int) -> tuple[int, int]:
+    if o["zst"]:
+        zs = _zstd()
+        if o["d"] or o["t"]: return zs.ZstdDecompressor().copy_stream(src, dst, read_size=GZ_READ, write_size=GZ_READ)
+        return zs.ZstdCompressor(level=o["level"], threads=o["threads"] or -1).copy_stream(src, dst, read_size=GZ_READ, write_size=GZ_READ)
+    if o["d"] or o["t"]: return gunzip_stream(src, dst)
+    w = PigzWriter(dst, o["level"], o["threads"], name, mtime)
+    shutil.copyfileobj(src, w, GZ_READ); w.close()
+    return w.size, w.out
+
+def cmd_compress(cwd: Path, o: dict):
+    prog = o["prog"]; suf = ".zst" if o["zst"] else ".gz"; tsuf = ".tzst" if o["zst"] else ".tgz"
+    invalidate_path_cache()
+    for name in o["files"]:
+        p = resolve_path(cwd, name)
+        if not p.exists(): _err(f"{prog}: {name}: No such file or directory"); continue
+        if p.is_dir(): _err(f"{prog}: {name} is a directory -- ignored", 2); continue
+        decomp = o["d"] or o["t"]; base = p.name; low = base.lower()
+        if decomp:
+            if low.endswith(suf) and len(base) > len(suf): outname = base[:-len(suf)]
+            elif low.endswith(tsuf): outname = base[:-len(tsuf)] + ".tar"
+            elif o["c"] or o["t"]: outname = base
+            else: _err(f"{prog}: {name}: unknown suffix -- ignored", 2); continue
+        elif low.endswith(suf) and not o["c"] and not o["f"]:
+            _err(f"{prog}: {name} already has {suf} suffix -- unchanged", 2); continue
+        else: outname = base + suf
+        if o["c"] and not decomp and not o["f"] and _cur_out("stdout").isatty():
+            _err(f"{prog}: compressed data not written to a terminal. Use -f to force compression."); return
+        out = None; t0 = time.perf_counter(); st = p.stat()
+        try:
+            with open(p, "rb", buffering=0) as src:
+                if o["t"]: nin, nout = _compress_one(src, _NullSink(), o, base, int(st.st_mtime))
+                elif o["c"]:
+                    b = _bin_stdout(); sink = b if b is not None else _TextSink(_cur_out("stdout"))
+                    nin, nout = _compress_one(src, sink, o, base, int(st.st_mtime))
+                    if b is None: sink.close()
+                    else: b.flush()
+                else:
+                    out = copy_up(resolve_path(cwd, o["out"]) if o["out"] else p.with_name(outname), data=False)
+                    if out.exists() and not o["f"]:
+                        _err(f"{prog}: {out.name} already exists; not overwritten"); out = None; continue
+                    with open(out, "wb", buffering=GZ_READ) as dst: nin, nout = _compress_one(src, dst, o, base, int(st.st_mtime))
+                    shutil.copystat(p, out); fs_changed(out, "create")
+        except (OSError, EOFError, zlib.error) as e:
+            _err(f"{prog}: {name}: {e}")
+            if out is not None:
+                try: out.unlink()
+                except OSError: pass
+            continue
+        except Exception as e:   # zstandard.ZstdError
+            _err(f"{prog}: {name}: {e}"); continue
+        if out is not None and not o["k"]: ov_remove(p); fs_changed(p, "delete")
+        if o["v"]:
+            secs = max(time.perf_counter() - t0, 1e-9); raw, packed = (nout, nin) if decomp else (nin, nout)
+            what = "OK" if o["t"] else f"{'kept' if o['k'] else 'replaced with'} {out.name}" if out is not None else "stdout"
+            print(f"{name}:\t{(1 - packed / raw) * 100 if raw else 0:5.1f}% -- {what} "
+                  f"({_fmt_bytes(int(raw / secs))}/s)", file=sys.stderr)
+
+# ---------- pager (less/more) met persistente regelindex ----------
+# Spaarse index: per blok van PAGER_BLOCK bytes het aantal newlines vóór dat blok (array 'Q').
+# Regel N = bisect + hooguit één blok lezen; procent = byte-offset. De index wordt op de achtergrond
+# via mmap opgebouwd en als sidecar in /var/cache/pager bewaard; een gegroeid bestand (log) gaat
+# verder vanaf het laatste volle blok, mits de staart van het oude stuk nog dezelfde is.
+PAGER_BLOCK = 64 << 10
+PAGER_CHUNK = 64 * PAGER_BLOCK
+PAGER_PERSIST_MIN = 1 << 20
+PAGER_CACHE = SYSTEM_ROOT / "var" / "cache" / "pager"
+
+def _pager_side(path) -> Path:
+    return PAGER_CACHE / (hashlib.sha1(str(path).encode("utf-8", "surrogateescape")).hexdigest()[:24] + ".idx")
+
+@fs_subscribe
+def _pager_changed(path: str, kind: str, ts: float):
+    # nieuw of weg: de sidecar weggooien. Bij modify (ook >>) niet: LineIndex._load toetst size/mtime/staart
+    # zelf en bouwt bij een append alleen het nieuwe stuk bij
+    if kind not in ("delete", "create") or path == "/" or not PAGER_CACHE.is_dir(): return
+    for r in (SYSTEM_ROOT, OVERLAY_BASE):
+        if r is None: continue
+        try: os.unlink(_pager_side(r / path.lstrip("/")))
+        except OSError: pass
+
+class LineIndex:
+    def __init__(self, path: Path, persist: bool = True):
+        self.path = path; self.persist = persist
+        self.counts = array("Q", [0]); self.lines = 0; self.pos = 0; self.loaded = False
+        st = os.stat(path); self.size, self.mtime = st.st_size, st.st_mtime_ns; self.done = threading.Event()
+        self.side = _pager_side(path)
+        if persist: self._load()
+        if self.pos >= self.size: self.done.set()
+        else: threading.Thread(target=self._build, daemon=True).start()
+
+    def _tail_sig(self, size: int) -> str:
+        with open(self.path, "rb") as f: f.seek(max(0, size - 4096)); return hashlib.sha1(f.read(min(size, 4096))).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.side, "rb") as f: hdr = json.loads(f.readline()); raw = f.read()
+            if hdr.get("path") != str(self.path) or hdr.get("block") != PAGER_BLOCK or not 0 < hdr["size"] <= self.size: return
+            # even groot maar andere mtime: ergens middenin bewerkt, de staart zegt dan niets
+            if hdr["size"] == self.size and hdr.get("mtime") != self.mtime: return
+            if self._tail_sig(hdr["size"]) != hdr.get("tail"): return
+        except (OSError, ValueError, KeyError): return
+        counts = array("Q"); counts.frombytes(raw[:len(raw) // 8 * 8])
+        if not counts: return
+        if hdr["size"] == self.size: self.counts, self.lines, self.pos = counts, hdr["lines"], self.size
+        else: k = len(counts) - 1; self.counts, self.lines, self.pos = counts, counts[k], k * PAGER_BLOCK
+        self.loaded = True
+
+    def _save(self):
+        try:
+            hdr = {"path": str(self.path), "size": self.size, "mtime": self.mtime, "block": PAGER_BLOCK, "lines": self.lines, "tail": self._tail_sig(self.size)}
+            self.side.parent.mkdir(parents=True, exist_ok=True); tmp = self.side.with_suffix(".tmp")
+            with open(tmp, "wb") as f: f.write(json.dumps(hdr).encode() + b"\n"); self.counts.tofile(f)
+            os.replace(tmp, self.side)
+        except OSError: pass
+
+    def _build(self):
+        try:
+            with open(self.path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                end = min(len(mm), self.size)
+                while self.pos < end:
+                    chunk = mm[self.pos:min(end, self.pos + PAGER_CHUNK)]
+                    for s in range(0, len(chunk), PAGER_BLOCK):
+                        self.lines += chunk.count(b"\n", s, s + PAGER_BLOCK)
+                        if s + PAGER_BLOCK <= len(chunk): self.counts.append(self.lines)
+                    self.pos += len(chunk)
+        except (OSError, ValueError): self.pos = self.size
+        finally: self.done.set()
+        if self.persist and self.size >= PAGER_PERSIST_MIN: self._save()
+
+    def total(self) -> int|None:
+        """Aantal regels (een laatste regel zonder newline telt mee); None zolang de index loopt."""
+        if not self.done.is_set(): return None
+        if not self.size: return 0
+        with open(self.path, "rb") as f: f.seek(self.size - 1); return self.lines + (f.read(1) != b"\n")
+
+    def wait_lines(self, n: int):
+        while self.lines < n and not self.done.wait(0.05): pass
+
+    def wait_pos(self, off: int):
+        while self.pos < off and not self.done.wait(0.05): pass
+
+    def offset(self, n: int, f) -> int|None:
+        """Byte-offset van regel n (0-based), None als die (nog) niet in de index zit."""
+        if n <= 0: return 0
+        if n > self.lines: return None
+        j = bisect_left(self.counts, n) - 1
+        f.seek(j * PAGER_BLOCK); data = f.read(PAGER_BLOCK); i = -1
+        for _ in range(n - self.counts[j]): i = data.find(b"\n", i + 1)
+        return j * PAGER_BLOCK + i + 1
+
+    def line_of(self, off: int, f) -> int:
+        j = min(off // PAGER_BLOCK, len(self.counts) - 1)
+        f.seek(j * PAGER_BLOCK); return self.counts[j] + f.read(off - j * PAGER_BLOCK).count(b"\n")
+
+class _TermKeys:
+    """Toetsen van de console (Windows: msvcrt; anders /dev/tty in cbreak-modus); pijltjes → namen."""
+    _WIN = {"H": "UP", "P": "DOWN", "I": "PGUP", "Q": "PGDN", "G": "HOME", "O": "END"}
+    _ESC = {"[A": "UP", "[B": "DOWN", "[5~": "PGUP", "[6~": "PGDN", "[H": "HOME", "[F": "END",
+            "[1~": "HOME", "[4~": "END", "OA": "UP", "OB": "DOWN", "OH": "HOME", "OF": "END"}
+    def __enter__(self):
+        if os.name == "nt": import msvcrt; self.m = msvcrt
+        else:
+            import termios, tty
+            self.fd = os.open("/dev/tty", os.O_RDONLY); self.saved = termios.tcgetattr(self.fd); tty.setcbreak(self.fd)
+        return self
+    def __exit__(self, *exc):
+        if os.name != "nt":
+            import termios
+            termios.tcsetattr(self.fd, termios.TCSADRAIN, self.saved); os.close(self.fd)
+    def get(self) -> str:
+        if os.name == "nt":
+            ch = self.m.getwch()
+            return self._WIN.get(self.m.getwch(), "") if ch in ("\x00", "\xe0") else ch
+        import select
+        b = os.read(self.fd, 1)
+        if b == b"\x1b":
+            seq = b""
+            while len(seq) < 4 and select.select([self.fd], [], [], 0.03)[0]:
+                seq += os.read(self.fd, 1)
+                if seq[-1:].isalpha() or seq.endswith(b"~"): break
+            return self._ESC.get(seq.decode("ascii", "replace"), "ESC" if not seq else "")
+        need = 0 if b[0] < 0xc0 else 1 if b[0] < 0xe0 else 2 if b[0] < 0xf0 else 3
+        return (b + (os.read(self.fd, need) if need else b"")).decode("utf-8", "replace")
+
+_CTRL = re.compile(r"[\x00-\x08\x0b-\x1f\x7f]")
+
+class Pager:
+    def __init__(self, path: Path, name: str, idx: LineIndex, keys, numbers: bool = False):
+        self.f = open(path, "rb"); self.name, self.idx, self.keys = name, idx, keys
+        self.top = 0; self.off = 0; self.numbers = numbers; self.rx = None; self.back = False; self.msg = ""
+
+    def size(self): return shutil.get_terminal_size((80, 24))
+
+    def _line(self, raw: bytes, cols: int, n: int) -> str:
+        t = _CTRL.sub(lambda m: "^" + chr(ord(m.group()) ^ 0x40), raw.rstrip(b"\r\n").decode("utf-8", "replace").expandtabs(8))
+        t = (f"{n:>7} " if self.numbers else "") + t
+        t = t[:cols - 1] if len(t) >= cols else t
+        return self.rx.sub(lambda m: f"\x1b[7m{m.group()}\x1b[27m", t) if self.rx else t
+
+    def render(self, status: str|None = None):
+        cols, rows = self.size(); body = rows - 1
+        self.f.seek(self.off); out = ["\x1b[H\x1b[2J"]
+        for i in range(body):
+            raw = self.f.readline()
+            out.append((self._line(raw, cols, self.top + i + 1) if raw else "~") + "\r\n")
+        if status is None:
+            total = self.idx.total(); pct = self.f.tell() * 100 // self.idx.size if self.idx.size else 100
+            status = f"{self.name}  lines {self.top + 1}-{self.top + body}/{total if total is not None else '?'}  {min(pct, 100)}%"
+            if not self.idx.done.is_set(): status += f"  (indexing {self.idx.pos * 100 // max(1, self.idx.size)}%)"
+            if self.msg: status += f"  {self.msg}"
+        out.append(f"\x1b[7m{status[:cols - 1]}\x1b[0m")
+        sys.stdout.write("".join(out)); sys.stdout.flush()
+
+    def goto(self, n: int):
+        cols, rows = self.size(); body = rows - 1
+        total = self.idx.total()
+        if total is not None: n = min(n, max(0, total - body))
+        n = max(0, n)
+        if n > self.top and n - self.top <= 4 * body:
+            # kort vooruit: gewoon regels doorlopen, geen index nodig
+            self.f.seek(self.off)
+            while self.top < n:
+                raw = self.f.readline()
+                if not raw or self.f.tell() >= self.idx.size: break
+                self.top += 1; self.off = self.f.tell()
+            return
+        self.idx.wait_lines(n)
+        off = self.idx.offset(n, self.f)
+        if off is not None: self.top, self.off = n, off
+
+    def goto_end(self):
+        self.idx.done.wait(); self.goto(self.idx.total() or 0)
+
+    def goto_pct(self, pct: int):
+        off = self.idx.size * min(max(pct, 0), 100) // 100
+        self.idx.wait_pos(off); self.goto(self.idx.line_of(off, self.f))
+
+    def search(self, backward: bool) -> bool:
+        """Streamend zoeken vanaf de huidige pagina; de treffer wordt de bovenste regel."""
+        if backward:
+            pos, tail = self.off, b""
+            while pos > 0:
+                step = min(PAGER_CHUNK, pos); pos -= step; self.f.seek(pos); data = self.f.read(step) + tail
+                if pos > 0:
+                    cut = data.find(b"\n")
+                    if cut < 0: tail = data; continue
+                    tail, data, base = data[:cut + 1], data[cut + 1:], pos + cut + 1
+                else: base = 0
+                starts = [base]; lines = data.split(b"\n")[:-1]
+                for ln in lines[:-1]: starts.append(starts[-1] + len(ln) + 1)
+                for st, ln in zip(reversed(starts), reversed(lines)):
+                    if self.rx.search(ln.decode("utf-8", "replace")):
+                        self.idx.wait_pos(st); self.top, self.off = self.idx.line_of(st, self.f), st; return True
+            return False
+        self.f.seek(self.off); n = self.top
+        self.f.readline(); n += 1
+        while True:
+            st = self.f.tell(); raw = self.f.readline()
+            if not raw: return False
+            if self.rx.search(raw.decode("utf-8", "replace")): self.top, self.off = n, st; return True
+            n += 1
+
+    def prompt(self, lead: str) -> str|None:
+        buf = ""
+        while True:
+            cols, rows = self.size()
+            sys.stdout.write(f"\x1b[{rows};1H\x1b[2K{lead}{buf}"); sys.stdout.flush()
+            k = self.keys.get()
+            if k in ("\r", "\n"): return buf
+            if k in ("ESC", "\x03", "\x07"): return None
+            if k in ("\x7f", "\x08"):
+                if not buf: return None
+                buf = buf[:-1]
+            elif len(k) == 1 and k.isprintable(): buf += k
+
+    def run(self):
+        num = ""
+        while True:
+            self.render(f":{num}" if num else None); self.msg = ""
+            try: k = self.keys.get()
+            except KeyboardInterrupt: k = "\x03"
+            if k.isdigit() and len(k) == 1: num += k; continue
+            n = int(num) if num else None; num = ""
+            cols, rows = self.size(); body = rows - 1
+            try:
+                if k in ("q", "Q", "ZZ"): return
+                elif k in (" ", "f", "PGDN", "\x06", "z"): self.goto(self.top + (n or body))
+                elif k in ("b", "PGUP", "\x02", "w"): self.goto(self.top - (n or body))
+                elif k in ("j", "e", "\r", "\n", "DOWN", "\x0e"): self.goto(self.top + (n or 1))
+                elif k in ("k", "y", "UP", "\x10"): self.goto(self.top - (n or 1))
+                elif k in ("d", "\x04"): self.goto(self.top + (n or body // 2))
+                elif k in ("u", "\x15"): self.goto(self.top - (n or body // 2))
+                elif k in ("g", "<", "HOME"): self.goto((n or 1) - 1)
+                elif k in ("G", ">", "END"): self.goto(n - 1) if n else self.goto_end()
+                elif k in ("p", "%"): self.goto_pct(n or 0)
+                elif k in ("/", "?"):
+                    pat = self.prompt(k)
+                    if pat:
+                        try: self.rx = re.compile(pat, 0 if any(ch.isupper() for ch in pat) else re.I)
+                        except re.error: self.rx = re.compile(re.escape(pat), re.I)
+                        self.back = k == "?"
+                        if not self.search(self.back): self.msg = "Pattern not found"
+                elif k in ("n", "N"):
+                    if self.rx is None: self.msg = "No previous search"
+                    elif not self.search(self.back != (k == "N")): self.msg = "Pattern not found"
+                elif k == "-":
+                    if self.keys.get() == "N": self.numbers = not self.numbers
+                elif k in ("=", "\x07"):
+                    total = self.idx.total()
+                    self.msg = (f"{_fmt_bytes(self.idx.size)}, {total if total is not None else '?'} lines, "
+                                f"index {'from cache' if self.idx.loaded else 'built'}")
+                elif k in ("h", "H"):
+                    self.msg = "q quit  space/b page  j/k line  g/G top/end  Ng line  N% pct  /? search  n/N next  -N numbers"
+            except KeyboardInterrupt: self.msg = "interrupted"
+
+def cmd_less(cwd: Path, args: list):
+    numbers = False; files = []
+    for a in args:
+        if a in ("-N", "--LINE-NUMBERS"): numbers = True
+        elif a.startswith("-") and a != "-": pass       # overige less-opties: genegeerd
+        else: files.append(a)
+    inp = _io_stdin()
+    if not sys.stdout.isatty() or getattr(_sess_tls, "session", None) is not None:
+        # geen console (pipe, bestand, daemon-sessie): zoals less gewoon doorgeven
+        bout = _bin_stdout()
+        if bout is not None: set_status(cat_raw(cwd, files, inp, bout))
+        else: set_status(_emit(gen_cat(cwd, files, inp)) or 0)
+        return
+    spool = None
+    if not files:
+        if inp is None: _err('Missing filename ("less --help" for help)'); return
+        spool = SYSTEM_ROOT / "var" / "tmp" / f"less-{os.getpid()}-{threading.get_ident()}.txt"
+        spool.parent.mkdir(parents=True, exist_ok=True)
+        with open(spool, "wb") as f:
+            for line in inp: f.write(line.encode("utf-8", "surrogateescape"))
+        targets = [(spool, "(stdin)")]
+    else:
+        targets = []
+        for a in files:
+            p = resolve_path(cwd, a)
+            if p.is_file(): targets.append((p, a))
+            else: _err(f"less: {a}: No such file or directory")
+    if not targets: return
+    sys.stdout.write("\x1b[?1049h"); sys.stdout.flush()
+    try:
+        with _TermKeys() as keys:
+            for p, name in targets:
+                pg = Pager(p, name, LineIndex(p, persist=spool is None), keys, numbers)
+                try: pg.run()
+                finally: pg.f.close()
+    finally:
+        sys.stdout.write("\x1b[?1049l"); sys.stdout.flush()
+        if spool is not None:
+            try: spool.unlink()
+            except OSError: pass
+
+# ---------- MSYS add-ons (optioneel) ----------
+def install_msys_addons_pretty() -> bool:
+    if not MSYS_ADDONS_URL: return False
+    zip_path = download_git_zip_via_your_snippet(MSYS_ADDONS_URL, "MSYS2-packages-master.zip")
+    if not zip_path: return False
+    # Uitpakken in PortableGit-root zodat usr/bin, mingw64/bin etc. worden samengevoegd
+    ok = unzip_with_progress(zip_path, GIT_HOME, "MSYS2-packages-master.zip")
+    return ok
+
+# ---------- dispatcher ----------
+# In-process builtins; al het andere is extern (git, scripts, PortableGit-tools, bash).
+# ---------- command-registry & plugins ----------
+# COMMANDS: naam → (fn(ctx, args), accept). accept(args) → False laat het commando doorvallen naar
+# de externe route (tar/gzip/sort met opties die de native versie niet kent). @builtin registreert;
+# pipe=True registreert een regel-generator gen(cwd, args, inp) die ook native in pipelines draait.
+# Plugins: *.py in /usr/lib/lterm/plugins met bovenin "# lterm-commands: naam ..."; alleen die kop
+# wordt gelezen, de module pas geïmporteerd als één van de commando's voor het eerst draait.
+COMMANDS = {}
+BUILTIN_COMMANDS = set()
+PLUGIN_DIR = SYSTEM_ROOT / "usr" / "lib" / "lterm" / "plugins"
+_PLUGINS = {"key": None, "cmds": {}, "loaded": {}, "owner": {}}
+_PLUGIN_HDR = re.compile(r"#\s*lterm-commands:\s*(.+)")
+
+class CmdCtx:
+    """Wat een builtin van de shell ziet; cwd/cache aanpassen = nieuwe cwd/git-env voor de sessie."""
+    __slots__ = ("line", "cwd", "cache")
+    def __init__(self, line: str, cwd: Path, cache: dict|None): self.line, self.cwd, self.cache = line, cwd, cache
+
+def builtin(*names, accept=None, pipe=False):
+    def deco(fn):
+        for n in names:
+            if pipe: PIPE_BUILTINS[n] = fn; COMMANDS[n] = ((lambda ctx, args, n=n: run_gen_builtin(ctx.cwd, n, args)), accept)
+            else: COMMANDS[n] = (fn, accept)
+            BUILTIN_COMMANDS.add(n)
+        return fn
+    return deco
+
+def _plugin_index() -> dict:
+    """naam → pluginbestand; opnieuw gescand als de pluginmap verandert (bestand erbij/weg)."""
+    try: key = (str(PLUGIN_DIR), PLUGIN_DIR.stat().st_mtime_ns)
+    except OSError: return {}
+    if _PLUGINS["key"] != key:
+        cmds = {}
+        for f in sorted(PLUGIN_DIR.glob("*.py")):
+            try:
+                with open(f, encoding="utf-8", errors="replace") as fh: head = list(islice(fh, 5))
+            except OSError: continue
+            for line in head:
+                m = _PLUGIN_HDR.match(line)
+                if m:
+                    for n in m.group(1).split(): cmds.setdefault(n, f)
+        _PLUGINS.update(key=key, cmds=cmds)
+    return _PLUGINS["cmds"]
+
+@fs_subscribe
+def _plugins_changed(path: str, kind: str, ts: float):
+    # een plugin bewerken verandert de mtime van de map niet: de index hangt daarom (ook) aan de feed
+    if fs_affects(path, "/" + (_ov_rel(PLUGIN_DIR) or "")): _PLUGINS["key"] = None
+
+def _plugin_builtin(path: Path):
+    """builtin() zoals een plugin hem krijgt: alleen namen uit de eigen kop, nooit over een bestaand commando heen."""
+    def guarded(*names, accept=None, pipe=False):
+        own = {n for n, f in _plugin_index().items() if f == path}; ok = []
+        for n in names:
+            if n in COMMANDS or n in PIPE_BUILTINS: _err(f"plugin {path.name}: '{n}' is already a command; not overridden")
+            elif n not in own: _err(f"plugin {path.name}: '{n}' is not in its '# lterm-commands:' header; ignored")
+            else: ok.append(n); _PLUGINS["owner"][n] = path
+        return builtin(*ok, accept=accept, pipe=pipe)
+    return guarded
+
+class _PluginAPI:
+    """lterm zoals een plugin hem ziet: de publieke namen van de shell, maar builtin is de bewaakte
+    versie en de registers zelf (waarmee je die zou omzeilen) ontbreken. Geen sandbox, wel de API."""
+    __slots__ = ("builtin",)
+    _HIDDEN = frozenset({"builtin", "COMMANDS", "PIPE_BUILTINS", "BUILTIN_COMMANDS"})
+    def __init__(self, guarded): self.builtin = guarded
+    def __getattr__(self, n):
+        if n.startswith("_") or n in _PluginAPI._HIDDEN: raise AttributeError(f"lterm has no public attribute '{n}'")
+        return getattr(sys.modules[__name__], n)
+
+def load_plugin(path: Path):
+    mod = _PLUGINS["loaded"].get(str(path))
+    if mod is not None: return mod
+    name = "lterm_plugin_" + re.sub(r"\W", "_", path.stem)
+    spec = importlib.util.spec_from_file_location(name, path); mod = importlib.util.module_from_spec(spec)
+    mod.builtin = _plugin_builtin(path); mod.lterm = _PluginAPI(mod.builtin)
+    try: spec.loader.exec_module(mod)
+    except Exception as e: _err(f"plugin {path.name}: {type(e).__name__}: {e}"); return None
+    sys.modules[name] = _PLUGINS["loaded"][str(path)] = mod
+    return mod
+
+def lookup_builtin(cmd: str):
+    ent = COMMANDS.get(cmd)
+    if ent is None:
+        path = _plugin_index().get(cmd)
+        if path is not None and load_plugin(path) is not None:
+            ent = COMMANDS.get(cmd)
+            if ent is None: _err(f"{cmd}: plugin {path.name} did not register this command")
+    return ent
+
+def is_builtin(cmd: str) -> bool: return cmd in COMMANDS or cmd in _plugin_index()
+
+def pipe_builtin(cmd: str, args: list):
+    """Generator-builtin voor een pipeline-stage, of None (geen, of opties die hij niet kent)."""
+    ent = lookup_builtin(cmd)
+    if ent is None or (ent[1] is not None and not ent[1](args)): return None
+    return PIPE_BUILTINS.get(cmd)
+
+for _n in list(PIPE_BUILTINS):
+    builtin(_n, accept=(lambda args, p=TEXT_OPTS[_n]: p(args) is not None) if _n in TEXT_OPTS else None, pipe=True)(PIPE_BUILTINS[_n])
+
+for _names, _fn in [
+    (("set",), lambda ctx, a: cmd_set(a)), (("jobs",), lambda ctx, a: cmd_jobs(a)),
+    (("fg",), lambda ctx, a: cmd_fg(a)), (("bg",), lambda ctx, a: cmd_bg(a)),
+    (("wait",), lambda ctx, a: set_status(wait_jobs(a))), (("kill",), lambda ctx, a: cmd_kill(a)),
+    (("true", ":"), lambda ctx, a: None), (("false",), lambda ctx, a: set_status(1)),
+    (("ls",), lambda ctx, a: cmd_ls(ctx.cwd, a)), (("rmdir",), lambda ctx, a: cmd_rmdir(ctx.cwd, a)),
+    (("whoami",), lambda ctx, a: print(USER)), (("clear",), lambda ctx, a: do_clear()),
+    (("help",), lambda ctx, a: cmd_help(a)), (("rm",), lambda ctx, a: cmd_rm(ctx.cwd, a)),
+    (("cp",), lambda ctx, a: cmd_cp(ctx.cwd, a)), (("mv",), lambda ctx, a: cmd_mv(ctx.cwd, a)),
+    (("chmod",), lambda ctx, a: cmd_chmod(ctx.cwd, a)), (("chown",), lambda ctx, a: cmd_chown(ctx.cwd, a)),
+    (("which",), lambda ctx, a: cmd_which(a)), (("bench",), lambda ctx, a: cmd_bench(ctx.cwd, a)),
+    (("dedup",), lambda ctx, a: cmd_dedup(ctx.cwd, a)), (("overlay",), lambda ctx, a: cmd_overlay(a)),
+    (("less", "more"), lambda ctx, a: cmd_less(ctx.cwd, a)),
+    (("ip",), lambda ctx, a: cmd_ip(a, ctx.cwd)), (("systemctl",), lambda ctx, a: cmd_systemctl(a, ctx.cwd)),
+    (("mount",), lambda ctx, a: cmd_mount(a, ctx.cwd)), (("warmpy",), lambda ctx, a: cmd_warmpy(a)),
+    (("wheelhouse",), lambda ctx, a: cmd_wheelhouse(a))]:
+    builtin(*_names)(_fn)
+builtin("tar", accept=lambda a: tar_opts(a) is not None)(lambda ctx, a: cmd_tar(ctx.cwd, tar_opts(a)))
+for _n in COMPRESS_COMMANDS:
+    builtin(_n, accept=lambda a, n=_n: compress_opts(n, a) is not None)(lambda ctx, a, n=_n: cmd_compress(ctx.cwd, compress_opts(n, a)))
+
+@builtin("exit")
+def _b_exit(ctx: CmdCtx, args: list):
+    code=int(args[0]) if args and args[0].lstrip("-").isdigit() else 0
+    running=[j for j in _jobs().values() if not j.done]
+    if shell_opts()["interactive"]:
+        if running: print(f"Stopping {len(running)} running job(s).")
+        print("Bye!")
+    for j in running: j.kill()
+    sys.exit(code)
+
+@builtin("pwd")
+def _b_pwd(ctx: CmdCtx, args: list):
+    rel=ctx.cwd.relative_to(SYSTEM_ROOT); print("/" if not rel.parts else "/" + "/".join(rel.parts))
+
+@builtin("cd")
+def _b_cd(ctx: CmdCtx, args: list):
+    dest=resolve_path(ctx.cwd,args[0]) if args else (SYSTEM_ROOT/"home"/USER)
+    if path_inside_root(dest) and dest.is_dir(): ctx.cwd=copy_up(dest)
+    else: _err(f"cd: {args[0] if args else ''}: No such directory")
+
+@builtin("mkdir")
+def _b_mkdir(ctx: CmdCtx, args: list):
+    invalidate_path_cache()
+    for a in args:
+        if a.startswith("-"): continue
+        p=copy_up(resolve_path(ctx.cwd,a), data=False)
+        if not p.is_dir(): p.mkdir(parents=True, exist_ok=True); fs_changed(p,"create")
+
+@builtin("touch")
+def _b_touch(ctx: CmdCtx, args: list):
+    invalidate_path_cache()
+    for a in args:
+        p=copy_up(resolve_path(ctx.cwd,a)); new=not p.exists()
+        p.parent.mkdir(parents=True, exist_ok=True); p.touch(exist_ok=True); fs_changed(p,"create" if new else "attrib")
+
+@builtin("tree")
+def _b_tree(ctx: CmdCtx, args: list):
+    for root,dirs,files in ov_walk(ctx.cwd):
+        rel=Path(root).relative_to(ctx.cwd); indent="  "*len(rel.parts)
+        print(f"{indent}{Path(root).name}/")
+        for f in files: print(f"{indent}  {f}")
+
+@builtin("time")
+def _b_time(ctx: CmdCtx, args: list):
+    if not args: _err("Usage: time <command> [args...]"); return
+    ctx.cwd, ctx.cache, rec = _perf_run(shlex.join(args), ctx.cwd, ctx.cache)
+    print(); print_perf_breakdown(rec)
+
+@builtin("profile")
+def _b_profile(ctx: CmdCtx, args: list): ctx.cwd, ctx.cache = cmd_profile(ctx.cwd, args, ctx.cache)
+
+@builtin("snapshot")
+def _b_snapshot(ctx: CmdCtx, args: list):
+    cmd_snapshot(args)
+    if not ctx.cwd.is_dir(): ctx.cwd = SYSTEM_ROOT
+
+@builtin("diag")
+def _b_diag(ctx: CmdCtx, args: list):
+    if args and args[0]=="perf": cmd_diag_perf(args[1:])
+    elif args and args[0]=="path":
+        print("Windows PATH:"); print(os.environ.get("PATH",""))
+        bash = find_bash()
+        if bash:
+            msys_shim = _path_to_msys(SYSTEM_ROOT/"usr"/"bin")
+            out = subprocess.check_output([bash,"-lc",f"export PATH={_bash_quote(msys_shim)}:\"$PATH\"; printf '%s' \"$PATH\""], text=True)
+            print("\nBash PATH:"); print(out)
+    else:
+        print("diag path  — toon Windows & Bash PATH")
+        print("diag perf  — latency-histogrammen per commando (reset | trace on|off)")
+
+@builtin("sudo")
+def _b_sudo(ctx: CmdCtx, args: list):
+    if not args: _err("sudo: usage: sudo <command> [args...]"); return
+    print("[sudo simulated] running:", " ".join(args))
+    ctx.cwd, ctx.cache = run_command(" ".join(args), ctx.cwd, ctx.cache)
+
+@builtin("apt", "apt-get")
+def _b_apt(ctx: CmdCtx, args: list):
+    if not args: _err("Usage: apt install <pkg> | apt remove <pkg>"); return
+    sub=args[0]; rest=args[1:]
+    if sub in ("install","i"):
+        if not rest: _err("apt: missing package name"); return
+        apt_install(ctx.cwd,rest[0])
+    elif sub in ("remove","purge","r"):
+        if not rest: _err("apt: missing package name"); return
+        dpkg_remove(rest[0])
+    else: _err("Supported: apt install <pkg>, apt remove <pkg> (simulation)")
+
+@builtin("dpkg")
+def _b_dpkg(ctx: CmdCtx, args: list):
+    if not args: _err("Usage: dpkg -i FILE.deb | dpkg -r <pkg>"); return
+    if args[0]=="-i":
+        if len(args)<2: _err("dpkg: missing .deb filename"); return
+        deb=resolve_path(ctx.cwd,args[1])
+        if not deb.exists(): _err(f"dpkg: {args[1]}: No such file"); return
+        try: dpkg_install_deb(ctx.cwd,deb)
+        except Exception as e: _err(f"dpkg: error installing: {e}")
+    elif args[0]=="-r":
+        if len(args)<2: _err("dpkg: missing package name"); return
+        dpkg_remove(args[1])
+    else: _err("Supported: dpkg -i FILE.deb, dpkg -r <pkg>  (simulation)")
+
+@builtin("plugins")
+def _b_plugins(ctx: CmdCtx, args: list):
+    idx = _plugin_index()
+    if not idx: print(f"(geen plugins in {PLUGIN_DIR})"); return
+    # een kopnaam die al een commando van de shell (of van een andere plugin) is, draait nooit uit dit bestand
+    rows = [(n, p.name, "shadowed" if n in COMMANDS and _PLUGINS["owner"].get(n) != p
+             else "loaded" if str(p) in _PLUGINS["loaded"] else "lazy") for n, p in sorted(idx.items())]
+    for line in _pad_cols([("COMMAND", "FILE", "STATE")] + rows): print(line)
+
+# ---------- xargs / parallel (fan-out over de dispatcher) ----------
+# Elke opdracht is een commandoregel die in een worker-thread via run_command draait: builtins in die
+# thread, externe programma's als child van die thread, dus nooit meer dan -P/-j tegelijk. Gegroepeerd
+# (standaard bij parallel, bij xargs vanaf -P 2) gaat de uitvoer per opdracht in één stuk naar buiten;
+# -k houdt de invoervolgorde aan. --joblog schrijft het tab-gescheiden log van GNU parallel.
+XARGS_MAX_CHARS = 128 << 10
+FANOUT_MAX = 64
+_PAR_REPL = re.compile(r"\{(\d*)(\.|/|//|/\.)?\}|\{#\}|\{%\}")
+
+def _fan_jobs(spec: str) -> int|None:
+    """-j/-P: N, 0 (zoveel als zinvol) of N% van de cores."""
+    cpus = os.cpu_count() or 1
+    try:
+        n = int(cpus * float(spec[:-1]) / 100) if spec.endswith("%") else int(spec)
+    except ValueError: return None
+    return FANOUT_MAX if n == 0 else max(1, min(n, FANOUT_MAX)) if n > 0 else None
+
+def _fan_job(line: str, cwd: Path, cache, out, err, ctx) -> tuple:
+    _perf_tls.stack = list(ctx[0]); _job_tls.job = ctx[1]; _sess_tls.session = ctx[2]
+    t0 = time.time()
+    try:
+        with io_redirect(stdout=out, stderr=err, stdin=iter(())): run_command(line, cwd, dict(cache) if cache else cache)
+        rc = last_status()
+    except BrokenPipeError: rc = 141
+    except SystemExit as e: rc = e.code if isinstance(e.code, int) else 0
+    except Exception as e: err.write(f"{line}: {e}\n"); rc = 1
+    return rc, t0, time.time() - t0
+
+def fanout(prog: str, jobs, cwd: Path, cache, P: int, grouped: bool, keep: bool, joblog: str|None = None,
+           trace: bool = False, halt: int = 0) -> list:
+    """Draai (regel, tag)-opdrachten met P tegelijk; geeft de exit-codes in invoervolgorde."""
+    out, err = _cur_out("stdout"), _cur_out("stderr")
+    ctx = (_perf_stack(), getattr(_job_tls, "job", None), getattr(_sess_tls, "session", None))
+    log = None
+    if joblog:
+        lp = copy_up(resolve_path(cwd, joblog)); lp.parent.mkdir(parents=True, exist_ok=True)
+        log = open(lp, "w", encoding="utf-8")
+        log.write("Seq\tHost\tStarttime\tJobRuntime\tSend\tReceive\tExitval\tSignal\tCommand\n")
+    rcs = {}; pending = {}; inflight = {}; slots = list(range(P, 0, -1)); nxt = 1; fails = 0; stop = False
+    it = iter(jobs); seq = 0
+    def emit(res):
+        o, e, tag = res
+        for text, target in ((o, out), (e, err)):
+            if not text: continue
+            if tag is not None: text = "".join(f"{tag}\t{l}" for l in text.splitlines(True))
+            target.write(text)
+        out.flush()
+    try:
+        with ThreadPoolExecutor(max_workers=P, thread_name_prefix=prog) as ex:
+            while True:
+                job = ctx[1]
+                while len(inflight) < P and not stop and not (job is not None and job.killed):
+                    item = next(it, None)
+                    if item is None: stop = True; break
+                    seq += 1; slot = slots.pop(); line, tag = item(seq, slot) if callable(item) else item
+                    if trace: err.write(line + "\n")
+                    bo, be = (StringIO(), StringIO()) if grouped else (out, err)
+                    inflight[ex.submit(_fan_job, line, cwd, cache, bo, be, ctx)] = (seq, slot, line, tag, bo, be)
+                if not inflight: break
+                done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for f in sorted(done, key=lambda f: inflight[f][0]):
+                    sq, slot, line, tag, bo, be = inflight.pop(f); slots.append(slot)
+                    rc, t0, dt = f.result(); rcs[sq] = rc
+                    res = (bo.getvalue(), be.getvalue(), tag) if grouped else ("", "", None)
+                    if log is not None:
+                        recv = len(res[0].encode("utf-8", "surrogateescape")) + len(res[1].encode("utf-8", "surrogateescape"))
+                        sig = rc - 128 if rc > 128 else 0
+                        log.write(f"{sq}\t:\t{t0:.3f}\t{dt:.3f}\t0\t{recv}\t{rc}\t{sig}\t{line}\n"); log.flush()
+                    if rc:
+                        fails += 1
+                        if halt and fails >= halt and not stop:
+                            stop = True; err.write(f"{prog}: Starting no more jobs. Waiting for {len(inflight)} jobs to finish.\n")
+                    if not grouped: continue
+                    if not keep: emit(res); continue
+                    pending[sq] = res
+                    while nxt in pending: emit(pending.pop(nxt)); nxt += 1
+    except KeyboardInterrupt:
+        set_status(130); return [rcs[k] for k in sorted(rcs)] + [130]
+    finally:
+        if log is not None: log.close(); fs_changed(lp)
+    for k in sorted(pending): emit(pending[k])
+    return [rcs[k] for k in sorted(rcs)]
+
+def _xargs_opts(args: list) -> dict|None:
+    o = {"P": 1, "n": None, "L": None, "I": None, "d": None, "a": None, "r": False, "t": False, "k": False, "joblog": None, "cmd": []}
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if not a.startswith("-") or a == "-": o["cmd"] = args[i:]; break
+        if a == "--": o["cmd"] = args[i + 1:]; break
+        name, eq, v = a.partition("=") if a.startswith("--") else (a[:2], "", a[2:])
+        flag = {"-0": "0", "--null": "0", "-r": "r", "--no-run-if-empty": "r", "-t": "t", "--verbose": "t", "-k": "k", "--keep-order": "k"}.get(name)
+        if flag is not None and not v:
+            if flag == "0": o["d"] = "\0"
+            else: o[flag] = True
+            i += 1; continue
+        key = {"-P": "P", "--max-procs": "P", "-n": "n", "--max-args": "n", "-L": "L", "--max-lines": "L", "-I": "I",
+               "--replace": "I", "-d": "d", "--delimiter": "d", "-a": "a", "--arg-file": "a", "--joblog": "joblog"}.get(name)
+        if key is None: return None
+        if not v and not eq:
+            i += 1
+            if i >= len(args): return None
+            v = args[i]
+        if key == "P": v = _fan_jobs(v)
+        elif key in ("n", "L"): v = int(v) if v.isdigit() and int(v) > 0 else None
+        elif key == "d": v = codecs.decode(v, "unicode_escape") if "\\" in v else v
+        if v is None or (key == "d" and len(v) != 1): return None
+        o[key] = v; i += 1
+    o["cmd"] = o["cmd"] or ["echo"]
+    return o
+
+def _split_input(src, delim: str|None):
+    """Invoer-items: per delimiter (-0/-d) of per regel zonder newline."""
+    if delim is None:
+        for line in src: yield line[:-1] if line.endswith("\n") else line
+        return
+    buf = ""
+    for chunk in src:
+        buf += chunk; *parts, buf = buf.split(delim)
+        yield from parts
+    if buf: yield buf
+
+def _xargs_batches(o: dict, src):
+    """Argumentlijsten per opdracht, zoals xargs ze bouwt."""
+    if o["I"] is not None:
+        for item in _split_input(src, o["d"]):
+            item = item if o["d"] else item.lstrip(" \t")
+            if item: yield [item]
+        return
+    if o["L"]:
+        batch = []; n = 0
+        for line in _split_input(src, None):
+            toks = shlex.split(line)
+            if not toks: continue
+            # een regel die op een spatie/tab eindigt loopt door op de volgende (GNU): telt niet als eigen regel
+            batch += toks
+            if line.rstrip("\r").endswith((" ", "\t")): continue
+            n += 1
+            if n >= o["L"]: yield batch; batch = []; n = 0
+        if batch: yield batch
+        return
+    items = _split_input(src, o["d"]) if o["d"] else (t for line in src for t in shlex.split(line))
+    batch = []; size = 0
+    for t in items:
+        if batch and ((o["n"] and len(batch) >= o["n"]) or size + len(t) + 1 > XARGS_MAX_CHARS): yield batch; batch = []; size = 0
+        batch.append(t); size += len(t) + 1
+    if batch: yield batch
+
+def cmd_xargs(ctx: CmdCtx, args: list):
+    o = _xargs_opts(args)
+    src = None
+    if o["a"]:
+        p = resolve_path(ctx.cwd, o["a"])
+        if not p.is_file(): _err(f"xargs: {o['a']}: No such file or directory"); return
+        src = open(p, encoding="utf-8", errors="surrogateescape", newline="")
+    def jobs():
+        ran = False
+        try:
+            for batch in _xargs_batches(o, src if src is not None else (_io_stdin() if _io_stdin() is not None else sys.stdin)):
+                ran = True
+                argv = [t.replace(o["I"], batch[0]) for t in o["cmd"]] if o["I"] is not None else o["cmd"] + batch
+                yield shlex.join(argv), None
+        except ValueError as e: _err(f"xargs: {e}; by default quotes are special to xargs unless you use the -0 option")
+        if not ran and not o["r"] and o["I"] is None: yield shlex.join(o["cmd"]), None
+    try:
+        rcs = fanout("xargs", jobs(), ctx.cwd, ctx.cache, o["P"], grouped=o["P"] > 1 or o["k"], keep=o["k"], joblog=o["joblog"], trace=o["t"])
+    finally:
+        if src is not None: src.close()
+    if last_status() and not rcs: return
+    bad = [rc for rc in rcs if rc]
+    set_status(0 if not bad else 124 if 255 in bad else 125 if any(rc > 128 for rc in bad) else 127 if 127 in bad
+               else 126 if 126 in bad else 123)
+
+def _par_opts(args: list) -> dict|None:
+    o = {"j": os.cpu_count() or 1, "k": False, "u": False, "tag": False, "joblog": None, "dry": False, "d": None,
+         "a": [], "halt": 0, "cmd": [], "sources": []}
+    i = 0
+    while i < len(args):
+        a = args[i]
+        if a in (":::", "::::"): break
+        if not a.startswith("-") or a == "-": break
+        name, eq, v = a.partition("=") if a.startswith("--") else (a[:2], "", a[2:])
+        flag = {"-k": "k", "--keep-order": "k", "-u": "u", "--ungroup": "u", "--tag": "tag", "--dry-run": "dry", "-0": "0", "--null": "0"}.get(name)
+        if flag is not None and not v:
+            if flag == "0": o["d"] = "\0"
+            else: o[flag] = True
+            i += 1; continue
+        key = {"-j": "j", "--jobs": "j", "-P": "j", "--joblog": "joblog", "-a": "a", "--arg-file": "a", "--halt": "halt"}.get(name)
+        if key is None: return None
+        if not v and not eq:
+            i += 1
+            if i >= len(args): return None
+            v = args[i]
+        if key == "j": v = _fan_jobs(v)
+        elif key == "halt":
+            m = re.fullmatch(r"(?:soon,)?fail=(\d+)|(\d+)", v)
+            v = int(m.group(1) or m.group(2) or 0) if m else None
+        if v is None: return None
+        if key == "a": o["a"].append(v)
+        else: o[key] = v
+        i += 1
+    while i < len(args) and args[i] not in (":::", "::::"): o["cmd"].append(args[i]); i += 1
+    while i < len(args):
+        kind = args[i]; i += 1; vals = []
+        while i < len(args) and args[i] not in (":::", "::::"): vals.append(args[i]); i += 1
+        o["sources"].append((kind, vals))
+    return o
+
+def _par_value(v: str, mod: str|None) -> str:
+    if mod == ".": return v[:len(v) - len(Path(v).suffix)] if Path(v).suffix else v
+    if mod == "/": return v.rstrip("/").rsplit("/", 1)[-1]
+    if mod == "//": return v.rsplit("/", 1)[0] if "/" in v else "."
+    if mod == "/.": b = v.rstrip("/").rsplit("/", 1)[-1]; return b[:len(b) - len(Path(b).suffix)] if Path(b).suffix else b
+    return v
+
+def _par_line(cmd: list, vals: tuple, seq: int, slot: int) -> str:
+    used = False
+    def sub(m):
+        nonlocal used
+        tok = m.group(0)
+        if tok == "{#}": return str(seq)
+        if tok == "{%}": return str(slot)
+        used = True; idx, mod = m.group(1), m.group(2)
+        if idx: return shlex.quote(_par_value(vals[int(idx) - 1], mod)) if 0 < int(idx) <= len(vals) else ""
+        return " ".join(shlex.quote(_par_value(v, mod)) for v in vals)
+    line = " ".join(_PAR_REPL.sub(sub, t) for t in cmd)
+    return line if used else line + " " + " ".join(shlex.quote(v) for v in vals)
+
+def cmd_parallel(ctx: CmdCtx, args: list):
+    o = _par_opts(args)
+    if not o["cmd"]: _err("parallel: no command given (parallel CMD ::: ARGS, or input lines on stdin)", 255); return
+    lists = []; opened = []
+    try:
+        for kind, vals in o["sources"] + [("::::", [f]) for f in o["a"]]:
+            if kind == ":::": lists.append(vals); continue
+            for f in vals:
+                p = resolve_path(ctx.cwd, f)
+                if not p.is_file(): _err(f"parallel: Cannot open input file '{f}': No such file or directory", 255); return
+                fh = open(p, encoding="utf-8", errors="surrogateescape", newline=""); opened.append(fh)
+                lists.append(_split_input(fh, o["d"]))
+        if not lists: lists.append(_split_input(_io_stdin() if _io_stdin() is not None else sys.stdin, o["d"]))
+        combos = (lambda: ((v,) for v in lists[0])) if len(lists) == 1 else (lambda: product(*[list(l) for l in lists]))
+        def jobs():
+            for vals in combos():
+                yield lambda seq, slot, vals=vals: (_par_line(o["cmd"], vals, seq, slot), " ".join(vals) if o["tag"] else None)
+        if o["dry"]:
+            for seq, mk in enumerate(jobs(), 1): print(mk(seq, 1)[0])
+            return
+        rcs = fanout("parallel", jobs(), ctx.cwd, ctx.cache, o["j"], grouped=not o["u"] or o["k"], keep=o["k"],
+                     joblog=o["joblog"], halt=o["halt"])
+    finally:
+        for fh in opened: fh.close()
+    if last_status() == 130: return
+    set_status(min(sum(1 for rc in rcs if rc), 101))
+
+builtin("xargs", accept=lambda a: _xargs_opts(a) is not None)(cmd_xargs)
+builtin("parallel", accept=lambda a: _par_opts(a) is not None)(cmd_parallel)
+
+@builtin("fsevents")
+def _b_fsevents(ctx: CmdCtx, args: list):
+    usage = "Usage: fsevents [-n N] [--since CURSOR] [--cursor] [--poll] [--watch PATH...]"
+    n = 20; since = None; i = 0
+    while i < len(args):
+        a = args[i]
+        if a == "--cursor": print(fs_journal_since()[1]); return
+        if a == "--poll": print(f"{fs_poll()} change(s)"); return
+        if a == "--watch":
+            for t in args[i + 1:] or ["."]: fs_watch(resolve_path(ctx.cwd, t))
+            return
+        if a in ("-n", "--since") and i + 1 < len(args):
+            if a == "--since": since = args[i + 1]
+            elif args[i + 1].isdigit(): n = int(args[i + 1])
+            else: _err(usage, 2); return
+            i += 2; continue
+        _err(usage, 2); return
+    evs, cur = fs_journal_since(since)
+    if evs is None: _err(f"fsevents: cursor {since} expired (journal compacted); rescan needed, new cursor {cur}"); return
+    for ts, kind, path in (evs if since is not None else evs[-n:]):
+        print(f"{datetime.fromtimestamp(ts).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}  {kind:<7} {path}")
+    if since is not None: print(f"cursor {cur}", file=sys.stderr)
+
+def run_command(line:str, cwd:Path, git_env_cache:dict|None=None)->tuple[Path,dict|None]:
+    if not line.strip(): return cwd, git_env_cache
+    # genest (sudo …) of timings uit: geen eigen perf-record
+    if _perf_stack() or not SHOW_TIMINGS: return _execute(line, cwd, git_env_cache)
+    cwd, git_env_cache, _ = _perf_run(line, cwd, git_env_cache)
+    return cwd, git_env_cache
+
+def _dispatch(line:str, cwd:Path, git_env_cache:dict|None=None, argv:list|None=None)->tuple[Path,dict|None]:
+    set_status(0)
+    tokens=argv if argv is not None else shlex.split(line)
+    cmd,*args=tokens
+
+    # Aliassen/typos
+    cmd = ALIASES.get(cmd, cmd)
+
+    # builtins: registry (O(1)); plugin-commando's worden bij het eerste gebruik geladen
+    ent = lookup_builtin(cmd)
+    if ent is not None and (ent[1] is None or ent[1](args)):
+        ctx = CmdCtx(line, cwd, git_env_cache); ent[0](ctx, args); return ctx.cwd, ctx.cache
+
+    # --- path execution / scripts ---
+    if "/" in cmd or "\\" in cmd or cmd.startswith("."):
+        target=resolve_path(cwd,cmd)
+        if target.exists() and target.is_file():
+            host=str(target)
+            # .sh → Git Bash
+            _perf_mark("script")
+            # .lfsh → in-process via de batch-runner (eigen cwd, zoals een subshell)
+            if host.lower().endswith(".lfsh"):
+                run_script_file(target, cwd); return cwd, git_env_cache
+            if host.lower().endswith(".sh"):
+                ensure_pip_deps()
+                if AUTO_DOWNLOAD_TOOLS and not find_portable_git_bash_in(GIT_HOME):
+                    ensure_portable_git_via_drive_pretty()
+                bash=find_bash()
+                if not bash:
+                    _err("bash: not found. Installeer PortableGit ZIP via Google Drive.")
+                    return cwd, git_env_cache
+                msys_script=_path_to_msys(Path(host))
+                shim_dir=SYSTEM_ROOT/"usr"/"bin"; shim_dir.mkdir(parents=True, exist_ok=True)
+                msys_shim=_path_to_msys(shim_dir)
+                ensure_bash_runtime()
+                bash_cmd=f"export PATH={_bash_quote(msys_shim)}:\"$PATH\"; exec \"{msys_script}\""
+                _spawn([bash,"-lc",bash_cmd], cwd=str(cwd), env=_bash_env())
+                return cwd, git_env_cache
+            # .py
+            if host.lower().endswith(".py"):
+                ensure_pip_deps()
+                if warm_python([host]+args, cwd) is not None: return cwd, git_env_cache
+                pyexe=sys.executable or shutil.which("python") or shutil.which("python3")
+                if pyexe: _spawn([pyexe,host]+args, cwd=str(cwd))
+                else: _err("python: not found.")
+                return cwd, git_env_cache
+            # .bat/.cmd
+            if host.lower().endswith((".bat",".cmd")):
+                _spawn([host], cwd=str(cwd)); return cwd, git_env_cache
+            # generic
+            _spawn([host], cwd=str(cwd)); return cwd, git_env_cache
+        else:
+            print(f"{cmd}: No such file"); return cwd, git_env_cache
+
+    # git (echt)
+    if cmd=="git":
+        _perf_mark("git")
+        if not find_git_exe() and AUTO_DOWNLOAD_TOOLS:
+            ensure_portable_git_via_drive_pretty()
+        git_exe=find_git_exe()
+        if not git_exe:
+            _err("git: not found. Drive-ZIP installatie mislukt of niet publiek.")
+            return cwd, git_env_cache
+        if git_env_cache is None:
+            git_env_cache=ensure_git_config_and_ssh(SYSTEM_ROOT/"home"/USER)
+        env=_base_env(); env.update(git_env_cache or {})
+        _spawn([git_exe]+args, cwd=str(cwd), env=env)
+        return cwd, git_env_cache
+
+    # === Bash passthrough voor ALLES ===
+    if find_bash():
+        _perf_mark("passthrough")
+        run_in_bash(line, cwd)
+        return cwd, git_env_cache
+
+    # fallback host tools
+    real_cmd=shutil.which(ALIASES.get(cmd,cmd))
+    if real_cmd:
+        _perf_mark("external")
+        ensure_pip_deps()
+        _spawn([real_cmd]+args, cwd=str(cwd))
+    else:
+        _err(f"{cmd}: command not found", 127)
+    return cwd, git_env_cache
+
+# ---------- glob & brace-expansie ----------
+# Ongequote * ? [..] en {a,b} / {1..5} worden vóór dispatch uitgebreid tegen de virtuele root
+# (zelfde semantiek als resolve_path: /, ~, relatief t.o.v. cwd). De lexer geeft per woord een
+# patroon waarin gequote tekens met \ zijn ge-escaped. Eén scandir per map per commando.
+_GLOB_SPECIAL = "*?[]{},\\"
+_GLOB_RX = {}
+
+class _ScanCache(dict):
+    """Kortlevende map → [(naam, is_dir, is_link)]-cache voor de expansie van één commando."""
+    def list(self, host: str) -> list:
+        hit = self.get(host)
+        if hit is None:
+            try:
+                if OVERLAY_BASE is not None:
+                    hit = [(n, os.path.isdir(p), os.path.islink(p)) for n, p in ov_scandir(Path(host))]
+                else:
+                    with os.scandir(host) as it: hit = [(e.name, e.is_dir(), e.is_symlink()) for e in it]
+            except OSError: hit = []
+            self[host] = hit
+        return hit
+
+def _unescape(pat: str) -> str: return re.sub(r"\\(.)", r"\1", pat, flags=re.S)
+
+def _has_magic(pat: str) -> bool:
+    i = 0
+    while i < len(pat):
+        ch = pat[i]
+        if ch == "\\": i += 2; continue
+        if ch in "*?[": return True
+        i += 1
+    return False
+
+def _brace_expand(pat: str) -> list:
+    """{a,b,c} en {1..10}/{a..e} (ook genest); {} en {x} blijven letterlijk, zoals in bash."""
+    i = 0
+    while i < len(pat):
+        if pat[i] == "\\": i += 2; continue
+        if pat[i] == "{":
+            depth = 0; j = i; commas = []
+            while j < len(pat):
+                ch = pat[j]
+                if ch == "\\": j += 2; continue
+                if ch == "{": depth += 1
+                elif ch == "}":
+                    depth -= 1
+                    if not depth: break
+                elif ch == "," and depth == 1: commas.append(j)
+                j += 1
+            if j < len(pat):
+                pre, body, post = pat[:i], pat[i+1:j], pat[j+1:]
+                if commas:
+                    cuts = [i] + commas + [j]
+                    parts = [pat[a+1:b] for a, b in zip(cuts, cuts[1:])]
+                else:
+                    parts = None
+                    m = re.fullmatch(r"(-?\d+)\.\.(-?\d+)", body)
+                    if m:
+                        a, b = int(m[1]), int(m[2]); step = 1 if b >= a else -1
+                        parts = [str(x) for x in range(a, b + step, step)]
+                    elif re.fullmatch(r"[A-Za-z]\.\.[A-Za-z]", body):
+                        a, b = ord(body[0]), ord(body[-1]); step = 1 if b >= a else -1
+                        parts = [chr(x) for x in range(a, b + step, step)]
+                if parts is not None:
+                    return [r for p in parts for r in _brace_expand(pre + p + post)]
+        i += 1
+    return [pat]
+
+def _glob_rx(comp: str):
+    rx = _GLOB_RX.get(comp)
+    if rx is not None: return rx
+    out = []; i = 0; n = len(comp)
+    while i < n:
+        ch = comp[i]
+        if ch == "\\" and i+1 < n: out.append(re.escape(comp[i+1])); i += 2; continue
+        if ch == "*": out.append(".*")
+        elif ch == "?": out.append(".")
+        elif ch == "[":
+            j = i + 1
+            if j < n and comp[j] in "!^": j += 1
+            if j < n and comp[j] == "]": j += 1
+            while j < n and comp[j] != "]": j += 1
+            if j >= n: out.append("\\[")
+            else:
+                body = _unescape(comp[i+1:j]); neg = body[:1] in ("!", "^")
+                body = "".join("\\" + c if c in "\\^[]" else c for c in (body[1:] if neg else body))
+                out.append("[" + ("^" if neg else "") + body + "]"); i = j + 1; continue
+        else: out.append(re.escape(ch))
+        i += 1
+    rx = _GLOB_RX[comp] = re.compile("".join(out), re.S | (re.I if os.name == "nt" else 0))
+    return rx
+
+def _glob_walk(host: str, virt: str, comps: list, cache: _ScanCache):
+    if not comps: yield virt; return
+    comp, rest = comps[0], comps[1:]
+    join = lambda name: virt + name if not virt or virt.endswith("/") else virt + "/" + name
+    if comp == "":
+        # trailing slash: alleen mappen
+        if not rest and os.path.isdir(ov_effective(Path(host))): yield join("")
+        elif rest: yield from _glob_walk(host, virt, rest, cache)
+    elif comp == "**":
+        # nul of meer mappen diep (geen verborgen entries, geen symlinks volgen); als laatste deel: alles
+        if rest: yield from _glob_walk(host, virt, rest, cache)
+        for name, is_dir, is_link in cache.list(host):
+            if name.startswith("."): continue
+            if not rest: yield join(name)
+            if is_dir and not is_link: yield from _glob_walk(os.path.join(host, name), join(name), comps, cache)
+    elif not _has_magic(comp):
+        name = _unescape(comp); sub = os.path.join(host, name)
+        if rest: yield from _glob_walk(sub, join(name), rest, cache)
+        elif os.path.lexists(ov_effective(Path(sub))): yield join(name)
+    else:
+        rx = _glob_rx(comp); hidden = comp.startswith(".")
+        for name, is_dir, _ in cache.list(host):
+            if name.startswith(".") and not hidden: continue
+            if rx.fullmatch(name):
+                if not rest: yield join(name)
+                elif is_dir: yield from _glob_walk(os.path.join(host, name), join(name), rest, cache)
+
+def glob_virtual(pat: str, cwd: Path, cache: _ScanCache|None = None) -> list:
+    """Matches van een (ge-escaped) patroon als woorden in dezelfde vorm als geschreven: /abs, ~/…, relatief."""
+    cache = _ScanCache() if cache is None else cache
+    if pat.startswith("/"): host, virt, pat = str(SYSTEM_ROOT), "/", pat.lstrip("/")
+    elif pat == "~" or pat.startswith("~/"): host, virt, pat = str(SYSTEM_ROOT/"home"/USER), "~/", pat[2:]
+    else: host, virt = str(cwd), ""
+    hits = dict.fromkeys(_glob_walk(host, virt, pat.split("/"), cache))
+    return sorted(hits)
+
+def expand_words(words: list, pats: list, cwd: Path) -> list:
+    """Brace- en glob-expansie van argv; een patroon zonder matches blijft letterlijk staan (bash-default)."""
+    if not any(pats): return list(words)
+    cache = _ScanCache(); out = []
+    for w, pat in zip(words, pats):
+        if pat is None: out.append(w); continue
+        for alt in _brace_expand(pat):
+            hits = glob_virtual(alt, cwd, cache) if _has_magic(alt) else None
+            if hits: out.extend(hits)
+            else: out.append(_unescape(alt))
+    return out
+
+# ---------- pipelines & redirectie ----------
+# Eigen lexer/planner voor | > >> < 2> 2>&1 &> && || ; — builtins zijn generator-stages die
+# str-regels doorgeven (utf-8 + surrogateescape), externe programma's krijgen echte OS-pipes.
+# Bash alleen voor een stage die we zelf niet kunnen starten (of een regel vol bash-syntax).
+_io_tls = threading.local()
+
+def _io_stack(name: str) -> list:
+    st = getattr(_io_tls, name, None)
+    if st is None: st = []; setattr(_io_tls, name, st)
+    return st
+
+def _io_top(name: str):
+    st = getattr(_io_tls, name, None)
+    return st[-1] if st else None
+
+def _cur_out(name: str):
+    """Huidig doel van stdout/stderr voor deze thread (zonder proxy ertussen)."""
+    t = _io_top(name)
+    if t is not None: return t
+    s = getattr(sys, name)
+    return getattr(s, "_base", s)
+
+def _io_stdin():
+    """Regel-iterator van de omgeleide stdin van deze thread (pipe of < bestand), anders None."""
+    return _io_top("stdin")
+
+class _ThreadOut:
+    """sys.stdout/sys.stderr-proxy: schrijft naar het doel van de huidige thread, anders naar de console."""
+    def __init__(self, base, name):
+        self._base, self._name = base, name
+        try: self._tty = base.isatty()
+        except Exception: self._tty = False
+    def _target(self):
+        t = _io_top(self._name)
+        return self._base if t is None else t
+    def write(self, s): return self._target().write(s)
+    def flush(self):
+        try: self._target().flush()
+        except (OSError, ValueError): pass
+    def isatty(self):
+        t = _io_top(self._name)
+        return self._tty if t is None else t.isatty()
+    def __getattr__(self, name): return getattr(self._target(), name)
+
+def _install_io_router():
+    if sys.stdout is not None and not isinstance(sys.stdout, _ThreadOut): sys.stdout = _ThreadOut(sys.stdout, "stdout")
+    if sys.stderr is not None and not isinstance(sys.stderr, _ThreadOut): sys.stderr = _ThreadOut(sys.stderr, "stderr")
+
+@contextmanager
+def io_redirect(stdout=None, stderr=None, stdin=None):
+    """Leid stdout/stderr (tekst-doelen) en stdin (regel-iterator) om voor de huidige thread."""
+    _install_io_router()
+    pushed = [n for n, t in (("stdout", stdout), ("stderr", stderr), ("stdin", stdin)) if t is not None]
+    for n, t in (("stdout", stdout), ("stderr", stderr), ("stdin", stdin)):
+        if t is not None: _io_stack(n).append(t)
+    try:
+        yield
+    finally:
+        for n in pushed: _io_stack(n).pop()
+
+class _LinePipe:
+    """Begrensde regelbuffer tussen een builtin in een worker-thread (write) en de volgende stage (iter).
+    Regels gaan in batches over; direct zodra de lezer staat te wachten (lege wachtrij)."""
+    _EOF = object()
+    encoding, errors = "utf-8", "surrogateescape"
+    def __init__(self, maxbatches: int = 64, batch: int = 256):
+        self.q = queue.Queue(maxbatches); self.buf = ""; self.pending = []; self.batch = batch; self.closed = False
+    def _put(self, item):
+        while True:
+            if self.closed: raise BrokenPipeError(32, "Broken pipe")
+            try: self.q.put(item, timeout=0.1); return
+            except queue.Full: continue
+    def write(self, s: str) -> int:
+        if self.closed: raise BrokenPipeError(32, "Broken pipe")
+        if "\n" not in s: self.buf += s; return len(s)
+        *lines, self.buf = (self.buf + s).split("\n")
+        self.pending.extend(line + "\n" for line in lines)
+        if len(self.pending) >= self.batch or self.q.empty(): self.flush()
+        return len(s)
+    def flush(self):
+        if self.pending: batch, self.pending = self.pending, []; self._put(batch)
+    def isatty(self): return False
+    def finish(self):
+        try:
+            if self.buf: self.pending.append(self.buf); self.buf = ""
+            self.flush(); self._put(self._EOF)
+        except BrokenPipeError: pass
+    def abort(self):
+        # lezer stopt: schrijver krijgt BrokenPipeError, wachtrij leeg zodat hij niet blijft hangen
+        self.closed = True
+        try:
+            while True: self.q.get_nowait()
+        except queue.Empty: pass
+    def __iter__(self):
+        while True:
+            item = self.q.get()
+            if item is self._EOF: return
+            yield from item
+
+def _fd_or_pipe(target):
+    try:
+        fd = target.fileno(); target.flush(); return fd
+    except (AttributeError, OSError, ValueError): return subprocess.PIPE
+
+def _pump(src, target):
+    """Child-uitvoer (bytes) naar een tekst-doel zonder fileno, zoals een pipe naar een builtin."""
+    dec = codecs.getincrementaldecoder("utf-8")("surrogateescape")
+    try:
+        while True:
+            chunk = src.read1(65536)
+            if not chunk: break
+            target.write(dec.decode(chunk))
+        target.write(dec.decode(b"", True))
+    except (OSError, ValueError): pass
+    finally:
+        try: src.close()
+        except OSError: pass
+
+def _feed(dst, lines):
+    """Regels naar de stdin van een child; stopt stil als het child de pipe sluit."""
+    try:
+        for line in lines: dst.write(line.encode("utf-8", "surrogateescape"))
+    except (OSError, ValueError): pass
+    finally:
+        try: dst.close()
+        except OSError: pass
+        if hasattr(lines, "close"): lines.close()
+
+def _child_stdio(kw: dict) -> list:
+    """Vul ontbrekende stdio van Popen-kwargs in vanuit de thread-omleiding; geeft [(pomp, join)]."""
+    pumps = []
+    out, err, inp = _io_top("stdout"), _io_top("stderr"), _io_top("stdin")
+    if "stdout" not in kw and out is not None:
+        kw["stdout"] = _fd_or_pipe(out)
+        if kw["stdout"] is subprocess.PIPE: pumps.append((lambda p: _pump(p.stdout, out), True))
+    if "stderr" not in kw and err is not None:
+        kw["stderr"] = subprocess.STDOUT if err is out and "stdout" in kw else _fd_or_pipe(err)
+        if kw["stderr"] is subprocess.PIPE: pumps.append((lambda p: _pump(p.stderr, err), True))
+    if "stdin" not in kw and inp is not None:
+        kw["stdin"] = subprocess.PIPE; pumps.append((lambda p: _feed(p.stdin, inp), False))
+    return pumps
+
+def _emit(gen, out=None):
+    """Schrijf een regel-generator naar out (default: stdout van deze thread); geeft de return-waarde."""
+    out = out if out is not None else sys.stdout
+    try:
+        while True:
+            line = next(gen)
+            try: out.write(line)
+            except UnicodeEncodeError: out.write(line.encode("utf-8", "surrogateescape").decode("utf-8", "replace"))
+    except StopIteration as e:
+        return e.value
+    except BrokenPipeError:
+        gen.close(); return 141
+
+# --- lexer / planner ---
+_OPS = ("2>&1", ">&2", "2>>", "&>", "2>", ">>", "&&", "||", ">", "<", "|", ";", "&")
+_REDIR_OPS = (">", ">>", "<", "2>", "2>>", "&>")
+
+def lex_line(line: str) -> tuple[list, bool]:
+    """Tokens ("w", woord, glob-patroon|None) / ("op", operator) + of de regel bash-syntax bevat ($, `…`, ( ), <<).
+    In het patroon zijn gequote glob/brace-tekens ge-escaped, zodat alleen ongequote tekens uitbreiden."""
+    toks = []; cur = []; pat = []; magic = False; word = False; q = None; shell = False; i = 0; n = len(line)
+    def lit(ch):
+        cur.append(ch); pat.append("\\" + ch if ch in _GLOB_SPECIAL else ch)
+    def end():
+        nonlocal cur, pat, magic, word
+        if word: toks.append(("w", "".join(cur), "".join(pat) if magic else None))
+        cur = []; pat = []; magic = word = False
+    while i < n:
+        ch = line[i]
+        if q == "'":
+            if ch == "'": q = None
+            else: lit(ch)
+        elif q == '"':
+            if ch == '"': q = None
+            elif ch == "\\" and i+1 < n and line[i+1] in '"\\$`': lit(line[i+1]); i += 1
+            else:
+                if ch in "$`": shell = True
+                lit(ch)
+        elif ch in "'\"": q = ch; word = True
+        elif ch == "\\" and i+1 < n: lit(line[i+1]); word = True; i += 1
+        elif ch in " \t\r\n": end()
+        elif ch == "#" and not word: break
+        else:
+            if ch in "$`()" or line.startswith("<<", i): shell = True
+            op = None if (ch == "2" and word) or line.startswith("<<", i) else next((o for o in _OPS if line.startswith(o, i)), None)
+            if op:
+                end(); toks.append(("op", op)); i += len(op); continue
+            cur.append(ch); pat.append(ch); word = True
+            if ch in "*?[{": magic = True
+        i += 1
+    if q: raise ValueError("unexpected EOF while looking for matching quote")
+    end()
+    return toks, shell
+
+def parse_plan(toks: list) -> list:
+    """[(pipeline, connector)]: pipeline = [{"argv": [...], "pats": [...], "redirs": [(op, doel)]}],
+    connector ; && || & of None. pats[i] is het glob-patroon van argv[i] (None = letterlijk)."""
+    plan = []; pipe = []; st = {"argv": [], "pats": [], "redirs": []}; i = 0
+    while i < len(toks):
+        kind, val = toks[i][:2]
+        if kind == "w": st["argv"].append(val); st["pats"].append(toks[i][2])
+        elif val in _REDIR_OPS:
+            if i+1 >= len(toks) or toks[i+1][0] != "w": raise ValueError(f"syntax error near unexpected token `{val}'")
+            st["redirs"].append((val, toks[i+1][1])); i += 1
+        elif val in ("2>&1", ">&2"): st["redirs"].append((val, None))
+        else:
+            if st["redirs"] and not st["argv"]: st["argv"], st["pats"] = ["true"], [None]   # "> bestand" maakt het bestand leeg
+            if not st["argv"]:
+                if val in (";", "&") and not pipe and i == len(toks)-1 and plan: break
+                raise ValueError(f"syntax error near unexpected token `{val}'")
+            pipe.append(st); st = {"argv": [], "pats": [], "redirs": []}
+            if val != "|": plan.append((pipe, val)); pipe = []
+        i += 1
+    if st["redirs"] and not st["argv"]: st["argv"], st["pats"] = ["true"], [None]
+    if st["argv"]: pipe.append(st)
+    elif pipe: raise ValueError("syntax error: unexpected end of line after `|'")
+    if pipe: plan.append((pipe, None))
+    return plan
+
+# --- stages ---
+def find_external(cmd: str) -> str|None:
+    """Direct startbaar programma (PortableGit usr/bin, mingw64/bin, daarna PATH): geen bash ertussen."""
+    for d in (GIT_HOME/"usr"/"bin", GIT_HOME/"mingw64"/"bin"):
+        p = d/(cmd + (".exe" if os.name == "nt" else ""))
+        if p.is_file(): return str(p)
+    return shutil.which(cmd)
+
+def _is_path_cmd(cmd: str) -> bool: return "/" in cmd or "\\" in cmd or cmd.startswith(".")
+
+def _stage_builtin(cmd: str) -> bool:
+    return is_builtin(cmd) or (_is_path_cmd(cmd) and cmd.lower().endswith(".lfsh"))
+
+def _stage_direct(cmd: str) -> bool:
+    # extern zonder bash: git, scripts/programma's via pad, of een echt programma (geen shim)
+    return cmd == "git" or _is_path_cmd(cmd) or (cmd not in SHIM_SCRIPTS and find_external(cmd) is not None)
+
+def _external_argv(argv: list, cwd: Path, git_env_cache: dict|None):
+    """Startbare (argv, env, git_env_cache) voor een externe stage; argv None → niet gevonden."""
+    cmd, *args = argv
+    if cmd == "git" and find_git_exe():
+        if git_env_cache is None: git_env_cache = ensure_git_config_and_ssh(SYSTEM_ROOT/"home"/USER)
+        env = _base_env(); env.update(git_env_cache or {})
+        return [find_git_exe()] + args, env, git_env_cache
+    text = shlex.join(argv)
+    if _is_path_cmd(cmd):
+        target = resolve_path(cwd, cmd)
+        if not target.is_file(): return None, None, git_env_cache
+        low = target.name.lower()
+        if low.endswith(".py"): return [sys.executable or "python", str(target)] + args, None, git_env_cache
+        if not low.endswith(".sh"): return [str(target)] + args, None, git_env_cache
+        text = shlex.join([_path_to_msys(target)] + args)
+    elif cmd not in SHIM_SCRIPTS:
+        exe = find_external(cmd)
+        if exe: return [exe] + args, None, git_env_cache
+    bash = bash_for_passthrough()
+    if not bash: return None, None, git_env_cache
+    ensure_bash_runtime()
+    return [bash, "-lc", _bash_cmdline(text, cwd)], _bash_env(), git_env_cache
+
+def _redir_open(cwd: Path, target: str, mode: str):
+    if target == "/dev/null": path = os.devnull
+    else:
+        p = copy_up(resolve_path(cwd, target), data="a" in mode); p.parent.mkdir(parents=True, exist_ok=True); path = str(p)
+    return open(path, mode, encoding="utf-8", errors="surrogateescape", newline="")
+
+def _open_redirs(stage: dict, cwd: Path, opened: list) -> tuple:
+    """Open de bestanden van een stage: (stdout, stderr, stdin-pad). "stdout"/"stderr" = 2>&1 / >&2."""
+    out = err = src = None
+    for op, target in stage["redirs"]:
+        if op == "<":
+            src = os.devnull if target == "/dev/null" else str(resolve_path(cwd, target))
+            if not os.path.isfile(src) and src != os.devnull: raise OSError(f"{target}: No such file or directory")
+        elif op == "2>&1": err = "stdout"
+        elif op == ">&2": out = "stderr"
+        else:
+            f = _redir_open(cwd, target, "a" if op.endswith(">>") else "w"); opened.append(f)
+            if op in (">", ">>", "&>"): out = f
+            if op in ("2>", "2>>", "&>"): err = f
+    return out, err, src
+
+def _file_lines(path: str):
+    with open(path, encoding="utf-8", errors="surrogateescape", newline="") as f: yield from f
+
+def _proc_lines(p):
+    with io.TextIOWrapper(p.stdout, encoding="utf-8", errors="surrogateescape", newline="") as f: yield from f
+
+class _ErrLines(list):
+    """stderr van een generator-stage die via 2>&1 in de eigen uitvoerstroom meegaat."""
+    def write(self, s: str) -> int: self.append(s); return len(s)
+    def flush(self): pass
+    def isatty(self): return False
+
+def _track(gen, holder: list, err=None):
+    """Geef de regels van een builtin-stage door; de return-waarde van de generator is de exit-status."""
+    if err is None:
+        holder[0] = (yield from gen) or 0; return
+    inline = isinstance(err, _ErrLines)
+    while True:
+        with io_redirect(stderr=err):
+            try: line = next(gen)
+            except StopIteration as e: holder[0] = e.value or 0; line = None
+        if inline and err: yield "".join(err); err.clear()
+        if line is None: return
+        yield line
+
+def _thread_stage(argv: list, cwd: Path, git_env_cache: dict|None, inp, err, holder: list):
+    """Niet-generator builtin in een worker-thread (subshell: cd blijft lokaal); stdout stroomt als regels terug."""
+    pipe = _LinePipe(); perf = list(_perf_stack()); job = getattr(_job_tls, "job", None)
+    sess = getattr(_sess_tls, "session", None)
+    if err == "stdout": err = pipe
+    def work():
+        _perf_tls.stack = perf; _job_tls.job = job; _sess_tls.session = sess
+        try:
+            with io_redirect(stdout=pipe, stderr=err, stdin=inp):
+                _dispatch(shlex.join(argv), cwd, git_env_cache, argv)
+            holder[0] = last_status()
+        except BrokenPipeError: holder[0] = 141
+        except SystemExit as e: holder[0] = e.code if isinstance(e.code, int) else 0
+        except Exception as e:
+            with io_redirect(stderr=err): _err(f"{argv[0]}: {e}")
+            holder[0] = 1
+        finally: pipe.finish()
+    t = threading.Thread(target=work, daemon=True); t.start()
+    try: yield from pipe
+    finally:
+        pipe.abort(); t.join()
+
+def _stage_lines(cur):
+    """Invoer van een builtin-stage als regel-iterator (vorige stage, < bestand of thread-stdin)."""
+    if cur is None: return _io_stdin()
+    kind, obj = cur
+    if kind == "lines": return obj
+    if kind == "file": return _file_lines(obj)
+    return _proc_lines(obj)
+
+def run_pipeline(stages: list, cwd: Path, git_env_cache: dict|None) -> tuple[Path, dict|None, int]:
+    """Eén pipeline uitvoeren; geeft (cwd, git_env_cache, exit-status van de laatste stage)."""
+    opened = []
+    try:
+        for st in stages:
+            st["argv"] = expand_words(st["argv"], st["pats"], cwd)
+            st["argv"][0] = ALIASES.get(st["argv"][0], st["argv"][0])
+        first = stages[0]
+        if len(stages) == 1 and _stage_builtin(first["argv"][0]):
+            # enkel builtin (ook cd/exit/set): in deze thread, zodat cwd en opties blijven
+            out, err, src = _open_redirs(first, cwd, opened)
+            out = _cur_out("stderr") if out == "stderr" else out
+            err = (out or _cur_out("stdout")) if err == "stdout" else err
+            with io_redirect(stdout=out, stderr=err, stdin=_file_lines(src) if src else None):
+                cwd, git_env_cache = _dispatch(shlex.join(first["argv"]), cwd, git_env_cache, first["argv"])
+            return cwd, git_env_cache, last_status()
+        cmd = first["argv"][0]
+        if len(stages) == 1 and _is_path_cmd(cmd) and cmd.lower().endswith(".py") and warmpy_usable() and resolve_path(cwd, cmd).is_file():
+            # ./script.py met bestandsomleidingen: de fd's gaan zo naar de warme runner
+            out, err, src = _open_redirs(first, cwd, opened)
+            out = _cur_out("stderr") if out == "stderr" else out
+            err = (out or _cur_out("stdout")) if err == "stdout" else err
+            fin = open(src, "rb") if src else None
+            if fin is not None: opened.append(fin)
+            with io_redirect(stdout=out, stderr=err):
+                rc = warm_python([str(resolve_path(cwd, cmd))] + first["argv"][1:], cwd, fin.fileno() if fin else None)
+            if rc is not None: return cwd, git_env_cache, rc
+        _perf_mark("pipeline")
+        status, git_env_cache = _run_stages(stages, cwd, git_env_cache, opened)
+        return cwd, git_env_cache, status
+    finally:
+        for f in opened:
+            try: f.close()
+            except OSError: pass
+        fs_changed([f.name for f in opened if "r" not in f.mode and f.name != os.devnull])
+
+def _run_stages(stages: list, cwd: Path, git_env_cache: dict|None, opened: list) -> tuple[int, dict|None]:
+    procs, gens, holders, pumps = [], [], [], []
+    cur = None              # ("lines", iterator) | ("proc", Popen) | ("file", pad) | None
+    last = len(stages) - 1
+    t0 = time.perf_counter()
+    try:
+        for i, st in enumerate(stages):
+            argv = st["argv"]; cmd = argv[0]
+            out, err, src = _open_redirs(st, cwd, opened)
+            if src: cur = ("file", src)
+            holder = [0]; holders.append(holder)
+            if _stage_builtin(cmd):
+                inp = _stage_lines(cur)
+                if out == "stderr": out = _cur_out("stderr")
+                native = pipe_builtin(cmd, argv[1:])
+                if err == "stdout": err = out if out is not None else (_ErrLines() if native else "stdout")
+                if native: gen = _track(native(cwd, argv[1:], inp), holder, err)
+                else: gen = _thread_stage(argv, cwd, git_env_cache, inp, err or _io_top("stderr"), holder)
+                gens.append(gen)
+                if out is not None:
+                    # stage → bestand; de volgende stage krijgt lege invoer (zoals bash)
+                    _emit(gen, out); cur = ("lines", iter(()))
+                else: cur = ("lines", gen)
+                continue
+            ext, env, git_env_cache = _external_argv(argv, cwd, git_env_cache)
+            if ext is None:
+                with io_redirect(stderr=err if err not in (None, "stdout") else None): _err(f"{cmd}: command not found", 127)
+                holder[0] = 127; cur = ("lines", iter(())); continue
+            kw, feed = {}, None
+            if cur is None and _io_stdin() is not None: cur = ("lines", _io_stdin())
+            if cur is None: pass
+            elif cur[0] == "file": f = open(cur[1], "rb"); opened.append(f); kw["stdin"] = f
+            elif cur[0] == "proc": kw["stdin"] = cur[1].stdout
+            else: kw["stdin"] = subprocess.PIPE; feed = cur[1]
+            if out == "stderr": kw["stdout"] = _fd_or_pipe(_cur_out("stderr"))
+            elif out is not None: kw["stdout"] = _fd_or_pipe(out)
+            elif i < last: kw["stdout"] = subprocess.PIPE
+            if err == "stdout": kw["stderr"] = subprocess.STDOUT
+            elif err is not None: kw["stderr"] = _fd_or_pipe(err)
+            tasks = _child_stdio(kw) if i == last else []
+            invalidate_path_cache(); job = _job_popen(kw)
+            p = subprocess.Popen(ext, cwd=str(cwd), env=env, **kw); procs.append((p, holder))
+            if job is not None: job.procs.append(p)
+            if cur and cur[0] == "proc" and cur[1].stdout: cur[1].stdout.close()   # SIGPIPE naar de schrijver
+            if feed is not None: threading.Thread(target=_feed, args=(p.stdin, feed), daemon=True).start()
+            for fn, join in tasks:
+                t = threading.Thread(target=fn, args=(p,), daemon=True); t.start()
+                if join: pumps.append(t)
+            cur = ("proc", p) if i < last and out is None else (None if i == last else ("lines", iter(())))
+        if cur and cur[0] == "lines": _emit(cur[1])
+        for p, holder in procs: holder[0] = _wait_child(p)
+        for t in pumps: t.join()
+    except BaseException:
+        for p, _ in procs:
+            if p.poll() is None: p.kill()
+        for p, _ in procs: p.wait()
+        raise
+    finally:
+        for g in gens:
+            try: g.close()
+            except ValueError: pass       # wordt nog door een feeder-thread gelezen; die stopt zelf
+        if procs:
+            fs_poll(); dt = time.perf_counter() - t0
+            for rec in _perf_stack(): rec["sub"] += dt
+    return holders[-1][0], git_env_cache
+
+def _and_or_lists(plan: list) -> list:
+    out = [[]]
+    for item in plan:
+        out[-1].append(item)
+        if item[1] in (";", "&", None): out.append([])
+    return [seg for seg in out if seg]
+
+def _run_and_or(seg: list, cwd: Path, git_env_cache: dict|None) -> tuple[Path, dict|None, int, bool]:
+    """Pipelines met && / ||; geeft ook of de laatste pipeline van de lijst echt gedraaid heeft (errexit)."""
+    status = 0; prev = None; ran_last = False
+    for n, (pipeline, conn) in enumerate(seg):
+        if (prev == "&&" and status) or (prev == "||" and not status): prev = conn; continue
+        try:
+            cwd, git_env_cache, status = run_pipeline(pipeline, cwd, git_env_cache)
+        except OSError as e:
+            _err(f"shell: {e}"); status = 1
+        set_status(status); prev = conn; ran_last = n == len(seg) - 1
+    return cwd, git_env_cache, status, ran_last
+
+def run_plan(plan: list, cwd: Path, git_env_cache: dict|None) -> tuple[Path, dict|None]:
+    """and-or-lijsten gescheiden door ; en &; een lijst die op & eindigt wordt een achtergrond-job."""
+    status = 0
+    for seg in _and_or_lists(plan):
+        if seg[-1][1] == "&":
+            start_job(_plan_text(seg), lambda c, g, seg=seg: _run_and_or(seg, c, g), cwd, git_env_cache)
+            status = 0; continue
+        cwd, git_env_cache, status, ran_last = _run_and_or(seg, cwd, git_env_cache)
+        if status and ran_last and shell_opts()["errexit"]: break
+    set_status(status)
+    return cwd, git_env_cache
+
+def _execute(line: str, cwd: Path, git_env_cache: dict|None) -> tuple[Path, dict|None]:
+    """Parse een regel: enkel commando → _dispatch, anders de pipeline-engine; bash-syntax → passthrough."""
+    try:
+        toks, shell = lex_line(line)
+        plan = parse_plan(toks)
+    except ValueError as e:
+        _err(f"shell: {e}", 2); return cwd, git_env_cache
+    if not plan: return cwd, git_env_cache
+    stages = [st for pipeline, _ in plan for st in pipeline]
+    first = ALIASES.get(stages[0]["argv"][0], stages[0]["argv"][0])
+    if shell and not _stage_builtin(first):
+        # $VAR, `…`, ( ) → hele regel naar bash; met een & aan het eind als job
+        if plan[-1][1] == "&":
+            text = line.rstrip()[:-1].rstrip()
+            start_job(text, lambda c, g: _dispatch(text, c, g), cwd, git_env_cache); set_status(0)
+            return cwd, git_env_cache
+        return _dispatch(line, cwd, git_env_cache)
+    if len(stages) == 1 and not stages[0]["redirs"] and plan[0][1] in (None, ";"):
+        return _dispatch(line, cwd, git_env_cache, expand_words(stages[0]["argv"], stages[0]["pats"], cwd))
+    if not any(_stage_builtin(ALIASES.get(st["argv"][0], st["argv"][0])) for st in stages) \
+       and not all(_stage_direct(ALIASES.get(st["argv"][0], st["argv"][0])) for st in stages) \
+       and "&" not in (conn for _, conn in plan):
+        return _dispatch(line, cwd, git_env_cache)          # alleen bash-werk: één bash voor de hele regel
+    return run_plan(plan, cwd, git_env_cache)
+
+# ---------- achtergrond-jobs (&, jobs, fg, bg, wait, kill) ----------
+# Een job is een thread die een and-or-lijst uitvoert met eigen cwd; stdout/stderr (ook van children)
+# gaan naar var/log/jobs/<n>.log, tijdens fg, met `set -o jobtags` of in batch-modus ook naar de console.
+# Children van een job krijgen een eigen sessie/procesgroep: Ctrl-C op de prompt raakt ze niet.
+JOBS_LOG_DIR = SYSTEM_ROOT / "var" / "log" / "jobs"
+JOBS = {}
+_JOB_IDS = count(1)   # job-nummers lopen door, ook na opruimen: een nieuw nummer = een nieuw log
+_job_tls = threading.local()
+
+class _JobOut:
+    """Uitvoer van een achtergrond-job: job-log, plus console tijdens fg of met jobtags."""
+    encoding, errors = "utf-8", "surrogateescape"
+    def __init__(self, job, console):
+        self.job, self.console = job, console
+        self.lock = threading.Lock(); self.chars = 0; self.partial = ""
+        job.log.parent.mkdir(parents=True, exist_ok=True)
+        self.f = open(job.log, "w", encoding="utf-8", errors="surrogateescape", newline="")
+    def write(self, s: str) -> int:
+        if self.job.killed: raise BrokenPipeError(32, "Broken pipe")
+        with self.lock:
+            self.f.write(s); self.chars += len(s)
+            # fg, of batch-modus (zoals bash: uitvoer van & gewoon op stdout)
+            if self.job.attached or not shell_opts()["interactive"]: self.console.write(s); self.console.flush()
+            elif shell_opts()["jobtags"]:
+                *lines, self.partial = (self.partial + s).split("\n")
+                for line in lines: self.console.write(f"[{self.job.id}] {line}\n")
+        return len(s)
+    def flush(self):
+        with self.lock: self.f.flush()
+    def isatty(self): return False
+    def close(self):
+        with self.lock:
+            if self.partial and shell_opts()["jobtags"] and not self.job.attached:
+                self.console.write(f"[{self.job.id}] {self.partial}\n")
+            self.f.close()
+
+class Job:
+    def __init__(self, jid: int, text: str):
+        self.id, self.text = jid, text
+        s = getattr(_sess_tls, "session", None)
+        self.log = JOBS_LOG_DIR / (f"{jid}.log" if s is None else f"s{s.sid}-{jid}.log")
+        self.procs = []; self.status = None
+        self.done = self.attached = False; self.killed = 0
+        self.seen = 0; self.thread = None; self.out = None
+    def state(self) -> str:
+        if not self.done: return "Running"
+        if self.killed: return "Killed"
+        return "Done" if self.status == 0 else f"Exit {self.status}"
+    def kill(self, sig=None):
+        sig = signal.SIGTERM if sig is None else sig
+        self.killed = int(sig) or signal.SIGTERM
+        for p in list(self.procs):
+            if p.poll() is not None: continue
+            try:
+                if os.name != "nt": os.killpg(p.pid, sig)
+                elif sig == getattr(signal, "SIGKILL", None): p.kill()
+                else: p.terminate()
+            except OSError: pass
+
+def _jobs() -> dict:
+    """Job-tabel van de daemon-sessie van deze thread, anders de globale."""
+    s = getattr(_sess_tls, "session", None)
+    return JOBS if s is None else s.jobs
+
+def _next_job_id() -> int:
+    s = getattr(_sess_tls, "session", None)
+    return next(_JOB_IDS if s is None else s.job_ids)
+
+def _job_popen(kw: dict):
+    """Binnen een job: child in een eigen sessie/procesgroep; geeft de job (of None) om het proces te volgen."""
+    job = getattr(_job_tls, "job", None)
+    if job is not None:
+        if os.name == "nt": kw["creationflags"] = kw.get("creationflags", 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+        else: kw["start_new_session"] = True
+    return job
+
+def _plan_text(seg: list) -> str:
+    parts = []
+    for pipeline, conn in seg:
+        stages = []
+        for st in pipeline:
+            redirs = "".join(f" {op}" + (f" {t}" if t else "") for op, t in st["redirs"])
+            stages.append(shlex.join(st["argv"]) + redirs)
+        parts.append(" | ".join(stages) + ("" if conn in (None, "&") else f" {conn}"))
+    return " ".join(parts)
+
+def start_job(text: str, fn, cwd: Path, git_env_cache: dict|None) -> Job:
+    """fn(cwd, git_env_cache) in een achtergrond-thread; stdin is leeg, uitvoer naar het job-log."""
+    job = Job(_next_job_id(), text)
+    job.out = _JobOut(job, _cur_out("stdout")); sess = getattr(_sess_tls, "session", None)
+    def main():
+        _job_tls.job = job; _sess_tls.session = sess
+        try:
+            with io_redirect(stdout=job.out, stderr=job.out, stdin=iter(())):
+                fn(cwd, dict(git_env_cache) if git_env_cache else git_env_cache)
+            job.status = last_status()
+        except BrokenPipeError: job.status = 141
+        except SystemExit as e: job.status = e.code if isinstance(e.code, int) else 0
+        except Exception as e:
+            try: job.out.write(f"{text}: {e}\n")
+            except BrokenPipeError: pass
+            job.status = 1
+        finally:
+            if job.killed: job.status = 128 + job.killed
+            job.out.close(); job.done = True
+    _jobs()[job.id] = job
+    job.thread = threading.Thread(target=main, name=f"job-{job.id}", daemon=True); job.thread.start()
+    if shell_opts()["interactive"]: print(f"[{job.id}] /{job.log.relative_to(SYSTEM_ROOT).as_posix()}")
+    return job
+
+def _job_lookup(spec: str) -> Job|None:
+    order = list(_jobs().values())
+    if spec in ("%", "%%", "%+"): return order[-1] if order else None
+    if spec == "%-": return order[-2] if len(order) > 1 else None
+    if spec.startswith("%"): spec = spec[1:]
+    if spec.isdigit():
+        n = int(spec)
+        return _jobs().get(n) or next((j for j in order if any(p.pid == n for p in j.procs)), None)
+    return next((j for j in reversed(order) if j.text.startswith(spec)), None)
+
+def _job_line(job: Job, long: bool = False) -> str:
+    order = list(_jobs())
+    mark = "+" if order and job.id == order[-1] else "-" if len(order) > 1 and job.id == order[-2] else " "
+    line = f"[{job.id}]{mark}  {job.state():<22}{job.text} &"
+    if long:
+        pids = " ".join(str(p.pid) for p in job.procs) or "—"
+        line += f"\n      pids: {pids}  log: /{job.log.relative_to(SYSTEM_ROOT).as_posix()}"
+    return line
+
+def notify_jobs():
+    """Meld afgelopen jobs (voor de volgende prompt) en haal ze uit de tabel."""
+    jobs = _jobs()
+    for job in [j for j in jobs.values() if j.done]:
+        print(_job_line(job)); del jobs[job.id]
+
+def cmd_jobs(args: list):
+    jobs = _jobs()
+    for job in list(jobs.values()):
+        print(_job_line(job, "-l" in args))
+        if job.done: del jobs[job.id]
+
+def cmd_fg(args: list):
+    spec = args[0] if args else "%+"
+    job = _job_lookup(spec)
+    if job is None: _err(f"fg: {spec}: no such job"); return
+    print(job.text)
+    with job.out.lock:
+        if not job.out.f.closed: job.out.f.flush()
+        with open(job.log, encoding="utf-8", errors="surrogateescape", newline="") as f: backlog = f.read()
+        job.out.console.write(backlog[job.seen:]); job.attached = True
+    try:
+        while not job.done: job.thread.join(0.1)
+    except KeyboardInterrupt:
+        # Ctrl-C ontkoppelt: de job loopt door op de achtergrond
+        job.attached = False; job.seen = job.out.chars
+        print(f"\n[{job.id}]+  Running  {job.text} &  (kill %{job.id} stopt de job)"); return
+    job.attached = False
+    _jobs().pop(job.id, None); set_status(job.status or 0)
+
+def cmd_bg(args: list):
+    spec = args[0] if args else "%+"
+    job = _job_lookup(spec)
+    if job is None: _err(f"bg: {spec}: no such job"); return
+    if job.done: _err(f"bg: job {job.id} has terminated"); return
+    job.attached = False
+    print(f"[{job.id}]+ {job.text} &")
+
+def wait_jobs(specs: list) -> int:
+    jobs = list(_jobs().values()) if not specs else [_job_lookup(s) for s in specs]
+    status = 0
+    for spec, job in zip(specs or [None]*len(jobs), jobs):
+        if job is None: _err(f"wait: {spec}: no such job", 127); status = 127; continue
+        while not job.done: job.thread.join(0.1)
+        status = job.status or 0
+    return status
+
+def cmd_kill(args: list):
+    sig = signal.SIGTERM; targets = []; i = 0
+    while i < len(args):
+        a = args[i]
+        if a == "-s" and i+1 < len(args): a = "-" + args[i+1]; i += 1
+        if a.startswith("-") and len(a) > 1:
+            name = a[1:].upper()
+            if name.isdigit(): sig = int(name)
+            else:
+                sig = getattr(signal, name if name.startswith("SIG") else "SIG" + name, None)
+                if sig is None: _err(f"kill: {a[1:]}: invalid signal specification"); return
+        else: targets.append(a)
+        i += 1
+    if not targets: _err("Usage: kill [-s SIGNAL | -SIGNAL] %JOB|PID ..."); return
+    for t in targets:
+        if t.startswith("%"):
+            job = _job_lookup(t)
+            if job is None: _err(f"kill: {t}: no such job"); continue
+            job.kill(sig)
+        elif t.isdigit():
+            try: os.kill(int(t), sig)
+            except OSError as e: _err(f"kill: ({t}) - {e.strerror}")
+        else: _err(f"kill: {t}: arguments must be process or job IDs")
+
+# ---------- tab-completion (readline) ----------
+COMPLETE_LIMIT = 2000
+_COMPLETE = {"cmds": None, "bash": None, "cwd": None, "hits": []}
+_DIR_TRIES = {}   # host-dir → (mtime_ns, PrefixTrie)
+_CMD_POS = re.compile(r"(?:^|[;&|(])\s*(?:(?:sudo|time|which|help)\s+)*$")
+
+class PrefixTrie:
+    """Burst-trie: bladeren zijn gesorteerde lijsten (bisect) en splitsen pas bij add() boven BURST woorden.
+    Bouwen kost één sort, opzoeken O(len(prefix) + log n) — ook bij 100k namen."""
+    BURST = 128
+    __slots__ = ("words", "kids", "end")
+    def __init__(self, words=(), _sorted=False):
+        self.words = list(words) if _sorted else sorted(set(words)); self.kids = None; self.end = False
+    def _burst(self):
+        kids = {}
+        for w in self.words:
+            if w: kids.setdefault(w[0], []).append(w[1:])
+            else: self.end = True
+        self.kids = {ch: PrefixTrie(lst, _sorted=True) for ch, lst in kids.items()}; self.words = None
+    def add(self, word: str):
+        node = self
+        while node.kids is not None:
+            if not word: node.end = True; return
+            nxt = node.kids.get(word[0])
+            if nxt is None: nxt = node.kids[word[0]] = PrefixTrie()
+            node, word = nxt, word[1:]
+        i = bisect_left(node.words, word)
+        if i == len(node.words) or node.words[i] != word:
+            node.words.insert(i, word)
+            if len(node.words) > self.BURST: node._burst()
+    def iter(self, prefix: str = ""):
+        node, rest = self, prefix
+        while rest and node.kids is not None:
+            node = node.kids.get(rest[0]); rest = rest[1:]
+            if node is None: return
+        head = prefix[:len(prefix)-len(rest)]
+        for w in node._walk(rest): yield head + w
+    def _walk(self, rest: str = ""):
+        if self.kids is None:
+            ws = self.words; i = bisect_left(ws, rest)
+            while i < len(ws) and ws[i].startswith(rest): yield ws[i]; i += 1
+            return
+        if self.end: yield ""
+        for ch in sorted(self.kids):
+            for w in self.kids[ch]._walk(): yield ch + w
+    def complete(self, prefix: str, limit: int = 0) -> list:
+        it = self.iter(prefix)
+        return list(islice(it, limit) if limit else it)
+
+def bash_commands(refresh: bool = False) -> list[str]:
+    """compgen -c hooguit één keer per sessie; de schijfcache (var/cache) maakt de volgende start direct."""
+    if _COMPLETE["bash"] is not None and not refresh: return _COMPLETE["bash"]
+    f = SYSTEM_ROOT/"var"/"cache"/"bash-commands.txt"
+    if not refresh:
+        try: _COMPLETE["bash"] = f.read_text(encoding="utf-8").split(); return _COMPLETE["bash"]
+        except OSError: pass
+    cmds = list_all_bash_commands()
+    if cmds:
+        try: f.parent.mkdir(parents=True, exist_ok=True); f.write_text("\n".join(cmds), encoding="utf-8")
+        except OSError: pass
+    _COMPLETE["bash"] = cmds; _COMPLETE["cmds"] = None
+    return cmds
+
+def _cmd_trie() -> PrefixTrie:
+    t = _COMPLETE["cmds"]
+    if t is None:
+        t = _COMPLETE["cmds"] = PrefixTrie(BUILTIN_COMMANDS | set(_plugin_index()) | set(ALIASES) | set(SHIM_SCRIPTS) | set(_COMPLETE["bash"] or ()))
+    return t
+
+def _dir_trie(host: Path):
+    # per map één scandir; opnieuw lezen alleen als de mtime van de map verandert
+    key = str(host)
+    try: mt = os.stat(key).st_mtime_ns
+    except OSError: mt = None
+    if OVERLAY_BASE is not None:
+        # overlay: sleutel op beide lagen, namen uit de samengevoegde weergave
+        rel = _ov_rel(host)
+        try: mt = (mt, os.stat(OVERLAY_BASE / rel).st_mtime_ns if rel else None)
+        except OSError: mt = (mt, None)
+        if mt == (None, None): return None
+    elif mt is None: return None
+    hit = _DIR_TRIES.get(key)
+    if hit and hit[0] == mt: return hit[1]
+    names = []
+    try:
+        if OVERLAY_BASE is not None:
+            names = [n + "/" if os.path.isdir(p) else n for n, p in ov_scandir(host)]
+        else:
+            with os.scandir(key) as it:
+                for e in it:
+                    try: names.append(e.name + "/" if e.is_dir() else e.name)
+                    except OSError: names.append(e.name)
+    except OSError: return None
+    if len(_DIR_TRIES) >= 256: _DIR_TRIES.clear()
+    t = PrefixTrie(names); _DIR_TRIES[key] = (mt, t); fs_watch(host)
+    return t
+
+@fs_subscribe
+def _dir_tries_changed(path: str, kind: str, ts: float):
+    # gewijzigde map (of een kind ervan) → trie vergeten; bij mappen ook alles eronder
+    hosts = [str(r / path.lstrip("/")) if path != "/" else str(r) for r in (SYSTEM_ROOT, OVERLAY_BASE) if r is not None]
+    for key in list(_DIR_TRIES):
+        if any(key == h or key == os.path.dirname(h) or key.startswith(h + os.sep) for h in hosts): _DIR_TRIES.pop(key, None)
+
+def complete_path(text: str, cwd: Path, dirs_only: bool = False) -> list[str]:
+    base, slash, pre = text.rpartition("/")
+    base += slash
+    host = resolve_path(cwd, base) if base else cwd
+    if not path_inside_root(host): return []
+    t = _dir_trie(host)
+    if t is None: return []
+    hits = (n for n in t.iter(pre) if (pre.startswith(".") or not n.startswith("."))
+            and (not dirs_only or n.endswith("/")))
+    return [base + re.sub(r"([ \\'\"$&;|()<>*?\[\]{}])", r"\\\1", n) for n in islice(hits, COMPLETE_LIMIT)]
+
+def completions(line: str, begidx: int, text: str, cwd: Path) -> list[str]:
+    before = line[:begidx]
+    if "/" not in text and not text.startswith(("~", ".")) and _CMD_POS.search(before):
+        return _cmd_trie().complete(text, COMPLETE_LIMIT)
+    first = before.split(None, 1)[0] if before.strip() else ""
+    return complete_path(text, cwd, dirs_only=first in ("cd", "rmdir"))
+
+def complete_chdir(cwd: Path):
+    # REPL-prompt: cwd onthouden en de map alvast op de achtergrond scannen
+    _COMPLETE["cwd"] = cwd
+    if _DIR_TRIES.get(str(cwd)) is None: threading.Thread(target=_dir_trie, args=(cwd,), daemon=True).start()
+
+def _warm_completion():
+    bash_commands(); _cmd_trie()
+    if find_bash(): bash_commands(refresh=True); _cmd_trie()
+
+def setup_completion() -> bool:
+    """Tab-completion in de REPL (readline / pyreadline3); zonder readline blijft input() gewoon werken."""
+    try: import readline
+    except ImportError: return False
+    def _complete(text, state):
+        if state == 0:
+            try: _COMPLETE["hits"] = completions(readline.get_line_buffer(), readline.get_begidx(), text, _COMPLETE["cwd"] or SYSTEM_ROOT)
+            except Exception: _COMPLETE["hits"] = []
+        hits = _COMPLETE["hits"]
+        return hits[state] if state < len(hits) else None
+    readline.set_completer_delims(" \t\n;|&<>()=")
+    readline.set_completer(_complete)
+    readline.parse_and_bind("bind ^I rl_complete" if "libedit" in (readline.__doc__ or "") else "tab: complete")
+    threading.Thread(target=_warm_completion, daemon=True).start()
+    return True
+
+def _rl_prompt(s: str) -> str:
+    # kleurcodes markeren als niet-printbaar, anders rekent readline de cursorpositie fout
+    return re.sub(r"(\x1b\[[0-9;]*m)", "\001\\1\002", s) if os.name != "nt" else s
+
+# ---------- batch mode (-c, scripts, stdin) ----------
+SHELL_OPTS = {"errexit": False, "jobtags": False, "interactive": False, "warmpy": os.environ.get("LTERM_WARMPY") == "1"}
+_sess_tls = threading.local()
+
+def shell_opts() -> dict:
+    """Shell-opties van de daemon-sessie van deze thread, anders de globale."""
+    s = getattr(_sess_tls, "session", None)
+    return SHELL_OPTS if s is None else s.opts
+
+def _base_env() -> dict:
+    """Kopie van os.environ, of van de omgeving van de daemon-client van deze thread."""
+    s = getattr(_sess_tls, "session", None)
+    return os.environ.copy() if s is None else dict(s.env)
+
+def cmd_set(args:list):
+    opts=shell_opts()
+    if not args:
+        for opt in ("errexit", "jobtags", "warmpy"): print(f"{opt:<15}{'on' if opts[opt] else 'off'}")
+        return
+    i=0
+    while i < len(args):
+        a=args[i]
+        if a in ("-e","+e"): opts["errexit"] = a=="-e"
+        elif a in ("-o","+o") and i+1 < len(args) and args[i+1] in ("errexit","jobtags","warmpy"):
+            opts[args[i+1]] = a=="-o"; i+=1
+        else: _err(f"set: {a}: only -e/+e, -o/+o errexit|jobtags|warmpy are supported", 2); return
+        i+=1
+
+def split_statements(text: str) -> list[str]:
+    """Splits op ; en newlines buiten quotes; #-commentaar en \\-regelvoortzetting worden afgehandeld."""
+    out=[]; cur=[]; q=None; i=0; n=len(text)
+    while i < n:
+        ch=text[i]
+        if q:
+            cur.append(ch)
+            if ch=="\\" and q=='"' and i+1 < n: cur.append(text[i+1]); i+=1
+            elif ch==q: q=None
+        elif ch in "'\"": q=ch; cur.append(ch)
+        elif ch=="\\" and i+1 < n:
+            if text[i+1]=="\n": i+=2; continue
+            cur.append(ch); cur.append(text[i+1]); i+=1
+        elif ch in ";\n": out.append("".join(cur)); cur=[]
+        elif ch=="#" and (not cur or cur[-1] in " \t"):
+            while i < n and text[i]!="\n": i+=1
+            continue
+        else: cur.append(ch)
+        i+=1
+    out.append("".join(cur))
+    return [x.strip() for x in out if x.strip()]
+
+def run_batch(lines, cwd:Path, git_env_cache:dict|None=None) -> int:
+    """Voer tekstregels uit zonder prompt/banners; stopt bij een fout als errexit (set -e) aan staat."""
+    status=0; pending=""
+    for raw in lines:
+        line=pending+raw.rstrip("\r\n")
+        if line.endswith("\\") and not line.endswith("\\\\"): pending=line[:-1]; continue
+        pending=""
+        for stmt in split_statements(line):
+            try:
+                cwd, git_env_cache = run_command(stmt, cwd, git_env_cache)
+            except (SystemExit, KeyboardInterrupt): raise
+            except Exception as e: _err(f"Shell error: {e}")
+            status=last_status()
+            if status and shell_opts()["errexit"]: return status
+    return status
+
+def run_script_file(path:Path, cwd:Path) -> int:
+    """.lfsh-script in-process uitvoeren; cd/set -e/exit blijven binnen het script."""
+    opts=shell_opts(); saved=dict(opts); opts["interactive"]=False
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f: status=run_batch(f, cwd)
+    except SystemExit as e: status=e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally: opts.update(saved)
+    set_status(status)
+    return status
+
+def main_batch(argv:list) -> int:
+    usage=(f"Usage: {Path(sys.argv[0]).name} [--root DIR] [-e] [-c 'CMD; CMD'] [SCRIPT.lfsh | -]\n"
+           f"       {Path(sys.argv[0]).name} [--root DIR] --daemon | --attach [-c 'CMD; CMD']")
+    text=None; script=None; i=0
+    while i < len(argv):
+        a=argv[i]
+        if a=="-c" and i+1 < len(argv): text=argv[i+1]; i+=2; continue
+        if a=="-e": SHELL_OPTS["errexit"]=True
+        elif a in ("-h","--help"): print(usage); return 0
+        elif a=="-": script=None
+        elif a.startswith("-"): _err(f"unknown option: {a}\n{usage}", 2); return 2
+        else: script=a; break
+        i+=1
+    # geen pip/Git-bootstrap, geen banners of clear: alleen de mappenstructuur
+    migrate_from_krnl_if_needed(); ensure_structure(); _install_io_router()
+    here=Path.cwd().resolve()
+    cwd=copy_up(here) if path_inside_root(here) else SYSTEM_ROOT/"home"/USER
+    cwd.mkdir(parents=True, exist_ok=True)
+    try:
+        if text is not None: return run_batch(text.splitlines(True), cwd)
+        if script:
+            p=Path(script)
+            if not p.is_file(): _err(f"{script}: No such file", 127); return 127
+            with open(p, encoding="utf-8", errors="replace") as f: return run_batch(f, cwd)
+        return run_batch(sys.stdin, cwd)
+    except SystemExit as e: return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except KeyboardInterrupt: return 130
+    finally:
+        # jobs zijn threads van dit proces: niet stilletjes afbreken bij het einde van de batch
+        try: wait_jobs([])
+        except KeyboardInterrupt:
+            for j in JOBS.values(): j.kill()
+
+# ---------- warme Python-runner (forkserver) ----------
+# Opt-in (set -o warmpy, of LTERM_WARMPY=1): ./script.py draait niet in een vers proces maar in een
+# fork van een server die de gangbare modules al heeft geïmporteerd. De client geeft stdin/stdout/
+# stderr als fd's mee (SCM_RIGHTS) plus argv/cwd/env; het kind draait het script met runpy en de
+# server stuurt exit-code + rusage terug. Eén thread, SIGCHLD via set_wakeup_fd. Zonder fork of
+# fd-passing (Windows), met pipe-stdio, in jobs of daemon-sessies: gewoon een koude start.
+WARMPY_PRELOAD = ("json", "re", "os", "sys", "subprocess", "pathlib", "argparse", "typing", "dataclasses", "datetime",
+                  "collections", "itertools", "functools", "shutil", "tempfile", "logging", "hashlib", "base64",
+                  "csv", "urllib.request", "urllib.parse", "textwrap", "traceback", "glob", "random", "string", "time")
+WARMPY_IDLE = 900.0
+
+def _warmpy_sock() -> Path:
+    return SYSTEM_ROOT / "var" / "run" / f"warmpy-{hashlib.sha1(sys.executable.encode()).hexdigest()[:8]}.sock"
+
+def _recv_msg(conn, with_fds: bool = False):
+    """Eén JSON-regel (+ eventueel 3 fd's) van een stream-socket."""
+    data = b""; fds = []
+    while not data.endswith(b"\n"):
+        if with_fds and not fds:
+            chunk, fds, _, _ = socket.recv_fds(conn, 1 << 16, 3)
+        else: chunk = conn.recv(1 << 16)
+        if not chunk: raise ConnectionError("warmpy: connection closed")
+        data += chunk
+    return json.loads(data), fds
+
+def _warmpy_child(job: dict, fds: list):
+    """In het geforkte kind: stdio, cwd, env en argv van de client overnemen en het script draaien."""
+    import runpy, atexit, traceback
+    signal.set_wakeup_fd(-1)
+    for sig in (signal.SIGCHLD, signal.SIGPIPE, signal.SIGTERM): signal.signal(sig, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    os.setpgid(0, 0)
+    for i, fd in enumerate(fds): os.dup2(fd, i); os.close(fd)
+    enc = job["env"].get("PYTHONIOENCODING") or None
+    sys.stdin = sys.__stdin__ = open(0, "r", encoding=enc, closefd=False)
+    sys.stdout = sys.__stdout__ = open(1, "w", encoding=enc, buffering=1 if os.isatty(1) else -1, closefd=False)
+    sys.stderr = sys.__stderr__ = open(2, "w", encoding=enc, errors="backslashreplace", buffering=1, closefd=False)
+    code = 0
+    try:
+        os.chdir(job["cwd"]); os.environ.clear(); os.environ.update(job["env"])
+        sys.argv = list(job["argv"]); sys.path[0] = os.path.dirname(os.path.abspath(job["argv"][0]))
+        atexit._clear()
+        runpy.run_path(job["argv"][0], run_name="__main__")
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else 0 if e.code is None else 1
+        if not isinstance(e.code, (int, type(None))): print(e.code, file=sys.stderr)
+    except KeyboardInterrupt: code = 130
+    except BaseException as e:
+        # zoals een koude start: alleen de frames van het script zelf
+        tb = e.__traceback__; script = os.path.abspath(job["argv"][0])
+        while tb is not None and tb.tb_frame.f_code.co_filename != script: tb = tb.tb_next
+        traceback.print_exception(type(e), e, tb or e.__traceback__); code = 1
+    try:
+        atexit._run_exitfuncs(); sys.stdout.flush(); sys.stderr.flush()
+    except BaseException: pass
+    os._exit(code & 0xff)
+
+def warmpy_server(sock_path: str) -> int:
+    import select, importlib
+    for m in WARMPY_PRELOAD:
+        try: importlib.import_module(m)
+        except Exception: pass
+    srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    old = os.umask(0o077)
+    try:
+        try: os.unlink(sock_path)
+        except OSError: pass
+        srv.bind(sock_path)
+    finally: os.umask(old)
+    srv.listen(64)
+    rfd, wfd = os.pipe(); os.set_blocking(wfd, False)
+    signal.set_wakeup_fd(wfd); signal.signal(signal.SIGCHLD, lambda *a: None)
+    running = {}; last = time.time(); started = last; runs = 0
+    try:
+        while True:
+            ready = select.select([srv, rfd], [], [], 5.0)[0]
+            if rfd in ready: os.read(rfd, 512)
+            if srv in ready:
+                conn, _ = srv.accept(); conn.settimeout(5.0); fds = []
+                try:
+                    job, fds = _recv_msg(conn, with_fds=True)
+                    op = job.get("op", "run")
+                    if op == "status":
+                        conn.sendall((json.dumps({"pid": os.getpid(), "up": time.time() - started, "runs": runs, "running": len(running)}) + "\n").encode())
+                        conn.close()
+                    elif op == "stop": conn.close(); return 0
+                    elif len(fds) != 3: conn.close()
+                    else:
+                        pid = os.fork()
+                        if pid == 0:
+                            srv.close(); conn.close(); os.close(rfd); os.close(wfd); _warmpy_child(job, fds)
+                        runs += 1; last = time.time()
+                        conn.sendall((json.dumps({"pid": pid}) + "\n").encode()); running[pid] = conn
+                except (OSError, ValueError, ConnectionError): conn.close()
+                finally:
+                    for fd in fds: os.close(fd)
+            while running:
+                try: pid, status, ru = os.wait4(-1, os.WNOHANG)
+                except ChildProcessError: break
+                if not pid: break
+                conn = running.pop(pid, None); last = time.time()
+                if conn is None: continue
+                try: conn.sendall((json.dumps({"rc": os.waitstatus_to_exitcode(status), "cpu_user": ru.ru_utime, "cpu_sys": ru.ru_stime, "maxrss_kb": ru.ru_maxrss // (1024 if sys.platform == "darwin" else 1)}) + "\n").encode())
+                except OSError: pass
+                conn.close()
+            if not running and time.time() - last > WARMPY_IDLE: return 0
+    finally:
+        srv.close()
+        try: os.unlink(sock_path)
+        except OSError: pass
+
+def _warmpy_connect(start: bool = True):
+    path = str(_warmpy_sock())
+    for i in range(100 if start else 1):
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try: s.connect(path); return s
+        except OSError: s.close()
+        if not start: return None
+        if i == 0:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            subprocess.Popen([sys.executable, os.path.abspath(__file__), "--root", str(SYSTEM_ROOT), "--warmpy-server", path],
+                             stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, start_new_session=True)
+        time.sleep(0.05)
+    return None
+
+def warmpy_usable() -> bool:
+    return bool(shell_opts().get("warmpy")) and hasattr(os, "fork") and hasattr(socket, "send_fds") \
+        and getattr(_job_tls, "job", None) is None and getattr(_sess_tls, "session", None) is None
+
+def warm_python(argv: list, cwd: Path, stdin_fd: int|None = None) -> int|None:
+    """Draai een .py-script via de warme server; None → niet mogelijk, gebruik een koude start."""
+    if not warmpy_usable(): return None
+    if stdin_fd is None:
+        if _io_top("stdin") is not None: return None
+        stdin_fd = 0
+    fds = [stdin_fd]
+    for name in ("stdout", "stderr"):
+        try: target = _cur_out(name); target.flush(); fds.append(target.fileno())
+        except (AttributeError, OSError, ValueError): return None
+    s = _warmpy_connect()
+    if s is None: return None
+    t0 = time.perf_counter()
+    try:
+        job = {"argv": [str(a) for a in argv], "cwd": str(cwd), "env": _base_env()}
+        socket.send_fds(s, [(json.dumps(job) + "\n").encode()], fds)
+        pid = _recv_msg(s)[0]["pid"]; buf = b""
+        while True:
+            try:
+                while not buf.endswith(b"\n"):
+                    chunk = s.recv(4096)
+                    if not chunk: raise ConnectionError("warmpy: server gone")
+                    buf += chunk
+                break
+            except KeyboardInterrupt:
+                try: os.killpg(pid, signal.SIGINT)
+                except OSError: pass
+        res = json.loads(buf)
+    except (OSError, ValueError, KeyError, ConnectionError) as e:
+        _err(f"warmpy: {e}"); return 1
+    finally:
+        s.close(); invalidate_path_cache(); fs_poll()
+        dt = time.perf_counter() - t0
+        for rec in _perf_stack(): rec["sub"] += dt
+    _perf_child(res)
+    set_status(res["rc"])
+    return res["rc"]
+
+def cmd_warmpy(args: list):
+    sub = args[0] if args else "status"
+    if not hasattr(os, "fork") or not hasattr(socket, "send_fds"): _err("warmpy: not supported on this platform (no fork/fd passing)"); return
+    if sub == "start":
+        s = _warmpy_connect()
+        if s is None: _err("warmpy: server did not start"); return
+        s.close(); sub = "status"
+    s = _warmpy_connect(start=False)
+    if s is None: print(f"warmpy: not running (set -o warmpy: {'on' if shell_opts().get('warmpy') else 'off'})"); return
+    try:
+        s.sendall((json.dumps({"op": sub}) + "\n").encode())
+        if sub == "status":
+            st = _recv_msg(s)[0]
+            print(f"warmpy: pid {st['pid']}, up {_fmt_s(st['up'])}, {st['runs']} runs, {st['running']} running ({'on' if shell_opts().get('warmpy') else 'off'})")
+        elif sub != "stop": _err("Usage: warmpy [status|start|stop]")
+    except (OSError, ValueError, ConnectionError) as e: _err(f"warmpy: {e}")
+    finally: s.close()
+
+# ---------- daemon (sessies via een Unix-socket) ----------
+# Frames in beide richtingen: 1 byte soort + 4 bytes lengte (big-endian) + payload.
+#   client → daemon: h(ello, json)  r(un, regel)  c(omplete, json)  i(nterrupt)
+#   daemon → client: h(ello, json)  o(stdout)  e(stderr)  d(one, json)  c(ompletions, json)
+DAEMON_SOCK = SYSTEM_ROOT / "var" / "run" / "lterm.sock"
+SESSIONS = {}
+_DAEMON = {"token": "", "ids": count(1)}   # next() op count is atomair: sessie-threads delen hem
+
+class Session:
+    """Eén client van de daemon: eigen cwd, env, git_env_cache, shell-opties en jobs; caches en META zijn gedeeld."""
+    def __init__(self, sid: int, env: dict, cwd: Path):
+        self.sid, self.env, self.cwd = sid, env, cwd
+        self.git_env_cache = None; self.jobs = {}; self.job_ids = count(1); self.fg = None
+        self.worker = None; self.busy = False; self.mu = threading.Lock()
+        self.opts = {"errexit": False, "jobtags": False, "interactive": True, "warmpy": False}
+
+def _frame_send(sock, kind: bytes, data: bytes, lock=None):
+    msg = kind + len(data).to_bytes(4, "big") + data
+    if lock is None: sock.sendall(msg); return
+    with lock: sock.sendall(msg)
+
+def _frame_recv(f):
+    hdr = f.read(5)
+    if len(hdr) < 5: return None
+    return hdr[:1], f.read(int.from_bytes(hdr[1:], "big"))
+
+class _SockOut:
+    """Tekst-doel van een sessie: bundelt writes (16KB of 20ms) tot o/e-frames naar de client."""
+    encoding, errors = "utf-8", "surrogateescape"
+    def __init__(self, sock, kind: bytes, lock, sess: Session, tty: bool):
+        self.sock, self.kind, self.lock, self.sess, self.tty = sock, kind, lock, sess, tty
+        self.buf = []; self.size = 0; self.timer = None; self.mu = threading.Lock()
+    def write(self, s: str) -> int:
+        fg = self.sess.fg
+        if fg is not None and fg.killed and getattr(_job_tls, "job", None) is fg: raise BrokenPipeError(32, "Broken pipe")
+        with self.mu:
+            self.buf.append(s); self.size += len(s)
+            if self.size >= 16384: self._send()
+            elif self.timer is None:
+                self.timer = threading.Timer(0.02, self.flush); self.timer.daemon = True; self.timer.start()
+        return len(s)
+    def _send(self):
+        data = "".join(self.buf).encode("utf-8", "surrogateescape"); self.buf = []; self.size = 0
+        if self.timer is not None: self.timer.cancel(); self.timer = None
+        if data:
+            try: _frame_send(self.sock, self.kind, data, self.lock)
+            except OSError: raise BrokenPipeError(32, "Broken pipe")
+    def flush(self):
+        with self.mu:
+            try: self._send()
+            except BrokenPipeError: pass
+    def isatty(self): return self.tty
+
+def _thread_raise(ident: int, exc):
+    """Async exception in een andere thread (CPython); exc=None haalt een nog niet afgeleverde weg."""
+    try: import ctypes
+    except ImportError: return
+    ctypes.pythonapi.PyThreadState_SetAsyncExc(ctypes.c_ulong(ident), ctypes.py_object(exc) if exc is not None else None)
+
+def _session_interrupt(sess: Session):
+    """Ctrl-C van de client: processen van de pseudo-job een SIGINT, en een KeyboardInterrupt in de sessie-thread
+    zodat ook fg/wait en lange Python-builtins stoppen. Alleen zolang er een regel draait (busy)."""
+    with sess.mu:
+        if sess.fg is None or not sess.busy: return
+        sess.fg.kill(signal.SIGINT)
+        if sess.worker is not None: _thread_raise(sess.worker, KeyboardInterrupt)
+
+def _session_quiet(sess: Session):
+    with sess.mu:
+        if sess.busy and sess.worker is not None: _thread_raise(sess.worker, None)
+        sess.busy = False
+
+def _session_run(sess: Session, line: str, out, err, lock, sock):
+    """Eén regel van de client in zijn sessie; een pseudo-job volgt de processen voor Ctrl-C (i-frame)."""
+    sess.fg = Job(0, line); _job_tls.job = sess.fg; code = None
+    try:
+        with sess.mu: sess.busy = True
+        try:
+            notify_jobs()
+            sess.cwd, sess.git_env_cache = run_command(line, sess.cwd, sess.git_env_cache)
+        finally: _session_quiet(sess)
+    except KeyboardInterrupt:
+        _session_quiet(sess); set_status(130)
+    except SystemExit as e: code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BrokenPipeError: set_status(130 if sess.fg.killed else 141)
+    except Exception as e: _err(f"Shell error: {e}")
+    finally: _job_tls.job = None
+    status = 130 if sess.fg.killed else last_status()
+    with sess.mu: sess.fg = None
+    out.flush(); err.flush()
+    done = {"status": status if code is None else code, "prompt": prompt(sess.cwd), "exit": code is not None}
+    _frame_send(sock, b"d", json.dumps(done).encode(), lock)
+    return code is None
+
+def _serve_session(sock):
+    rf = sock.makefile("rb"); lock = threading.Lock()
+    msg = _frame_recv(rf)
+    if not msg or msg[0] != b"h": return
+    hello = json.loads(msg[1] or b"{}")
+    if _DAEMON["token"] and hello.get("token") != _DAEMON["token"]: return
+    here = Path(hello.get("cwd") or SYSTEM_ROOT/"home"/USER)
+    sid = next(_DAEMON["ids"])
+    sess = Session(sid, hello.get("env") or dict(os.environ), copy_up(here) if path_inside_root(here) and here.is_dir() else SYSTEM_ROOT/"home"/USER)
+    tty = bool(hello.get("tty")); SESSIONS[sid] = sess
+    out, err = _SockOut(sock, b"o", lock, sess, tty), _SockOut(sock, b"e", lock, sess, tty)
+    lines = queue.Queue()
+    def worker():
+        _sess_tls.session = sess; sess.worker = threading.get_ident()
+        with io_redirect(stdout=out, stderr=err, stdin=iter(())):
+            while True:
+                line = lines.get()
+                if line is None: break
+                try:
+                    if not _session_run(sess, line, out, err, lock, sock): break
+                except OSError: break
+                except KeyboardInterrupt: continue   # te laat afgeleverde Ctrl-C: sessie blijft leven
+        try: sock.shutdown(socket.SHUT_RDWR)
+        except OSError: pass
+    t = threading.Thread(target=worker, name=f"session-{sid}", daemon=True); t.start()
+    try:
+        with io_redirect(stdout=out, stderr=err): greeting = {"sid": sid, "prompt": prompt(sess.cwd)}
+        _frame_send(sock, b"h", json.dumps(greeting).encode(), lock)
+        while True:
+            msg = _frame_recv(rf)
+            if msg is None: break
+            kind, data = msg
+            if kind == b"r": lines.put(data.decode("utf-8", "surrogateescape"))
+            elif kind == b"i": _session_interrupt(sess)
+            elif kind == b"c":
+                req = json.loads(data)
+                try: hits = completions(req["line"], req["begidx"], req["text"], sess.cwd)
+                except Exception: hits = []
+                _frame_send(sock, b"c", json.dumps(hits).encode(), lock)
+    except OSError: pass
+    finally:
+        lines.put(None)
+        if sess.fg is not None: sess.fg.kill()
+        t.join()
+        for j in sess.jobs.values():
+            if not j.done: j.kill()
+        SESSIONS.pop(sid, None)
+
+def _daemon_connect():
+    """Verbind met de daemon van de actieve root; geeft (socket, token) of None."""
+    try:
+        if hasattr(socket, "AF_UNIX") and DAEMON_SOCK.is_socket():
+            s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM); s.connect(str(DAEMON_SOCK)); return s, ""
+        if DAEMON_SOCK.is_file():
+            host, port, token = DAEMON_SOCK.read_text(encoding="utf-8").split()
+            return socket.create_connection((host, int(port))), token
+    except (OSError, ValueError): pass
+    return None
+
+def main_daemon(argv: list) -> int:
+    """--daemon: één warm proces per LinuxFS-root; elke client krijgt een goedkope sessie (thread)."""
+    migrate_from_krnl_if_needed(); ensure_structure(); _install_io_router()
+    conn = _daemon_connect()
+    if conn:
+        conn[0].close(); _err(f"lterm daemon: draait al voor {SYSTEM_ROOT} ({DAEMON_SOCK})", 1); return 1
+    DAEMON_SOCK.parent.mkdir(parents=True, exist_ok=True)
+    try: DAEMON_SOCK.unlink()
+    except OSError: pass
+    if hasattr(socket, "AF_UNIX"):
+        srv = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        old = os.umask(0o077)
+        try: srv.bind(str(DAEMON_SOCK))
+        finally: os.umask(old)
+        where = str(DAEMON_SOCK)
+    else:
+        # geen AF_UNIX (Windows): localhost-TCP, adres + token in het socket-bestand
+        srv = socket.create_server(("127.0.0.1", 0)); _DAEMON["token"] = os.urandom(16).hex()
+        host, port = srv.getsockname()[:2]
+        DAEMON_SOCK.write_text(f"{host} {port} {_DAEMON['token']}", encoding="utf-8")
+        where = f"{host}:{port}"
+    srv.listen(64)
+    if hasattr(signal, "SIGTERM"): signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    threading.Thread(target=_warm_completion, daemon=True).start()
+    print(f"lterm daemon: {SYSTEM_ROOT} op {where} (Ctrl-C stopt)", flush=True)
+    try:
+        while True:
+            sock, _ = srv.accept()
+            threading.Thread(target=_serve_session, args=(sock,), daemon=True).start()
+    except KeyboardInterrupt: return 0
+    finally:
+        srv.close()
+        for s in list(SESSIONS.values()):
+            for j in s.jobs.values():
+                if not j.done: j.kill()
+        try: DAEMON_SOCK.unlink()
+        except OSError: pass
+
+def main_attach(argv: list) -> int:
+    """--attach [-c CMD]: dunne client; regels gaan naar een nieuwe sessie van de daemon."""
+    conn = _daemon_connect()
+    if not conn: _err(f"lterm: geen daemon voor {SYSTEM_ROOT} (start met --daemon)", 1); return 1
+    sock, token = conn; rf = sock.makefile("rb"); replies = queue.Queue(); lock = threading.Lock()
+    here = Path.cwd().resolve()
+    hello = {"token": token, "env": dict(os.environ), "tty": sys.stdout.isatty(), "cwd": str(here)}
+    _frame_send(sock, b"h", json.dumps(hello).encode(), lock)
+    def reader():
+        while True:
+            msg = _frame_recv(rf)
+            if msg is None: replies.put(None); return
+            kind, data = msg
+            if kind == b"o": sys.stdout.buffer.write(data); sys.stdout.flush()
+            elif kind == b"e": sys.stdout.flush(); sys.stderr.buffer.write(data); sys.stderr.flush()
+            else: replies.put((kind, json.loads(data)))
+    threading.Thread(target=reader, daemon=True).start()
+    intr = []
+    def reply():
+        while True:
+            try: return replies.get()
+            except KeyboardInterrupt: intr.append(1); _frame_send(sock, b"i", b"", lock)
+    first = reply()
+    if first is None: _err("lterm: daemon weigerde de sessie", 1); return 1
+    prompt_s = first[1]["prompt"]
+    text = argv[argv.index("-c") + 1] if "-c" in argv[:-1] else None
+    interactive = text is None and sys.stdin.isatty()
+    if interactive:
+        try:
+            import readline
+            def _complete(word, state):
+                if state == 0:
+                    req = {"line": readline.get_line_buffer(), "begidx": readline.get_begidx(), "text": word}
+                    _frame_send(sock, b"c", json.dumps(req).encode(), lock)
+                    r = reply(); _COMPLETE["hits"] = r[1] if r else []
+                hits = _COMPLETE["hits"]
+                return hits[state] if state < len(hits) else None
+            readline.set_completer_delims(" \t\n;|&<>()="); readline.set_completer(_complete)
+            readline.parse_and_bind("bind ^I rl_complete" if "libedit" in (readline.__doc__ or "") else "tab: complete")
+        except ImportError: pass
+    src = split_statements(text) if text is not None else None
+    status = 0
+    try:
+        while True:
+            if src is not None:
+                if not src: break
+                line = src.pop(0)
+            elif interactive:
+                try: line = input(_rl_prompt(prompt_s))
+                except KeyboardInterrupt: print("^C"); continue
+            else:
+                line = sys.stdin.readline()
+                if not line: break
+                line = line.rstrip("\r\n")
+            _frame_send(sock, b"r", line.encode("utf-8", "surrogateescape"), lock)
+            r = reply()
+            if r is None: break
+            status, prompt_s = r[1]["status"], r[1]["prompt"]
+            if r[1]["exit"] or (intr and not interactive): break
+            intr.clear()
+    except EOFError: print()
+    except OSError: _err("lterm: verbinding met daemon verbroken", 1); return 1
+    finally: sock.close()
+    return status
 
 # ---------- banners & clear ----------
 def print_banner_initial():
@@ -1399,6 +5950,8 @@ def print_banner_final():
     print(f"{c(C_CYAN)}{BRAND} {VERSION} – Virtual system mounted{c(C_RESET)}\n")
 
 def do_clear():
+    if getattr(_sess_tls, "session", None) is not None:
+        print("\033[2J\033[H", end="", flush=True); return
     try:
         os.system("cls" if os.name=="nt" else "clear")
     except Exception:
@@ -1427,6 +5980,17 @@ def validate_git_available_or_exit():
 
 # ---------- main ----------
 def main():
+    if sys.argv[1:2] == ["--root"] and len(sys.argv) > 2:
+        # andere root (of overlay-upper) voor deze run; ook vóór --daemon/--attach
+        set_system_root(Path(sys.argv[2]).expanduser()); del sys.argv[1:3]
+    if sys.argv[1:2] == ["--warmpy-server"] and len(sys.argv) > 2: sys.exit(warmpy_server(sys.argv[2]))
+    if sys.argv[1:2] == ["--daemon"]: sys.exit(main_daemon(sys.argv[2:]))
+    if sys.argv[1:2] == ["--attach"]: sys.exit(main_attach(sys.argv[2:]))
+    # -c / script / stdin (niet-interactief): batch-modus zonder bootstrap
+    if sys.argv[1:] or not sys.stdin.isatty():
+        sys.exit(main_batch(sys.argv[1:]))
+    SHELL_OPTS["interactive"]=True
+    _install_io_router()
     migrate_from_krnl_if_needed()
 
     # Bepaal of dit de eerste run is VOOR we structuren forceren
@@ -1441,7 +6005,9 @@ def main():
         # Eerst de init-banner tonen (jouw wens)
         print_banner_initial()
 
-    ensure_pip_deps()
+    # gdown alleen als er iets van Drive moet komen; dan in dezelfde pip-aanroep
+    need_drive = AUTO_DOWNLOAD_TOOLS and (not find_git_exe() or (MSYS_ADDONS_URL and not (GIT_HOME / "usr" / "bin").exists()))
+    ensure_pip_deps(["gdown"] if need_drive else ())
 
     # Portable Git via Google Drive + nette progress
     installed_anything = False
@@ -1462,6 +6028,7 @@ def main():
     # shims
     ensure_shims()
     ensure_python3_shim()
+    _RUNTIME_READY["shims"] = True
 
     # Git/SSH env voorbereiden
     _ = ensure_git_config_and_ssh(SYSTEM_ROOT/"home"/USER)
@@ -1481,10 +6048,14 @@ def main():
     print("Home directory:", cwd)
     print("Type 'help', 'help all-commands' of 'help <cmd>' voor details.\n")
 
+    has_rl = setup_completion()
     git_env_cache=None
     while True:
         try:
-            line=input(prompt(cwd))
+            notify_jobs()
+            fs_watch(cwd); fs_poll()
+            if has_rl: complete_chdir(cwd)
+            line=input(_rl_prompt(prompt(cwd)) if has_rl else prompt(cwd))
             cwd,git_env_cache=run_command(line,cwd,git_env_cache)
         except KeyboardInterrupt: print("^C")
         except EOFError: print(); break